@@ -0,0 +1,158 @@
+import time
+import datetime
+import threading
+
+# 令牌桶允许的突发时长（秒），限速变化后最多按旧速率多传这么久的数据
+BURST_SECONDS = 0.5
+# 子进程引擎改变限速需要重启yt-dlp，提高限速时两次重启之间至少间隔这么久（秒）
+MIN_RELAUNCH_INTERVAL = 5.0
+# 限速变化小于这个比例时不重启子进程
+RELAUNCH_THRESHOLD = 0.2
+
+RATE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_rate(text):
+    """解析 yt-dlp --limit-rate 风格的速率（如 500K、2M、1.5M），0或空表示不限速"""
+    text = (text or '').strip().upper().rstrip('B').rstrip('I')
+    if not text:
+        return None
+    unit = text[-1] if text[-1] in RATE_UNITS else ''
+    number = float(text[:-1] if unit else text)
+    rate = int(number * RATE_UNITS[unit])
+    return rate or None
+
+
+class BandwidthSchedule:
+    """按一天中的时段设置总限速，例如 "08:00-23:00=1M,23:00-08:00=0"
+
+    每条规则是 开始-结束=速率，结束早于开始表示跨过午夜；速率为0表示不限速。
+    没有规则覆盖的时段使用全局限速。
+    """
+
+    def __init__(self, rules=None):
+        self.rules = list(rules or [])
+
+    @classmethod
+    def parse(cls, text):
+        rules = []
+        for part in (text or '').split(','):
+            part = part.strip()
+            if not part:
+                continue
+            span, rate = part.split('=')
+            start, end = span.split('-')
+            rules.append((cls._minutes(start), cls._minutes(end), parse_rate(rate)))
+        return cls(rules)
+
+    @staticmethod
+    def _minutes(text):
+        hours, minutes = text.strip().split(':')
+        return int(hours) * 60 + int(minutes)
+
+    def limit_at(self, moment):
+        """返回 (是否有规则命中, 速率)"""
+        minute = moment.hour * 60 + moment.minute
+        for start, end, rate in self.rules:
+            if start <= end:
+                inside = start <= minute < end
+            else:
+                inside = minute >= start or minute < end
+            if inside:
+                return True, rate
+        return False, None
+
+
+class TokenBucket:
+    """令牌桶限速器：consume() 返回为了不超过当前速率需要暂停的秒数"""
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+            if rate:
+                self.tokens = min(self.tokens, rate * BURST_SECONDS)
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.rate * BURST_SECONDS, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, count):
+        with self.lock:
+            if not self.rate:
+                return 0.0
+            self._refill(time.monotonic())
+            self.tokens -= count
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class BandwidthManager:
+    """在所有正在下载的任务之间分配总带宽
+
+    当前时段有规则时总限速取规则中的速率，否则取全局限速；各任务按权重分得份额，
+    任务开始、结束或权重变化时立即重新分配。没有限速时所有任务都不限速。
+    引擎需要提供 set_rate_limit(字节/秒或None)。
+    """
+
+    def __init__(self, limit=None, schedule=None, clock=datetime.datetime.now):
+        self.limit = limit
+        self.schedule = schedule or BandwidthSchedule()
+        self.clock = clock
+        self.engines = {}  # 引擎 -> 权重
+        self.applied_limit = None
+        self.lock = threading.Lock()
+
+    def current_limit(self):
+        matched, scheduled = self.schedule.limit_at(self.clock())
+        return scheduled if matched else self.limit
+
+    def set_limit(self, limit):
+        self.limit = limit or None
+        self.rebalance()
+
+    def set_schedule(self, schedule):
+        self.schedule = schedule or BandwidthSchedule()
+        self.rebalance()
+
+    def register(self, engine, weight=1.0):
+        with self.lock:
+            self.engines[engine] = max(0.01, float(weight))
+        self.rebalance()
+
+    def unregister(self, engine):
+        with self.lock:
+            self.engines.pop(engine, None)
+        self.rebalance()
+
+    def set_weight(self, engine, weight):
+        with self.lock:
+            if engine not in self.engines:
+                return
+            self.engines[engine] = max(0.01, float(weight))
+        self.rebalance()
+
+    def shares(self):
+        """返回 {引擎: 分得的速率或None}"""
+        limit = self.current_limit()
+        with self.lock:
+            engines = dict(self.engines)
+        total = sum(engines.values())
+        return {engine: int(limit * weight / total) if limit else None for engine, weight in engines.items()}
+
+    def rebalance(self):
+        with self.lock:
+            self.applied_limit = self.current_limit()
+        for engine, rate in self.shares().items():
+            engine.set_rate_limit(rate)
+
+    def check_schedule(self):
+        """时段变化导致总限速改变时重新分配，由下载进度回调定期调用"""
+        if self.current_limit() != self.applied_limit:
+            self.rebalance()
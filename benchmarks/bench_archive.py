@@ -0,0 +1,58 @@
+"""测量重新运行已全部下载过的大播放列表所需的时间
+
+用法: python benchmarks/bench_archive.py [条目数]
+
+先生成一份yt-dlp格式的下载记录并导入，再把同一个播放列表交给队列。
+平铺展开得到的条目带有提取器和ID，入队时在内存集合中查到记录就直接跳过，
+除了读取列表页以外不访问网络。
+"""
+import os
+import sys
+import time
+import tempfile
+
+from local_server import LocalMediaServer, install_fake_extractor
+
+PLUGIN_ROOT = install_fake_extractor(tempfile.mkdtemp(prefix='ytdl_bench_plugins_'))
+sys.path.insert(0, PLUGIN_ROOT)
+os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [PLUGIN_ROOT, os.environ.get('PYTHONPATH')]))
+
+import download_engine  # noqa: E402
+from download_archive import DownloadArchive, archive_id  # noqa: E402
+from download_queue import DownloadQueue, SKIPPED  # noqa: E402
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    if not download_engine.yt_dlp_available():
+        print('需要安装yt-dlp: pip install yt-dlp')
+        return 1
+
+    work_dir = tempfile.mkdtemp(prefix='ytdl_bench_archive_')
+    source = os.path.join(work_dir, 'yt-dlp-archive.txt')
+    with open(source, 'w', encoding='utf-8') as f:
+        f.writelines(archive_id('FakeBench', f'entry{i}-of-{count}') + '\n' for i in range(count))
+
+    start = time.perf_counter()
+    archive = DownloadArchive(os.path.join(work_dir, 'archive.txt'))
+    imported = archive.import_file(source)
+    print(f'导入 {imported} 条记录: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    with LocalMediaServer(payload_size=64 * 1024) as server:
+        queue = DownloadQueue(4, download_engine.InProcessEngine.name, archive=archive,
+                              state_callback=lambda job: None)
+        start = time.perf_counter()
+        queue.enqueue_collection(f'fakebench:{server.port}:list-{count}', work_dir, 'best')
+        while queue.active_count() > 0:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        skipped = sum(1 for job in queue.jobs.values() if job.state == SKIPPED)
+        queue.shutdown(wait=True)
+        print(f'重新运行 {count} 个条目的播放列表: {elapsed:.2f} s, 跳过 {skipped} 个, '
+              f'提取请求 {server.extract_count} 次（均为列表页）, 下载 {server.bytes_sent} 字节')
+    archive.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
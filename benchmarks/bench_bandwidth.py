@@ -0,0 +1,106 @@
+"""验证总限速在并发任务之间按权重分配，并在任务结束时重新分配
+
+用法: python benchmarks/bench_bandwidth.py [总限速MiB/s]
+
+本地服务器对每个连接限速，模拟比总限速更快的网络。三个任务同时下载，
+权重为 1:1:2；每隔0.5秒打印各任务分得的限速和实测吞吐，最后比较合计吞吐与总限速。
+进程内引擎在进度回调中按令牌桶限速；子进程引擎用新的 --limit-rate 重启yt-dlp并续传。
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+
+from local_server import LocalMediaServer, install_fake_extractor
+
+PLUGIN_ROOT = install_fake_extractor(tempfile.mkdtemp(prefix='ytdl_bench_plugins_'))
+sys.path.insert(0, PLUGIN_ROOT)
+os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [PLUGIN_ROOT, os.environ.get('PYTHONPATH')]))
+
+import download_engine  # noqa: E402
+from bandwidth import BandwidthManager  # noqa: E402
+from download_queue import DownloadQueue, COMPLETED  # noqa: E402
+from progress import format_bytes  # noqa: E402
+
+MIB = 1024 * 1024
+SERVER_RATE = 8 * MIB  # 每个连接的限速，高于分得的份额
+WEIGHTS = (1.0, 1.0, 2.0)
+# 子进程引擎每次调整限速都要重启yt-dlp，文件更大才能看到重新分配
+PAYLOAD_SIZES = {
+    download_engine.InProcessEngine.name: 4 * MIB,
+    download_engine.SubprocessEngine.name: 12 * MIB,
+}
+
+
+def describe_jobs(jobs):
+    parts = []
+    for index, job in enumerate(jobs):
+        engine = job.engine
+        if job.is_finished or engine is None:
+            parts.append(f'#{index} {job.state:>9}')
+            continue
+        limit = format_bytes(engine.rate_limit) + '/s' if engine.rate_limit else '不限'
+        throughput = job.estimator.throughput if job.estimator else None
+        measured = format_bytes(throughput) + '/s' if throughput else '-'
+        parts.append(f'#{index} {limit:>11} 实测 {measured:>11}')
+    return ' | '.join(parts)
+
+
+def run(engine_name, server, limit):
+    bandwidth = BandwidthManager(limit)
+    finished = threading.Event()
+    finish_times = {}
+
+    def on_state(job):
+        if job.is_finished:
+            finish_times[job.id] = time.perf_counter()
+            finished.set()
+
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_out_') as output_dir:
+        queue = DownloadQueue(len(WEIGHTS), engine_name, state_callback=on_state, prefetch_depth=0,
+                              bandwidth=bandwidth)
+        start = time.perf_counter()
+        jobs = []
+        for index, weight in enumerate(WEIGHTS):
+            job = queue.enqueue(f'fakebench:{server.port}:bw-{engine_name}-{index}', output_dir, 'best')
+            queue.set_weight(job.id, weight)
+            jobs.append(job)
+        next_report = start
+        while queue.active_count() > 0:
+            finished.wait(0.1)
+            finished.clear()
+            now = time.perf_counter()
+            if now >= next_report:
+                print(f'  {now - start:5.1f}s  {describe_jobs(jobs)}')
+                next_report += 0.5
+        elapsed = time.perf_counter() - start
+        queue.shutdown(wait=True)
+
+    payload = len(server.payload)
+    for index, job in enumerate(jobs):
+        duration = finish_times.get(job.id, start) - start
+        print(f'  #{index} 权重 {WEIGHTS[index]:.0f}: {job.state}, 用时 {duration:5.2f} s')
+    completed = sum(1 for job in jobs if job.state == COMPLETED)
+    total = payload * completed
+    print(f'  合计 {format_bytes(total)} 用时 {elapsed:5.2f} s，平均 {format_bytes(total / elapsed)}/s'
+          f'（总限速 {format_bytes(limit)}/s）')
+
+
+def main():
+    limit = int(float(sys.argv[1]) * MIB) if len(sys.argv) > 1 else 3 * MIB
+    if not download_engine.yt_dlp_available():
+        print('需要安装yt-dlp: pip install yt-dlp')
+        return 1
+    # 子进程引擎使用当前解释器的yt_dlp，才能加载测试用的提取器
+    download_engine.SubprocessEngine.command = [sys.executable, '-m', 'yt_dlp']
+
+    for engine_name, payload_size in PAYLOAD_SIZES.items():
+        print(f'{engine_name} 引擎，每个文件 {format_bytes(payload_size)}，权重 {WEIGHTS}')
+        with LocalMediaServer(payload_size, rate_limit=SERVER_RATE) as server:
+            run(engine_name, server, limit)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
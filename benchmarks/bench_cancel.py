@@ -0,0 +1,138 @@
+"""验证并测量取消正在运行的下载
+
+用法: python benchmarks/bench_cancel.py
+
+把 benchmarks/fake_yt_dlp 加到 PATH 最前面，子进程引擎的下载队列（并发数1）中先后加入两个任务，
+第一个任务进入没有输出的状态后取消它，测量：
+- 取消到任务变为已取消、排在后面的任务开始下载的时间（名额是否立即让出）
+- 取消到yt-dlp及其子进程（假的ffmpeg）全部退出的时间
+- 按策略删除或保留 .part 和合并的中间文件
+依次覆盖连接停滞、合并中（yt-dlp启动了子进程）、进程忽略SIGTERM（超时后强制结束）三种情况。
+任何一项不符合预期时以退出码1结束。
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'fake_yt_dlp')
+sys.path.insert(0, REPO_ROOT)
+os.environ['PATH'] = FAKE_DIR + os.pathsep + os.environ.get('PATH', '')
+
+from download_engine import SubprocessEngine, KILL_TIMEOUT  # noqa: E402
+from download_queue import (DownloadQueue, DOWNLOADING, CANCELLED, COMPLETED, PARTIAL_DELETE,  # noqa: E402
+                            PARTIAL_KEEP)
+from merge_planner import MergePlanner  # noqa: E402
+from bench_metadata_service import leftover  # noqa: E402
+
+CASES = [
+    ('连接停滞', 'fake://stalled?stall=1', PARTIAL_DELETE),
+    ('合并中', 'fake://merging?merge=1', PARTIAL_DELETE),
+    ('忽略SIGTERM', 'fake://stubborn?merge=1&ignore_term=1', PARTIAL_DELETE),
+    ('保留未完成文件', 'fake://kept?stall=1', PARTIAL_KEEP),
+]
+# 名额让出和进程退出的上限（秒）
+RELEASE_LIMIT = 0.5
+
+
+def fake_info(url):
+    video_id = url.split('://', 1)[1].split('?')[0]
+    return {'id': video_id, 'title': f'fake-{video_id}', 'webpage_url': url, 'epoch': int(time.time()),
+            'formats': [{'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a',
+                         'url': 'http://127.0.0.1/none'}]}
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def run_case(url, policy, pid_dir, output_dir):
+    for name in os.listdir(pid_dir):
+        os.remove(os.path.join(pid_dir, name))
+    changes = {}
+    lock = threading.Lock()
+
+    def on_state(job):
+        with lock:
+            changes.setdefault((job.id, job.state), time.monotonic())
+
+    queue = DownloadQueue(1, SubprocessEngine.name, state_callback=on_state, partial_policy=policy,
+                          merge_planner=MergePlanner(can_merge=False))
+    try:
+        first = queue.enqueue(url, output_dir, 'best', info=fake_info(url))
+        following = queue.enqueue('fake://next', output_dir, 'best', info=fake_info('fake://next'))
+        # 等第一个任务写入 .part（合并的情况还要等子进程写入中间文件）后再取消
+        merging = 'merge=1' in url
+        if not wait_for(lambda: first.written and (not merging or first.processed and len(os.listdir(pid_dir)) >= 2)):
+            raise RuntimeError(f'{url} 没有开始下载')
+        time.sleep(0.3)
+        pids = [int(name) for name in os.listdir(pid_dir)]
+        leftovers = [path + suffix for path in first.written for suffix in ('.part', '')] + \
+                    [os.path.splitext(path)[0] + '.temp.mp4' for path in first.processed]
+        leftovers = [path for path in leftovers if os.path.exists(path)]
+
+        cancelled_at = time.monotonic()
+        queue.cancel(first.id)
+        returned = time.monotonic() - cancelled_at
+        wait_for(lambda: (following.id, DOWNLOADING) in changes, 5)
+        next_started = changes.get((following.id, DOWNLOADING), float('inf')) - cancelled_at
+        wait_for(lambda: not [pid for pid in pids if pid in leftover(pid_dir)], KILL_TIMEOUT + 5)
+        exited = time.monotonic() - cancelled_at
+        alive = [pid for pid in pids if pid in leftover(pid_dir)]
+        # 工作线程在引擎停下后清理文件
+        wait_for(lambda: first.engine is None, KILL_TIMEOUT + 5)
+        wait_for(lambda: following.is_finished, 10)
+        remaining = [path for path in leftovers if os.path.exists(path)]
+        return {
+            'returned': returned,
+            'state': first.state,
+            'next_started': next_started,
+            'next_state': following.state,
+            'exited': exited,
+            'processes': len(pids),
+            'alive': alive,
+            'leftovers': leftovers,
+            'remaining': remaining,
+        }
+    finally:
+        queue.shutdown(wait=True)
+
+
+def main():
+    failures = []
+
+    def check(condition, text):
+        print(('通过' if condition else '失败') + ': ' + text)
+        if not condition:
+            failures.append(text)
+
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_pids_') as pid_dir, \
+            tempfile.TemporaryDirectory(prefix='ytdl_bench_out_') as output_dir:
+        os.environ['FAKE_YT_DLP_PIDS'] = pid_dir
+        for label, url, policy in CASES:
+            result = run_case(url, policy, pid_dir, output_dir)
+            print(f'{label}: 取消返回 {result["returned"] * 1000:.1f} ms，下一个任务开始 '
+                  f'{result["next_started"] * 1000:.1f} ms，{result["processes"]} 个进程全部退出 '
+                  f'{result["exited"]:.2f} s，未完成文件 {len(result["leftovers"])} 个，剩余 {len(result["remaining"])} 个')
+            check(result['state'] == CANCELLED and result['next_started'] < RELEASE_LIMIT
+                  and result['next_state'] == COMPLETED, f'{label}: 立即让出名额，下一个任务正常完成')
+            stubborn = 'ignore_term' in url
+            limit = KILL_TIMEOUT + 1 if stubborn else RELEASE_LIMIT
+            check(not result['alive'] and result['exited'] < limit,
+                  f'{label}: {limit:g} 秒内终止yt-dlp及其子进程')
+            if policy == PARTIAL_DELETE:
+                check(result['leftovers'] and not result['remaining'], f'{label}: 删除未完成的文件')
+            else:
+                check(result['leftovers'] and result['remaining'] == result['leftovers'], f'{label}: 保留未完成的文件')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
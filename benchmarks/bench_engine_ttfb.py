@@ -0,0 +1,63 @@
+"""比较进程内引擎与子进程引擎的首字节时间（TTFB）
+
+用法: python benchmarks/bench_engine_ttfb.py [轮数]
+
+两个引擎都通过本地假提取器 fakebench: 下载本地服务器上的文件，
+TTFB 从调用 engine.download 开始计时，到服务器写出第一个媒体字节为止。
+"""
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+from local_server import LocalMediaServer, install_fake_extractor
+
+# 插件目录必须在导入yt_dlp之前加入搜索路径
+PLUGIN_ROOT = install_fake_extractor(tempfile.mkdtemp(prefix='ytdl_bench_plugins_'))
+sys.path.insert(0, PLUGIN_ROOT)
+os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [PLUGIN_ROOT, os.environ.get('PYTHONPATH')]))
+
+import download_engine  # noqa: E402
+
+
+def measure(engine_name, server, rounds):
+    samples = []
+    for i in range(rounds):
+        engine = download_engine.create_engine(engine_name)
+        if engine_name == download_engine.SubprocessEngine.name:
+            # 使用当前解释器运行yt-dlp，保证加载同一个插件
+            engine.command = [sys.executable, '-m', 'yt_dlp']
+        seen = len(server.first_byte_times)
+        output_dir = tempfile.mkdtemp(prefix='ytdl_bench_out_')
+        start = time.perf_counter()
+        try:
+            ok = engine.download(f'fakebench:{server.port}:{engine_name}{i}', output_dir, 'best',
+                                 lambda event: None)
+        except download_engine.EngineError as e:
+            print(f'{engine_name}: 第{i + 1}轮下载失败: {e}')
+            continue
+        if not ok or len(server.first_byte_times) <= seen:
+            print(f'{engine_name}: 第{i + 1}轮下载失败')
+            continue
+        samples.append(server.first_byte_times[seen] - start)
+    return samples
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    if not download_engine.yt_dlp_available():
+        print('需要安装yt-dlp: pip install yt-dlp')
+        return 1
+
+    with LocalMediaServer(payload_size=2 * 1024 * 1024) as server:
+        for name in (download_engine.SubprocessEngine.name, download_engine.InProcessEngine.name):
+            samples = measure(name, server, rounds)
+            if samples:
+                print(f'{name:>10}: TTFB 中位数 {statistics.median(samples) * 1000:8.1f} ms '
+                      f'(最小 {min(samples) * 1000:.1f} ms, {len(samples)} 轮)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
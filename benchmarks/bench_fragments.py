@@ -0,0 +1,75 @@
+"""测量分片并发数对HLS分片流下载时间的影响，并验证自动调优的结果
+
+用法: python benchmarks/bench_fragments.py [分片数] [每个分片的延迟秒数]
+
+本地服务器把数据切分为HLS分片，每个分片请求先等待固定延迟，每个连接限速，
+模拟CDN上逐个分片下载时的往返开销。先分别用固定并发数下载，再用ProfileTuner
+连续下载多个任务，观察它最终选定的并发数。
+"""
+import os
+import sys
+import time
+import tempfile
+
+from local_server import LocalMediaServer, install_fake_extractor
+
+PLUGIN_ROOT = install_fake_extractor(tempfile.mkdtemp(prefix='ytdl_bench_plugins_'))
+sys.path.insert(0, PLUGIN_ROOT)
+os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [PLUGIN_ROOT, os.environ.get('PYTHONPATH')]))
+
+import download_engine  # noqa: E402
+from download_profile import DownloadProfile, ProfileTuner  # noqa: E402
+
+PAYLOAD_SIZE = 8 * 1024 * 1024
+RATE_LIMIT = 8 * 1024 * 1024  # 每个连接的限速，字节/秒
+
+
+def download(engine_name, server, video_id, profile):
+    engine = download_engine.create_engine(engine_name)
+    if engine_name == download_engine.SubprocessEngine.name:
+        engine.command = [sys.executable, '-m', 'yt_dlp']
+    url = f'fakebench:{server.port}:{video_id}'
+    info = engine.extract_info(url)
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_out_') as output_dir:
+        start = time.perf_counter()
+        ok = engine.download(url, output_dir, 'best', lambda event: None, info=info, profile=profile)
+        elapsed = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir))
+    return ok and size == PAYLOAD_SIZE, elapsed
+
+
+def main():
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    if not download_engine.yt_dlp_available():
+        print('需要安装yt-dlp: pip install yt-dlp')
+        return 1
+
+    print(f'{PAYLOAD_SIZE // (1024 * 1024)} MiB，{segments} 个分片，每个分片延迟 {latency * 1000:.0f} ms')
+    with LocalMediaServer(PAYLOAD_SIZE, rate_limit=RATE_LIMIT, segment_count=segments,
+                          segment_latency=latency) as server:
+        for concurrency in (1, 2, 4, 8, 16):
+            profile = DownloadProfile(concurrency)
+            ok, elapsed = download(download_engine.InProcessEngine.name, server, f'hls-{concurrency}', profile)
+            print(f'固定 {profile.describe()}: {elapsed:6.2f} s, {PAYLOAD_SIZE / elapsed / 1e6:6.1f} MB/s, '
+                  f'{"成功" if ok else "失败"}')
+
+        # 子进程引擎通过命令行参数传递同样的设置
+        profile = DownloadProfile(8)
+        ok, elapsed = download(download_engine.SubprocessEngine.name, server, 'hls-subprocess', profile)
+        print(f'子进程 {profile.describe()}: {elapsed:6.2f} s, {"成功" if ok else "失败"}')
+
+        tuner = ProfileTuner()
+        job = 0
+        while not tuner.settled and job < 10:
+            profile = tuner.next_profile()
+            ok, elapsed = download(download_engine.InProcessEngine.name, server, f'hls-auto{job}', profile)
+            tuner.record(profile, PAYLOAD_SIZE, elapsed)
+            print(f'自动调优 任务{job + 1}: 分片并发 {profile.concurrent_fragments:2d}, {elapsed:6.2f} s')
+            job += 1
+        print(f'自动调优选定: {tuner.next_profile().describe()}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""验证并测量 MetadataService 同时查询大量链接
+
+用法: python benchmarks/bench_metadata_service.py [链接数] [并发数]
+
+把 benchmarks/fake_yt_dlp 加到 PATH 最前面，子进程引擎运行其中的假 yt-dlp（每次查询约0.2秒）：
+1. 先逐个查询、再按并发数同时查询同一批链接，比较总耗时和第一个结果返回的时间
+2. 失败的链接返回yt-dlp的错误信息
+3. 一直不退出的查询在超时后返回错误，进程已被终止
+4. 从其他线程取消正在进行的查询，lookup_all 立即返回，所有进程已被终止
+任何一项不符合预期时以退出码1结束。
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'fake_yt_dlp')
+sys.path.insert(0, REPO_ROOT)
+os.environ['PATH'] = FAKE_DIR + os.pathsep + os.environ.get('PATH', '')
+
+from download_engine import SubprocessEngine  # noqa: E402
+from metadata_service import MetadataService  # noqa: E402
+
+DELAY = 0.2  # 假 yt-dlp 每次查询的耗时（秒）
+HANG_TIMEOUT = 1.0
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # 已退出但还没被回收的进程
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except OSError:
+        return True
+
+
+def leftover(pid_dir):
+    return [pid for pid in map(int, os.listdir(pid_dir)) if alive(pid)]
+
+
+def run(urls, concurrency, timeout=30):
+    service = MetadataService(SubprocessEngine.name, concurrency, timeout)
+    results = []
+    start = time.perf_counter()
+    first = []
+
+    def on_result(result):
+        if not first:
+            first.append(time.perf_counter() - start)
+        results.append(result)
+
+    try:
+        service.lookup_all(urls, on_result)
+    finally:
+        service.close()
+    return results, time.perf_counter() - start, first[0] if first else None
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    failures = []
+
+    def check(condition, text):
+        print(('通过' if condition else '失败') + ': ' + text)
+        if not condition:
+            failures.append(text)
+
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_pids_') as pid_dir:
+        os.environ['FAKE_YT_DLP_PIDS'] = pid_dir
+        urls = [f'fake://v{index:04d}?delay={DELAY}' for index in range(count)]
+        for workers in (1, concurrency):
+            results, elapsed, first = run(urls, workers)
+            ok = sum(1 for result in results if result.ok)
+            print(f'并发 {workers:>3}: {count} 个链接用时 {elapsed:5.2f} s，第一个结果 {first:4.2f} s，成功 {ok}')
+            check(ok == count, f'并发 {workers} 时全部成功')
+
+        results, _, _ = run(['fake://broken?fail=1'], 1)
+        check(not results[0].ok and 'Video unavailable' in results[0].error,
+              f'失败的链接返回错误信息（{results[0].error}）')
+
+        for name in os.listdir(pid_dir):
+            os.remove(os.path.join(pid_dir, name))
+        results, elapsed, _ = run(['fake://hung?hang=1', f'fake://quick?delay={DELAY}'], 2, HANG_TIMEOUT)
+        by_url = {result.url: result for result in results}
+        check(by_url['fake://quick?delay=0.2'].ok and not by_url['fake://hung?hang=1'].ok
+              and elapsed < HANG_TIMEOUT + 2, f'超时的查询返回错误，其余正常（用时 {elapsed:.2f} s）')
+        check(not leftover(pid_dir), '超时的进程已被终止')
+
+        for name in os.listdir(pid_dir):
+            os.remove(os.path.join(pid_dir, name))
+        service = MetadataService(SubprocessEngine.name, 4, 30)
+        finished = []
+        thread = threading.Thread(target=lambda: finished.append(
+            service.lookup_all([f'fake://stuck{index}?hang=1' for index in range(8)], lambda result: None)))
+        thread.start()
+        time.sleep(1.0)
+        started = len(os.listdir(pid_dir))
+        cancel_at = time.perf_counter()
+        service.cancel()
+        thread.join(10)
+        service.close()
+        check(finished == [False] and time.perf_counter() - cancel_at < 2,
+              f'取消后立即返回（{time.perf_counter() - cancel_at:.2f} s，取消时运行中 {started} 个，不超过并发数 4）')
+        check(started == 4 and not leftover(pid_dir), '取消后所有进程已被终止')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
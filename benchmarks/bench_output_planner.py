@@ -0,0 +1,136 @@
+"""验证并测量OutputPlanner的文件名规划
+
+用法: python benchmarks/bench_output_planner.py [进程数] [每个进程的任务数]
+
+1. 文件名整理：不合法的字符、Windows保留名、过长的标题
+2. 多个进程的多个线程同时为同一个标题占用文件名，所有名称互不相同，测量每次占用的耗时
+3. 同一个视频中断后（占用它的进程已退出）再次占用时沿用原来的名称；
+   同一个视频的两个任务同时运行时使用不同的名称
+4. 把 benchmarks/fake_yt_dlp 加到 PATH 最前面，子进程引擎同时下载标题相同的几个视频，
+   每个视频写入各自的文件，结束后不留下标记文件
+任何一项不符合预期时以退出码1结束。
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+import multiprocessing
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'fake_yt_dlp')
+sys.path.insert(0, REPO_ROOT)
+os.environ['PATH'] = FAKE_DIR + os.pathsep + os.environ.get('PATH', '')
+
+from output_planner import OutputPlanner, RESERVATION_SUFFIX, MAX_NAME_BYTES  # noqa: E402
+from download_engine import SubprocessEngine  # noqa: E402
+from download_queue import DownloadQueue, COMPLETED  # noqa: E402
+from merge_planner import MergePlanner  # noqa: E402
+
+TITLE = 'Same: Title? <live>'
+THREADS = 4
+
+
+def reserve_many(directory, prefix, count, results):
+    planner = OutputPlanner()
+    names = []
+    started = time.perf_counter()
+    for index in range(count):
+        names.append(planner.reserve(directory, {'title': TITLE}, f'{prefix}-{index}').name)
+    results.append((names, time.perf_counter() - started))
+
+
+def worker_process(directory, prefix, count, queue):
+    results = []
+    threads = [threading.Thread(target=reserve_many, args=(directory, f'{prefix}-{index}', count // THREADS, results))
+               for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put(results)
+
+
+def reserve_and_exit(directory):
+    """占用后不释放就退出，相当于下载到一半时程序崩溃"""
+    target = OutputPlanner().reserve(directory, {'title': 'resume'}, 'video-1')
+    open(os.path.join(directory, target.name + '.mp4.part'), 'w').close()
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    per_process = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    failures = []
+
+    def check(condition, text):
+        print(('通过' if condition else '失败') + ': ' + text)
+        if not condition:
+            failures.append(text)
+
+    planner = OutputPlanner()
+    name = planner.base_name({'title': 'a/b\\c: "d" <e> |f|?*\n  g. '})
+    check(name == 'a⧸b⧹c： ＂d＂ ＜e＞ ｜f｜？＊ g', f'替换不合法的字符（{name}）')
+    check(planner.base_name({'title': 'con.mp4'}) == '_con.mp4' and planner.base_name({'title': ' ..', 'id': 'x1'}) == 'x1',
+          'Windows保留名加前缀，空标题使用视频ID')
+    long_name = planner.base_name({'title': '很长的标题' * 40})
+    check(len(long_name.encode('utf-8')) <= MAX_NAME_BYTES and long_name.startswith('很长的标题'),
+          f'过长的标题按字节截断（{len(long_name.encode("utf-8"))} 字节）')
+
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_names_') as directory:
+        queue = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=worker_process, args=(directory, f'p{index}', per_process, queue))
+                   for index in range(processes)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        results = [item for _ in workers for item in queue.get()]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        names = [name for names, _ in results for name in names]
+        per_reserve = sum(seconds for _, seconds in results) / len(names) * 1000
+        print(f'{processes} 个进程 × {THREADS} 个线程同时占用 {len(names)} 个同名文件：'
+              f'用时 {elapsed:.2f} s，每次占用平均 {per_reserve:.2f} ms（含等待其他线程）')
+        check(len(set(names)) == len(names), f'{len(names)} 个名称互不相同（{names[0]}、{sorted(names)[1]}……）')
+
+        crashed = multiprocessing.Process(target=reserve_and_exit, args=(directory,))
+        crashed.start()
+        crashed.join()
+        again = planner.reserve(directory, {'title': 'resume'}, 'video-1')
+        other = planner.reserve(directory, {'title': 'resume'}, 'video-2')
+        check(again.name == 'resume' and other.name == 'resume (2)',
+              f'中断的视频沿用原来的名称（{again.name}），其他视频加后缀（{other.name}）')
+        duplicate = planner.reserve(directory, {'title': 'resume'}, 'video-1')
+        check(duplicate.name not in (again.name, other.name),
+              f'同一个视频的另一个任务同时运行时使用不同的名称（{duplicate.name}）')
+        key = 'youtube abcdefghijk'
+        first = planner.reserve(directory, {'title': 'twice'}, key)
+        second = planner.reserve(directory, {'title': 'twice'}, key)
+        planner.release(first)
+        third = planner.reserve(directory, {'title': 'twice'}, key)
+        check(first.name != second.name and third.name == first.name and os.path.exists(second.markers[0]),
+              f'同一链接加入两次使用不同的名称（{first.name}、{second.name}），释放一个不影响另一个的占用')
+
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_out_') as directory:
+        download_queue = DownloadQueue(4, SubprocessEngine.name, merge_planner=MergePlanner(can_merge=False))
+        jobs = []
+        for index in range(4):
+            url = f'fake://same{index}?delay=0.2'
+            info = {'id': f'same{index}', 'title': TITLE, 'webpage_url': url, 'epoch': int(time.time()),
+                    'extractor_key': 'Fake',
+                    'formats': [{'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a',
+                                 'url': 'http://127.0.0.1/none'}]}
+            jobs.append(download_queue.enqueue(url, directory, 'best', info=info))
+        while download_queue.active_count():
+            time.sleep(0.05)
+        download_queue.shutdown(wait=True)
+        files = sorted(os.listdir(directory))
+        print('同时下载标题相同的 4 个视频：' + '、'.join(files))
+        check(all(job.state == COMPLETED for job in jobs) and len(files) == 4
+              and not [name for name in files if name.endswith(RESERVATION_SUFFIX)],
+              '各自写入不同的文件，不留下标记文件')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
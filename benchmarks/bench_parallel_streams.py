@@ -0,0 +1,65 @@
+"""测量视频流和音频流同时下载对需要合并的任务的耗时影响
+
+用法: python benchmarks/bench_parallel_streams.py [每个流的MiB数]
+
+本地服务器对每个连接限速，假提取器提供分开的视频流和音频流。先按yt-dlp默认的
+先后顺序下载两个流，再同时下载；服务器发送的总字节数应等于两个流之和，
+说明合并前的正常下载直接使用了已下载的文件。没有ffmpeg时两个流不合并，耗时只含下载。
+"""
+import os
+import sys
+import time
+import tempfile
+
+from local_server import LocalMediaServer, install_fake_extractor
+
+PLUGIN_ROOT = install_fake_extractor(tempfile.mkdtemp(prefix='ytdl_bench_plugins_'))
+sys.path.insert(0, PLUGIN_ROOT)
+os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [PLUGIN_ROOT, os.environ.get('PYTHONPATH')]))
+
+import download_engine  # noqa: E402
+from format_selector import select_format  # noqa: E402
+from merge_planner import MergePlanner, ffmpeg_available  # noqa: E402
+from progress import ProgressEstimator, format_bytes  # noqa: E402
+
+MIB = 1024 * 1024
+RATE_LIMIT = 4 * MIB  # 每个连接的限速，字节/秒
+
+
+def download(engine_name, server, video_id, parallel):
+    engine = download_engine.create_engine(engine_name)
+    url = f'fakebench:{server.port}:{video_id}'
+    info = engine.extract_info(url)
+    choice = select_format(info)
+    plan = MergePlanner(can_merge=True, parallel=parallel).plan(choice, tempfile.gettempdir())
+    estimator = ProgressEstimator({'video': len(server.payload), 'audio': len(server.payload)})
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_out_') as output_dir:
+        sent = server.bytes_sent
+        start = time.perf_counter()
+        success = engine.download(url, output_dir, choice.format_id, estimator.update, info=info, plan=plan)
+        elapsed = time.perf_counter() - start
+        files = sorted(os.listdir(output_dir))
+    return success, elapsed, server.bytes_sent - sent, estimator.percent, files
+
+
+def main():
+    size = int(float(sys.argv[1]) * MIB) if len(sys.argv) > 1 else 8 * MIB
+    if not download_engine.yt_dlp_available():
+        print('需要安装yt-dlp: pip install yt-dlp')
+        return 1
+    download_engine.SubprocessEngine.command = [sys.executable, '-m', 'yt_dlp']
+
+    print(f'每个流 {format_bytes(size)}，每个连接限速 {format_bytes(RATE_LIMIT)}/s，'
+          f'ffmpeg {"可用" if ffmpeg_available() else "不可用（不合并）"}')
+    with LocalMediaServer(size, rate_limit=RATE_LIMIT) as server:
+        for engine_name in (download_engine.InProcessEngine.name, download_engine.SubprocessEngine.name):
+            for parallel, label in ((False, '先后下载'), (True, '同时下载')):
+                video_id = f'split-{engine_name}-{int(parallel)}'
+                success, elapsed, sent, percent, files = download(engine_name, server, video_id, parallel)
+                print(f'{engine_name:>10} {label}: {elapsed:5.2f} s, 成功 {success}, '
+                      f'服务器发送 {format_bytes(sent)}, 合计进度 {percent or 0:.0f}%, 文件 {files}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
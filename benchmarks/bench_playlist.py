@@ -0,0 +1,79 @@
+"""测量播放列表从加入到第一个视频开始下载的时间
+
+用法: python benchmarks/bench_playlist.py [条目数] [每次提取的模拟耗时秒数]
+
+“旧流程”先完整提取整个列表（每个条目都解析一次）再开始下载；
+“新流程”用 DownloadQueue.enqueue_collection 平铺展开，条目逐页进入队列，
+完整信息在各自下载前才提取。统计第一个任务进入下载状态的时间和提取请求数。
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+
+from local_server import LocalMediaServer, install_fake_extractor
+
+PLUGIN_ROOT = install_fake_extractor(tempfile.mkdtemp(prefix='ytdl_bench_plugins_'))
+sys.path.insert(0, PLUGIN_ROOT)
+os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [PLUGIN_ROOT, os.environ.get('PYTHONPATH')]))
+
+import download_engine  # noqa: E402
+from download_queue import DownloadQueue, DOWNLOADING  # noqa: E402
+
+
+def full_extraction(server, url):
+    """旧流程：--dump-json 整个列表，所有条目解析完才能开始下载"""
+    start = time.perf_counter()
+    params = {'quiet': True, 'no_warnings': True, 'noplaylist': False}
+    with download_engine.load_yt_dlp().YoutubeDL(params) as ydl:
+        info = ydl.extract_info(url, download=False)
+    return time.perf_counter() - start, len(info['entries'])
+
+
+def streamed(server, url, engine_name):
+    """新流程：平铺展开，第一个条目入队后立即开始下载"""
+    first = threading.Event()
+
+    def on_state(job):
+        if job.state == DOWNLOADING:
+            first.set()
+
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_out_') as output_dir:
+        queue = DownloadQueue(1, engine_name, state_callback=on_state)
+        start = time.perf_counter()
+        queue.enqueue_collection(url, output_dir, 'best')
+        first.wait(60)
+        elapsed = time.perf_counter() - start
+        # 等待列表全部展开，统计条目数，然后取消剩余下载
+        while queue.expanders:
+            time.sleep(0.05)
+        count = len(queue.jobs)
+        queue.shutdown(wait=True)
+    return elapsed, count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    if not download_engine.yt_dlp_available():
+        print('需要安装yt-dlp: pip install yt-dlp')
+        return 1
+    download_engine.SubprocessEngine.command = [sys.executable, '-m', 'yt_dlp']
+
+    with LocalMediaServer(payload_size=256 * 1024, extract_delay=delay) as server:
+        url = f'fakebench:{server.port}:list-{count}'
+        before = server.extract_count
+        elapsed, entries = full_extraction(server, url)
+        print(f'旧流程(完整提取): 开始下载前等待 {elapsed:6.2f} s, {entries} 个条目, '
+              f'提取请求 {server.extract_count - before} 次')
+        for name in (download_engine.InProcessEngine.name, download_engine.SubprocessEngine.name):
+            before = server.extract_count
+            elapsed, entries = streamed(server, url, name)
+            print(f'新流程({name}): 开始下载前等待 {elapsed:6.2f} s, {entries} 个条目, '
+                  f'提取请求 {server.extract_count - before} 次')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
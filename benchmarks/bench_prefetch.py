@@ -0,0 +1,58 @@
+"""测量预取等待任务的信息对整批下载总时间的影响
+
+用法: python benchmarks/bench_prefetch.py [任务数] [每次提取的模拟耗时秒数]
+
+一次只下载一个任务，每个文件按限速下载。不预取时每个任务都要先等待提取；
+预取时后面几个任务的提取与当前下载重叠，任务之间不再空等。
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+
+from local_server import LocalMediaServer, install_fake_extractor
+
+PLUGIN_ROOT = install_fake_extractor(tempfile.mkdtemp(prefix='ytdl_bench_plugins_'))
+sys.path.insert(0, PLUGIN_ROOT)
+os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [PLUGIN_ROOT, os.environ.get('PYTHONPATH')]))
+
+import download_engine  # noqa: E402
+from download_queue import DownloadQueue, COMPLETED  # noqa: E402
+
+PAYLOAD_SIZE = 512 * 1024
+RATE_LIMIT = 1024 * 1024  # 每个文件约0.5秒
+
+
+def run_batch(server, count, prefetch_depth, tag):
+    finished = threading.Event()
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_out_') as output_dir:
+        queue = DownloadQueue(1, download_engine.InProcessEngine.name, prefetch_depth=prefetch_depth,
+                              state_callback=lambda job: job.is_finished and finished.set())
+        start = time.perf_counter()
+        jobs = [queue.enqueue(f'fakebench:{server.port}:{tag}{i}', output_dir, 'best') for i in range(count)]
+        while queue.active_count() > 0:
+            finished.wait(0.05)
+            finished.clear()
+        elapsed = time.perf_counter() - start
+        queue.shutdown(wait=True)
+    return elapsed, sum(1 for job in jobs if job.state == COMPLETED)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+    if not download_engine.yt_dlp_available():
+        print('需要安装yt-dlp: pip install yt-dlp')
+        return 1
+
+    print(f'{count} 个任务，每次提取 {delay * 1000:.0f} ms，每个文件下载约 {PAYLOAD_SIZE / RATE_LIMIT:.1f} s')
+    with LocalMediaServer(PAYLOAD_SIZE, rate_limit=RATE_LIMIT, extract_delay=delay) as server:
+        for depth, label in ((0, '不预取'), (3, '预取3个')):
+            elapsed, completed = run_batch(server, count, depth, f'prefetch{depth}-')
+            print(f'{label}: 总耗时 {elapsed:6.2f} s, 完成 {completed}/{count}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
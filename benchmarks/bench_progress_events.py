@@ -0,0 +1,108 @@
+"""比较逐条信号与合并刷新两种进度传递方式的GUI线程开销
+
+用法: QT_QPA_PLATFORM=offscreen python benchmarks/bench_progress_events.py [任务数] [每个任务的事件数]
+
+多个工作线程模拟分片下载，高频产生进度事件：
+- 逐条信号：每条事件都跨线程发送Qt信号，GUI线程逐条更新进度条（旧实现）
+- 合并刷新：事件写入ProgressAggregator，GUI线程按PROGRESS_UPDATE_HZ批量更新
+统计GUI线程的处理次数和在处理函数中花费的时间。
+"""
+import os
+import sys
+import time
+import threading
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import local_server  # noqa: F401  设置仓库根目录的导入路径
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QProgressBar, QLabel
+
+from progress import ProgressAggregator, ProgressEvent, STAGE_VIDEO
+from youtube_downloader import PROGRESS_UPDATE_HZ
+
+
+class Signals(QObject):
+    progress_signal = pyqtSignal(int, object)
+
+
+class GuiSink:
+    """模拟界面更新：每个任务一个进度条和状态标签"""
+
+    def __init__(self, job_count):
+        self.bars = [QProgressBar() for _ in range(job_count)]
+        self.label = QLabel()
+        self.calls = 0
+        self.busy = 0.0
+
+    def apply(self, job_id, event):
+        start = time.perf_counter()
+        self.bars[job_id].setValue(int(event.percent))
+        self.bars[job_id].setFormat(f'{event.percent:.2f}%')
+        self.label.setText(event.describe())
+        self.calls += 1
+        self.busy += time.perf_counter() - start
+
+
+def produce(job_id, count, deliver):
+    total = count * 64 * 1024
+    for i in range(1, count + 1):
+        deliver(job_id, ProgressEvent('downloading', STAGE_VIDEO, i * 64 * 1024, total, 5e6, 3,
+                                      fragment_index=i, fragment_count=count))
+        if i % 200 == 0:
+            time.sleep(0.001)  # 让出GIL，模拟网络读取
+
+
+def run(app, mode, job_count, event_count):
+    sink = GuiSink(job_count)
+    finished = threading.Event()
+
+    if mode == 'signal':
+        signals = Signals()
+        signals.progress_signal.connect(sink.apply)
+        deliver = signals.progress_signal.emit
+    else:
+        aggregator = ProgressAggregator()
+        deliver = aggregator.push
+        timer = QTimer()
+        timer.setInterval(1000 // PROGRESS_UPDATE_HZ)
+        timer.timeout.connect(lambda: [sink.apply(j, e) for j, e in aggregator.drain().items()])
+        timer.start()
+
+    workers = [threading.Thread(target=produce, args=(j, event_count, deliver)) for j in range(job_count)]
+
+    def watch():
+        for worker in workers:
+            worker.join()
+        finished.set()
+
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    threading.Thread(target=watch, daemon=True).start()
+
+    # 运行事件循环直到生产结束且积压的事件全部处理完
+    while not finished.is_set():
+        app.processEvents()
+    drain_until = time.perf_counter() + 2.0 / PROGRESS_UPDATE_HZ
+    while time.perf_counter() < drain_until:
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+    if mode != 'signal':
+        timer.stop()
+    return sink.calls, sink.busy, elapsed
+
+
+def main():
+    job_count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    event_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    app = QApplication(sys.argv)
+    print(f'{job_count} 个任务 x {event_count} 条进度事件，刷新频率 {PROGRESS_UPDATE_HZ} Hz')
+    for mode, label in (('signal', '逐条信号'), ('aggregate', '合并刷新')):
+        calls, busy, elapsed = run(app, mode, job_count, event_count)
+        print(f'{label}: GUI更新 {calls:7d} 次, GUI线程耗时 {busy * 1000:8.1f} ms, 总耗时 {elapsed:.2f} s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""测量下载时复用已提取信息所节省的时间
+
+用法: python benchmarks/bench_reuse_info.py [模拟提取耗时秒数]
+
+假提取器每次提取都会向本地服务器请求 /extract/<id>，服务器按设定延迟响应并计数。
+“旧流程”先 extract_info 再按URL下载（提取两次），“新流程”把 extract_info
+的结果直接传给 download（提取一次）。
+"""
+import os
+import sys
+import time
+import tempfile
+
+from local_server import LocalMediaServer, install_fake_extractor
+
+PLUGIN_ROOT = install_fake_extractor(tempfile.mkdtemp(prefix='ytdl_bench_plugins_'))
+sys.path.insert(0, PLUGIN_ROOT)
+os.environ['PYTHONPATH'] = os.pathsep.join(filter(None, [PLUGIN_ROOT, os.environ.get('PYTHONPATH')]))
+
+import download_engine  # noqa: E402
+
+
+def run_flow(engine_name, server, video_id, reuse):
+    engine = download_engine.create_engine(engine_name)
+    if engine_name == download_engine.SubprocessEngine.name:
+        engine.command = [sys.executable, '-m', 'yt_dlp']
+    url = f'fakebench:{server.port}:{video_id}'
+    before = server.extract_count
+    start = time.perf_counter()
+    info = engine.extract_info(url)
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_out_') as output_dir:
+        ok = engine.download(url, output_dir, 'best', lambda event: None,
+                             info=info if reuse else None)
+    return ok, time.perf_counter() - start, server.extract_count - before
+
+
+def main():
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    if not download_engine.yt_dlp_available():
+        print('需要安装yt-dlp: pip install yt-dlp')
+        return 1
+
+    with LocalMediaServer(payload_size=1024 * 1024, extract_delay=delay) as server:
+        for name in (download_engine.SubprocessEngine.name, download_engine.InProcessEngine.name):
+            results = {}
+            for reuse in (False, True):
+                ok, elapsed, extracts = run_flow(name, server, f'{name}-{int(reuse)}', reuse)
+                results[reuse] = elapsed
+                label = '新流程(复用)' if reuse else '旧流程(重提取)'
+                print(f'{name:>10} {label}: {elapsed * 1000:8.1f} ms, 提取 {extracts} 次, '
+                      f'{"成功" if ok else "失败"}')
+            print(f'{name:>10} 节省: {(results[False] - results[True]) * 1000:.1f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
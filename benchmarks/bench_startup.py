@@ -0,0 +1,62 @@
+"""测量界面程序从启动到首次绘制窗口的时间，超出预算时以退出码1结束
+
+用法: python benchmarks/bench_startup.py [运行次数] [预算毫秒数]
+
+每次在新进程中以 --profile-startup 运行 youtube_downloader.py（offscreen平台，
+设置、缓存和任务日志放在临时目录，不会恢复真实的下载任务），
+取各次的中位数：进程总耗时（含解释器启动），以及导入本模块到首次绘制的耗时和各阶段耗时。
+"""
+import os
+import sys
+import time
+import tempfile
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(REPO_ROOT, 'youtube_downloader.py')
+# 导入本模块到首次绘制的预算（毫秒）
+STARTUP_BUDGET_MS = 400
+FIRST_PAINT = '首次绘制'
+
+
+def run_once(home):
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', HOME=home, XDG_CONFIG_HOME=home, XDG_DATA_HOME=home,
+               APPDATA=home, PYTHONWARNINGS='ignore')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, SCRIPT, '--profile-startup'], env=env, capture_output=True,
+                            text=True, timeout=60)
+    elapsed = (time.perf_counter() - start) * 1000
+    stages = {}
+    for line in result.stderr.splitlines():
+        parts = line.split('\t')
+        if len(parts) == 3 and parts[2].startswith('累计'):
+            stages[parts[0]] = (float(parts[1].split()[0]), float(parts[2].split()[1]))
+    if result.returncode != 0 or FIRST_PAINT not in stages:
+        raise RuntimeError(f'启动失败（退出码 {result.returncode}）:\n{result.stderr}')
+    return elapsed, stages
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else STARTUP_BUDGET_MS
+    results = []
+    with tempfile.TemporaryDirectory(prefix='ytdl_bench_home_') as home:
+        # 第一次运行创建设置和缓存文件，并让字节码缓存生效，不计入结果
+        run_once(home)
+        for _ in range(runs):
+            results.append(run_once(home))
+
+    names = list(results[0][1])
+    for name in names:
+        own = statistics.median(stages[name][0] for _, stages in results)
+        total = statistics.median(stages[name][1] for _, stages in results)
+        print(f'{name:<14} {own:7.1f} ms   累计 {total:7.1f} ms')
+    first_paint = statistics.median(stages[FIRST_PAINT][1] for _, stages in results)
+    process = statistics.median(elapsed for elapsed, _ in results)
+    print(f'首次绘制 {first_paint:.1f} ms（预算 {budget:.0f} ms），进程总耗时 {process:.1f} ms，{runs} 次的中位数')
+    return 0 if first_paint <= budget else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""测量切换深色/浅色主题的耗时
+
+用法: python benchmarks/bench_theme_toggle.py [每轮切换次数] [轮数]
+
+在offscreen平台上反复切换主题，每次切换后同步重绘窗口，取中位数。
+三组交替测量，每组使用新建的主窗口：
+- 旧实现：每次从字符串设置整张样式表、从磁盘重新加载并缩放图标，部分部件另有自己的内联样式表
+- 新实现：ThemeManager，两种主题的样式表是常量，图标渲染一次后缓存，部件样式并入主题样式表
+- 仅重绘：不切换主题，只做同样的重绘和事件处理，作为对照
+新旧实现耗时相差无几：两者都要在主窗口上设置整张样式表，由Qt重新计算所有部件的样式并重新布局，
+与仅重绘的差值就是这部分的耗时。改用调色板切换颜色也省不掉它，见 theme.ThemeManager 的说明。
+"""
+import os
+import sys
+import time
+import tempfile
+import statistics
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+# 设置写入临时目录，不影响真实的设置
+os.environ['XDG_CONFIG_HOME'] = tempfile.mkdtemp(prefix='ytdl_bench_config_')
+
+import local_server  # noqa: F401  设置仓库根目录的导入路径
+from PyQt5.QtCore import Qt  # noqa: E402
+from PyQt5.QtGui import QPixmap  # noqa: E402
+from PyQt5.QtWidgets import QApplication, QWidget  # noqa: E402
+
+import youtube_downloader  # noqa: E402
+from theme import STYLESHEETS, WIDGET_STYLES, THEME_DARK, THEME_LIGHT  # noqa: E402
+
+# 旧实现中各部件上的内联样式
+INLINE_STYLES = {
+    'title_label': 'font-size: 24px; font-weight: bold; color: #FF0000;',
+    'preview_frame': 'background-color: #eee; border-radius: 4px;',
+    'thumbnail_label': 'font-size: 16px; color: #888;',
+    'info_frame': 'background-color: #eee; border-radius: 4px;',
+    'info_browser': 'background-color: transparent; border: none;',
+    'browse_button': 'background-color: #555; padding: 6px 12px;',
+    'cancel_button': 'background-color: #555;',
+    'footer_label': 'color: #888; font-size: 12px;',
+}
+
+
+def legacy_apply(window, dark):
+    logo_path = os.path.join(window.resource_dir, 'youtube_logo.svg')
+    if os.path.exists(logo_path):
+        window.logo_label.setPixmap(QPixmap(logo_path).scaled(180, 60, Qt.KeepAspectRatio,
+                                                              Qt.SmoothTransformation))
+    # 旧实现的样式表不含部件样式，部件样式是各自的内联样式表
+    window.setStyleSheet(STYLESHEETS[THEME_DARK if dark else THEME_LIGHT].replace(WIDGET_STYLES, ''))
+
+
+# 每组测量先切换几次预热，不计入结果
+WARMUP = 4
+# 两种实现交替测量的轮数
+ROUNDS = 6
+
+
+def measure(app, window, apply, count):
+    samples = []
+    dark = window.dark_mode
+    for index in range(WARMUP + count):
+        dark = not dark
+        start = time.perf_counter()
+        apply(dark)
+        window.repaint()
+        app.processEvents()
+        if index >= WARMUP:
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def open_window(app, legacy):
+    """新建主窗口并返回 (窗口, 切换函数)；每组测量使用新窗口，互不影响缓存和样式状态"""
+    window = youtube_downloader.YouTubeDownloader()
+    window.resize(900, 800)
+    window.show()
+    app.processEvents()
+    if legacy is None:
+        return window, lambda dark: None
+    if legacy:
+        for name, style in INLINE_STYLES.items():
+            window.findChild(QWidget, name).setStyleSheet(style)
+        return window, lambda dark: legacy_apply(window, dark)
+
+    def apply_new(dark):
+        window.dark_mode = dark
+        window.apply_theme()
+    return window, apply_new
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else ROUNDS
+    app = QApplication(sys.argv)
+    samples = {'旧实现': [], '新实现': [], '仅重绘': []}
+    for index in range(rounds):
+        # 两种实现轮流先测，避免先测的一方总是承担缓存和分配器预热的代价
+        order = list(samples) if index % 2 == 0 else list(reversed(samples))
+        for label in order:
+            window, apply = open_window(app, None if label == '仅重绘' else label == '旧实现')
+            samples[label] += measure(app, window, apply, count)
+            window.close()
+            window.deleteLater()
+            app.processEvents()
+
+    for label, values in samples.items():
+        print(f'{label}: 中位数 {statistics.median(values):6.2f} ms，最大 {max(values):6.2f} ms'
+              f'（{rounds} 轮 × {count} 次切换）')
+    medians = {label: statistics.median(values) for label, values in samples.items()}
+    print(f'新实现 / 旧实现 = {medians["新实现"] / medians["旧实现"]:.2f}')
+    print(f'重新计算样式和布局约占新实现耗时的 '
+          f'{(medians["新实现"] - medians["仅重绘"]) / medians["新实现"]:.0%}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""基准测试共用的本地HTTP服务器和假提取器插件"""
+import os
+import sys
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 让基准脚本可以直接导入仓库根目录下的模块
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# 假提取器：把 fakebench:<id> 解析为本地服务器上的媒体文件，
+# 以 hls 开头的ID解析为分片的HLS流，以 split 开头的ID解析为分开的视频流和音频流，
+# list-<数量> 解析为逐页枚举的播放列表
+FAKE_EXTRACTOR_SOURCE = '''
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class FakeBenchIE(InfoExtractor):
+    _VALID_URL = r'fakebench:(?P<port>\\d+):(?P<id>[\\w-]+)'
+
+    def _real_extract(self, url):
+        port, video_id = self._match_valid_url(url).group('port', 'id')
+        if video_id.startswith('list-'):
+            return self.playlist_result(self._entries(port, video_id), video_id, 'bench-' + video_id)
+        # 模拟提取阶段的网络往返，服务器据此统计提取次数
+        self._download_webpage(f'http://127.0.0.1:{port}/extract/{video_id}', video_id)
+        if video_id.startswith('hls'):
+            return {
+                'id': video_id,
+                'title': 'bench-' + video_id,
+                'url': f'http://127.0.0.1:{port}/hls/{video_id}.m3u8',
+                'ext': 'ts',
+                'protocol': 'm3u8_native',
+            }
+        if video_id.startswith('split'):
+            # 视频流和音频流都是完整的媒体数据，合并需要ffmpeg
+            return {
+                'id': video_id,
+                'title': 'bench-' + video_id,
+                'formats': [{
+                    'format_id': 'v',
+                    'url': f'http://127.0.0.1:{port}/media/{video_id}-v.mp4',
+                    'ext': 'mp4', 'vcodec': 'avc1.640028', 'acodec': 'none', 'width': 1920, 'height': 1080,
+                }, {
+                    'format_id': 'a',
+                    'url': f'http://127.0.0.1:{port}/media/{video_id}-a.m4a',
+                    'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2',
+                }],
+            }
+        return {
+            'id': video_id,
+            'title': 'bench-' + video_id,
+            'url': f'http://127.0.0.1:{port}/media/{video_id}.mp4',
+            'ext': 'mp4',
+        }
+
+    def _entries(self, port, list_id):
+        # 每页20个条目，每读取一页请求一次服务器，模拟列表分页
+        count = int(list_id.split('-')[1])
+        for index in range(count):
+            if index % 20 == 0:
+                self._download_webpage(f'http://127.0.0.1:{port}/extract/{list_id}-page{index // 20}', list_id)
+            item_id = f'entry{index}-of-{count}'
+            yield self.url_result(f'fakebench:{port}:{item_id}', FakeBenchIE, item_id, 'bench-' + item_id)
+'''
+
+
+def install_fake_extractor(directory):
+    """在directory下生成yt-dlp插件包，返回需要加入PYTHONPATH的路径"""
+    plugin_dir = os.path.join(directory, 'yt_dlp_plugins', 'extractor')
+    os.makedirs(plugin_dir, exist_ok=True)
+    with open(os.path.join(plugin_dir, 'fakebench.py'), 'w', encoding='utf-8') as f:
+        f.write(FAKE_EXTRACTOR_SOURCE)
+    return directory
+
+
+class LocalMediaServer:
+    """在后台线程中提供媒体文件，记录每个请求首字节的发送时间
+
+    同一份数据也按 segment_count 切分为HLS分片提供，每个分片请求先等待
+    segment_latency 秒，模拟CDN上每个分片的往返延迟。
+    """
+
+    def __init__(self, payload_size=8 * 1024 * 1024, rate_limit=None, extract_delay=0.0,
+                 segment_count=16, segment_latency=0.0):
+        self.payload = os.urandom(payload_size)
+        self.rate_limit = rate_limit  # 每个连接的字节/秒，None表示不限速
+        self.extract_delay = extract_delay  # 模拟提取耗时（秒）
+        self.segment_count = segment_count
+        self.segment_latency = segment_latency
+        self.segment_requests = 0
+        self.extract_count = 0
+        self.first_byte_times = []
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._send(head_only=True)
+
+            def do_GET(self):
+                self._send(head_only=False)
+
+            def _send(self, head_only):
+                if self.path.startswith('/extract/'):
+                    self._send_extract()
+                    return
+                if self.path.startswith('/hls/'):
+                    self._send_hls(head_only)
+                    return
+                data = server.payload
+                start, end = 0, len(data) - 1
+                range_header = self.headers.get('Range')
+                if range_header and range_header.startswith('bytes='):
+                    first, _, last = range_header[6:].partition('-')
+                    start = int(first or 0)
+                    end = min(end, int(last)) if last else end
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+                else:
+                    self.send_response(200)
+                body = data[start:end + 1]
+                self.send_header('Content-Type', 'video/mp4')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Accept-Ranges', 'bytes')
+                self.end_headers()
+                if head_only:
+                    return
+                server.stream(self.wfile, body)
+
+            def _send_hls(self, head_only):
+                name = self.path[len('/hls/'):]
+                if name.endswith('.m3u8'):
+                    body = server.playlist(name[:-len('.m3u8')]).encode()
+                    content_type = 'application/vnd.apple.mpegurl'
+                else:
+                    with server.lock:
+                        server.segment_requests += 1
+                    time.sleep(server.segment_latency)
+                    body = server.segment(int(name.rsplit('/', 1)[1].split('.')[0]))
+                    content_type = 'video/mp2t'
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if not head_only:
+                    server.stream(self.wfile, body)
+
+            def _send_extract(self):
+                with server.lock:
+                    server.extract_count += 1
+                time.sleep(server.extract_delay)
+                body = b'<html><body>fake</body></html>'
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def playlist(self, video_id):
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:2', '#EXT-X-MEDIA-SEQUENCE:0']
+        for index in range(self.segment_count):
+            lines += ['#EXTINF:2.0,', f'/hls/{video_id}/{index}.ts']
+        lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines) + '\n'
+
+    def segment(self, index):
+        size = -(-len(self.payload) // self.segment_count)
+        return self.payload[index * size:(index + 1) * size]
+
+    def stream(self, wfile, body, chunk_size=64 * 1024):
+        """按块写出数据，设置了rate_limit时按速率节流"""
+        started = time.perf_counter()
+        sent = 0
+        try:
+            for offset in range(0, len(body), chunk_size):
+                chunk = body[offset:offset + chunk_size]
+                wfile.write(chunk)
+                if sent == 0:
+                    with self.lock:
+                        self.first_byte_times.append(time.perf_counter())
+                sent += len(chunk)
+                with self.lock:
+                    self.bytes_sent += len(chunk)
+                if self.rate_limit:
+                    delay = sent / self.rate_limit - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.port}{path}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,89 @@
+import os
+import threading
+
+from metadata_cache import default_data_dir
+from video_metadata import extract_video_id
+
+
+def archive_id(extractor_key, video_id):
+    """与yt-dlp相同的记录格式：小写的提取器名 + 空格 + 视频ID"""
+    return f'{extractor_key.lower()} {video_id}'
+
+
+def archive_id_for(url, info=None):
+    """不访问网络求出任务的记录ID，无法确定时返回None
+
+    优先使用信息字典或平铺条目中的提取器和ID，否则从YouTube链接中解析视频ID
+    """
+    if info and info.get('id'):
+        extractor_key = info.get('extractor_key') or info.get('ie_key')
+        if extractor_key:
+            return archive_id(extractor_key, info['id'])
+    video_id = extract_video_id(url)
+    if video_id:
+        return archive_id('Youtube', video_id)
+    return None
+
+
+class DownloadArchive:
+    """已下载视频的记录，与yt-dlp的 --download-archive 文件格式相同
+
+    所有记录保存在内存中的集合里，查询不需要读文件；
+    新记录逐行追加到文件末尾，崩溃时最多丢失正在写入的一行。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(default_data_dir(), 'download_archive.txt')
+        self.lock = threading.Lock()
+        self.ids = set(self._read(self.path)) if os.path.exists(self.path) else set()
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def _read(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+    def __contains__(self, item):
+        return item is not None and item in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, item):
+        """记录一个已下载的视频，已存在时不重复写入"""
+        if item is None:
+            return
+        with self.lock:
+            # 关闭后才结束的下载不再写入
+            if item in self.ids or self.file.closed:
+                return
+            self.ids.add(item)
+            self.file.write(item + '\n')
+            self.file.flush()
+
+    def import_file(self, path):
+        """合并yt-dlp格式的记录文件，返回新增的记录数"""
+        items = dict.fromkeys(self._read(path))
+        with self.lock:
+            if self.file.closed:
+                return 0
+            new_ids = [item for item in items if item not in self.ids]
+            self.ids.update(new_ids)
+            self.file.writelines(item + '\n' for item in new_ids)
+            self.file.flush()
+        return len(new_ids)
+
+    def export_file(self, path):
+        """把全部记录写成yt-dlp可以直接使用的 --download-archive 文件"""
+        with self.lock:
+            ids = sorted(self.ids)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(item + '\n' for item in ids)
+        return len(ids)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
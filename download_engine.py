@@ -0,0 +1,747 @@
+import os
+import json
+import time
+import signal
+import tempfile
+import threading
+import subprocess
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+
+from progress import (ProgressEvent, parse_progress_line, DOWNLOAD_TEMPLATE, POSTPROCESS_TEMPLATE,
+                      STAGE_MERGE, STAGE_POSTPROCESS)
+from bandwidth import TokenBucket, MIN_RELAUNCH_INTERVAL, RELAUNCH_THRESHOLD
+from format_selector import FormatConstraints
+from merge_planner import OUTPUT_TEMPLATE
+
+# 进程内引擎依赖yt_dlp模块，未安装时回退到子进程引擎。导入yt_dlp要花零点几秒，
+# 推迟到第一次创建进程内引擎时（或由界面在显示窗口后于后台线程中预先）导入
+yt_dlp = None
+_yt_dlp_lock = threading.Lock()
+
+
+def yt_dlp_available():
+    """yt_dlp模块是否可用，只查找不导入"""
+    return yt_dlp is not None or importlib.util.find_spec('yt_dlp') is not None
+
+
+def load_yt_dlp():
+    """导入并返回yt_dlp模块，未安装时返回None；可以在任意线程中调用"""
+    global yt_dlp
+    with _yt_dlp_lock:
+        if yt_dlp is None:
+            try:
+                import yt_dlp as module
+            except ImportError:
+                return None
+            yt_dlp = module
+    return yt_dlp
+
+
+# 已提取信息中的格式URL会过期，超过这个时间（秒）就重新提取
+INFO_MAX_AGE = 3 * 3600
+
+# 取消时等待yt-dlp进程退出的时间（秒），超时后强制结束整个进程组
+KILL_TIMEOUT = 3
+
+# 展开后仍是列表的条目（例如频道主页下的“视频”“Shorts”标签页）由这些提取器处理，需要继续展开
+CONTAINER_EXTRACTORS = ('YoutubeTab',)
+# 继续展开的最大层数
+MAX_EXPAND_DEPTH = 2
+
+# 视频类型（与界面选项一致）
+VIDEO_TYPE_NORMAL = "普通视频 (横屏)"
+VIDEO_TYPE_SHORTS = "Shorts (竖屏)"
+VIDEO_TYPES = [VIDEO_TYPE_NORMAL, VIDEO_TYPE_SHORTS]
+
+
+class EngineError(Exception):
+    """引擎无法完成提取或下载"""
+
+
+def get_format_option(video_type, constraints=None):
+    """根据视频类型和约束生成yt-dlp格式字符串
+
+    有格式表时下载队列会用format_selector直接选定format_id，这个字符串只在无法选择时使用。
+    Shorts是竖屏视频，画质上限作用于宽度（短边）。
+    """
+    constraints = constraints or FormatConstraints()
+    return constraints.to_format_string(vertical=video_type == VIDEO_TYPE_SHORTS)
+
+
+def is_info_fresh(info, max_age=INFO_MAX_AGE):
+    """判断已提取的信息字典是否还能直接用于下载"""
+    if not info or not info.get('formats') and not info.get('url'):
+        return False
+    epoch = info.get('epoch')
+    return bool(epoch) and time.time() - epoch < max_age
+
+
+def flat_entry(entry, source_url):
+    """把平铺提取得到的条目整理为 {url, id, title, duration, ie_key}，没有可用链接时返回None
+
+    平铺条目的 url 是视频页面；单个视频的完整信息中 url 是媒体地址，此时使用 webpage_url
+    """
+    if entry.get('_type') in ('url', 'url_transparent'):
+        url = entry.get('url')
+    else:
+        url = entry.get('webpage_url') or source_url
+    if not url:
+        return None
+    return {
+        'url': url,
+        'id': entry.get('id'),
+        'title': entry.get('title'),
+        'duration': entry.get('duration'),
+        'ie_key': entry.get('ie_key'),
+    }
+
+
+def build_extract_command(command, url):
+    """提取单个视频信息的yt-dlp命令行，输出与 --dump-json 相同"""
+    return command + [
+        '--dump-json',
+        '--no-playlist',
+        '--no-warnings',
+        '--no-check-certificate',
+        '--ignore-errors',
+        url
+    ]
+
+
+def error_text(line):
+    """去掉yt-dlp错误行开头的 ERROR:"""
+    line = line.strip()
+    return line[len('ERROR:'):].strip() if line.startswith('ERROR:') else line
+
+
+def engine_error(prefix, error=None):
+    """生成附上yt-dlp错误原因的 EngineError"""
+    return EngineError(f'{prefix}: {error}' if error else prefix)
+
+
+class ErrorLogger:
+    """传给 YoutubeDL 的 logger：丢弃普通输出，记住最后一条错误，失败时作为原因报告
+
+    也可以用 feed() 逐行读取yt-dlp命令行的输出
+    """
+
+    def __init__(self):
+        self.last_error = None
+        self.pending = False
+
+    def debug(self, message):
+        pass
+
+    def info(self, message):
+        pass
+
+    def warning(self, message):
+        pass
+
+    def error(self, message):
+        self.last_error = error_text(message)
+
+    def feed(self, line):
+        """读取一行命令行输出；重试用尽等错误的原因在 ERROR: 的下一行"""
+        if line.startswith('ERROR:'):
+            self.last_error = error_text(line) or None
+            self.pending = self.last_error is None
+        elif self.pending and line.strip():
+            self.last_error = line.strip()
+            self.pending = False
+
+
+def parse_info_output(returncode, stdout, stderr=''):
+    """解析提取命令的输出，失败时抛出 EngineError，附上yt-dlp的最后一条错误"""
+    if returncode != 0 or not stdout.strip():
+        logger = ErrorLogger()
+        for line in (stderr or '').splitlines():
+            logger.feed(line)
+        raise engine_error("无法获取视频信息", logger.last_error)
+    try:
+        return json.loads(stdout)
+    except ValueError:
+        raise EngineError("无法解析视频信息")
+
+
+def write_info_json(info):
+    """把信息字典写入临时文件，供 --load-info-json 使用，返回文件路径"""
+    fd, path = tempfile.mkstemp(prefix='yt_info_', suffix='.info.json')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    return path
+
+
+def process_group_options():
+    """Popen参数：让yt-dlp在独立的进程组中运行，取消时连同它启动的ffmpeg一起终止"""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def signal_process_tree(pid, force=False):
+    """终止以 pid 为首的进程组（Windows上是进程树），不等待退出"""
+    try:
+        if os.name == 'nt':
+            # taskkill /T 连同子进程一起结束
+            subprocess.Popen(['taskkill', '/T', '/F', '/PID', str(pid)], stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL, creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+        else:
+            os.killpg(pid, signal.SIGKILL if force else signal.SIGTERM)
+    except OSError:
+        pass
+
+
+def kill_process_trees(processes, timeout=KILL_TIMEOUT):
+    """终止这些进程及其子进程，timeout 秒内没有退出的强制结束，返回仍未退出的进程数"""
+    for process in processes:
+        if process.poll() is None:
+            signal_process_tree(process.pid)
+    deadline = time.monotonic() + timeout
+    stubborn = []
+    for process in processes:
+        try:
+            process.wait(max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            signal_process_tree(process.pid, force=True)
+            stubborn.append(process)
+    for process in stubborn:
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            pass
+    return sum(1 for process in stubborn if process.poll() is None)
+
+
+def partial_files(filename, format_id=None):
+    """下载 filename 中断后yt-dlp可能留下的文件：.part、分片和续传记录；
+    文件名含 .f<format_id> 时是等待合并的单个流，文件本身也算在内"""
+    directory, base = os.path.split(filename)
+    paths = [filename + '.part', filename + '.ytdl']
+    if format_id and os.path.splitext(base)[0].endswith('.f' + format_id):
+        paths.append(filename)
+    try:
+        names = os.listdir(directory or '.')
+    except OSError:
+        names = []
+    # 分片下载时每个分片是 <文件名>.part-Frag<序号>（下载中还带 .part）
+    prefix = base + '.part-Frag'
+    paths.extend(os.path.join(directory, name) for name in names if name.startswith(prefix))
+    return paths
+
+
+def remove_partial_files(downloads, outputs=()):
+    """删除中断的下载留下的文件，返回删除的路径
+
+    downloads 是 {下载的文件名: format_id}，outputs 是后处理的目标文件，
+    合并和修复时写入的 <名称>.temp.<扩展名> 一并删除；已经下载完整的成品不删除
+    """
+    paths = []
+    for filename, format_id in downloads.items():
+        paths.extend(partial_files(filename, format_id))
+    for filename in outputs:
+        stem, ext = os.path.splitext(filename)
+        paths.append(f'{stem}.temp{ext}')
+    removed = []
+    for path in dict.fromkeys(paths):
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        removed.append(path)
+    return removed
+
+
+class BaseEngine:
+    """下载引擎基类：负责元数据提取和下载，不依赖任何GUI"""
+    name = ''
+
+    def __init__(self):
+        self.is_cancelled = False
+        self.rate_limit = None  # 当前分得的限速（字节/秒），None表示不限速
+        # 下载时每次启动yt-dlp的 (耗时, 是否成功, 错误)：子进程从启动到第一行输出，进程内为创建YoutubeDL
+        self.spawns = []
+
+    def extract_info(self, url):
+        """返回与 yt-dlp --dump-json 相同结构的信息字典"""
+        raise NotImplementedError
+
+    def download(self, url, output_path, format_option, progress_callback, info=None, profile=None,
+                 plan=None):
+        """下载视频，progress_callback(ProgressEvent) 报告进度，返回是否成功
+
+        传入已提取的 info 时直接复用其中的格式列表，不再重新解析URL；
+        profile 是 DownloadProfile，决定分片并发数、分块和缓冲区大小；
+        plan 是 MergePlan，决定合并的容器和中间文件的位置
+        """
+        raise NotImplementedError
+
+    def iter_entries(self, url):
+        """平铺展开播放列表或频道，边枚举边产生 flat_entry 条目
+
+        只读取列表页，不解析各个视频；不是列表的链接只产生它自己。
+        失败时抛出 EngineError，已经枚举到一部分条目时先产生这些条目，再抛出
+        """
+        raise NotImplementedError
+
+    def set_rate_limit(self, rate):
+        """调整下载限速，可以在下载过程中从其他线程调用"""
+        self.rate_limit = rate
+
+    def cancel(self):
+        self.is_cancelled = True
+
+
+class SubprocessEngine(BaseEngine):
+    """每次调用都启动一个yt-dlp进程（原有实现，作为回退）"""
+    name = 'subprocess'
+    # yt-dlp可执行文件，基准测试可以替换成 [sys.executable, '-m', 'yt_dlp']
+    command = ['yt-dlp']
+
+    def __init__(self):
+        super().__init__()
+        self.processes = []  # 正在运行的yt-dlp进程，同时下载多个流时不止一个
+
+    def extract_info(self, url):
+        process = subprocess.Popen(
+            build_extract_command(self.command, url),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            universal_newlines=True,
+            **process_group_options()
+        )
+        # 放入processes，cancel() 可以终止正在进行的提取
+        self.processes.append(process)
+        try:
+            if self.is_cancelled:
+                kill_process_trees([process])
+            stdout, stderr = process.communicate()
+        finally:
+            self.processes.remove(process)
+        if self.is_cancelled:
+            raise EngineError("已取消")
+        return parse_info_output(process.returncode, stdout, stderr)
+
+    def iter_entries(self, url, depth=0):
+        cmd = self.command + [
+            '--flat-playlist',
+            '--lazy-playlist',  # 逐页输出条目，不等整个列表枚举完
+            '--dump-json',
+            '--yes-playlist',
+            '--no-warnings',
+            '--no-check-certificate',
+            '--ignore-errors',
+            url
+        ]
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            universal_newlines=True,
+            **process_group_options()
+        )
+        self.processes.append(process)
+        # 错误输出在另一个线程中读取，避免管道写满后yt-dlp阻塞
+        errors = ErrorLogger()
+        reader = threading.Thread(target=lambda: [errors.feed(line) for line in iter(process.stderr.readline, '')],
+                                  daemon=True)
+        reader.start()
+        produced = False
+        nested_error = None
+        try:
+            for line in iter(process.stdout.readline, ''):
+                if self.is_cancelled:
+                    return
+                try:
+                    entry = flat_entry(json.loads(line), url)
+                except ValueError:
+                    continue
+                if entry is None:
+                    continue
+                produced = True
+                if entry['ie_key'] in CONTAINER_EXTRACTORS and depth < MAX_EXPAND_DEPTH:
+                    try:
+                        yield from self.iter_entries(entry['url'], depth + 1)
+                    except EngineError as e:
+                        # 某个标签页读取失败时继续展开其余的标签页，全部展开后再报告
+                        nested_error = str(e)
+                else:
+                    yield entry
+            process.wait()
+            reader.join()
+        finally:
+            kill_process_trees([process])
+            self.processes.remove(process)
+        if self.is_cancelled:
+            return
+        if not produced and depth == 0:
+            raise engine_error("无法获取播放列表", errors.last_error)
+        if process.returncode != 0:
+            # 列表中途出错（某一页读取失败等），前面的条目已经产生
+            raise engine_error("播放列表没有完整展开", errors.last_error)
+        if nested_error:
+            raise EngineError(nested_error)
+
+    def build_download_command(self, url, output_path, format_option, info_path=None, profile=None,
+                               rate_limit=None, plan=None):
+        # 有已提取的信息文件时用 --load-info-json 代替URL，跳过第二次提取
+        source = ['--load-info-json', info_path] if info_path else [url]
+        tuning = profile.to_args() if profile else []
+        if rate_limit:
+            tuning += ['--limit-rate', str(int(rate_limit))]
+        output = plan.to_args(output_path) if plan else ['-o', os.path.join(output_path, OUTPUT_TEMPLATE)]
+        return self.command + [
+            '--newline',  # 确保进度信息正确输出
+            # 每行输出一条JSON进度，由progress.parse_progress_line解析
+            '--progress-template', DOWNLOAD_TEMPLATE,
+            '--progress-template', POSTPROCESS_TEMPLATE,
+            '-f', format_option,
+        ] + output + [
+            '--no-warnings',  # 不显示警告
+            '--no-check-certificate',  # 不检查证书
+            '--ignore-errors',  # 忽略错误
+            '--no-playlist',  # 不下载播放列表
+            '--continue',  # 从 .part 文件续传，恢复中断的任务
+        ] + tuning + source
+
+    def build_stream_command(self, format_id, template, info_path, profile=None, rate_limit=None):
+        """只下载合并所需的一个流，不做修复和后处理，文件名与yt-dlp合并时的中间文件相同"""
+        tuning = profile.to_args() if profile else []
+        if rate_limit:
+            tuning += ['--limit-rate', str(int(rate_limit))]
+        return self.command + [
+            '--newline',
+            '--progress-template', DOWNLOAD_TEMPLATE,
+            '-f', format_id,
+            '-o', template,
+            '--fixup', 'never',
+            '--no-warnings',
+            '--no-check-certificate',
+            '--no-playlist',
+            '--continue',
+        ] + tuning + ['--load-info-json', info_path]
+
+    def download(self, url, output_path, format_option, progress_callback, info=None, profile=None,
+                 plan=None):
+        info_path = write_info_json(info) if is_info_fresh(info) else None
+        lock = threading.Lock()
+
+        def report(event):
+            # 同时下载多个流时进度来自多个线程
+            with lock:
+                progress_callback(event)
+
+        try:
+            if plan and plan.parallel and info_path:
+                # 各个流同时下载，完成后下面的合并运行会直接使用已下载的文件
+                share = 1.0 / len(plan.streams)
+                template = plan.stream_template(output_path)
+                with ThreadPoolExecutor(len(plan.streams)) as pool:
+                    results = list(pool.map(
+                        lambda format_id: self._run(
+                            lambda rate: self.build_stream_command(format_id, template, info_path, profile, rate),
+                            report, share),
+                        plan.streams))
+                if not all(results):
+                    return False
+            return self._run(
+                lambda rate: self.build_download_command(url, output_path, format_option, info_path, profile,
+                                                         rate, plan),
+                report)
+        finally:
+            if info_path:
+                os.remove(info_path)
+
+    def _run(self, build_command, progress_callback, share=1.0):
+        """运行一个yt-dlp进程直到结束：成功返回True，取消返回False，失败时抛出附上原因的 EngineError
+
+        share 是这个进程占本任务限速的比例；分得的限速变化时用新的 --limit-rate 重启，
+        --continue 从 .part 文件接着下载
+        """
+        while not self.is_cancelled:
+            launched_rate = self._share(share)
+            launched_at = time.monotonic()
+            # 启动进程并捕获输出
+            try:
+                process = subprocess.Popen(
+                    build_command(launched_rate),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    bufsize=1,
+                    universal_newlines=True,
+                    # yt-dlp合并时启动的ffmpeg也在这个进程组中，取消时一起终止
+                    **process_group_options()
+                )
+            except OSError as e:
+                self.spawns.append((time.monotonic() - launched_at, False, str(e)))
+                raise EngineError(f"无法启动yt-dlp: {e}")
+            self.processes.append(process)
+            try:
+                if self.is_cancelled:
+                    # 在放入processes之前取消的，cancel() 没有终止这个进程
+                    kill_process_trees([process])
+                    return False
+                # 解析输出并发送进度
+                stage = None
+                relaunch = False
+                spawned = False
+                errors = ErrorLogger()
+                for line in iter(process.stdout.readline, ''):
+                    if not spawned:
+                        # 第一行输出说明解释器和yt-dlp已经加载完毕
+                        self.spawns.append((time.monotonic() - launched_at, True, None))
+                        spawned = True
+                    if self.is_cancelled:
+                        kill_process_trees([process])
+                        return False
+                    errors.feed(line)
+                    event = parse_progress_line(line)
+                    if event is not None:
+                        stage = event.stage
+                        progress_callback(event)
+                    if stage not in (STAGE_MERGE, STAGE_POSTPROCESS) and \
+                            self._needs_relaunch(launched_rate, launched_at, share):
+                        kill_process_trees([process])
+                        relaunch = True
+                        break
+
+                if not relaunch:
+                    success = process.wait() == 0
+                    if not spawned:
+                        self.spawns.append((time.monotonic() - launched_at, success,
+                                            None if success else errors.last_error or f'退出码 {process.returncode}'))
+                    if self.is_cancelled:
+                        return False
+                    if not success:
+                        raise engine_error("下载失败", errors.last_error)
+                    return True
+            finally:
+                self.processes.remove(process)
+        return False
+
+    def _share(self, share):
+        return int(self.rate_limit * share) if self.rate_limit else None
+
+    def _needs_relaunch(self, launched_rate, launched_at, share=1.0):
+        current = self._share(share)
+        if current == launched_rate:
+            return False
+        lowered = current and (not launched_rate or current < launched_rate)
+        # 降低限速立即生效以免超出总限速，提高限速时限制重启频率
+        if not lowered and time.monotonic() - launched_at < MIN_RELAUNCH_INTERVAL:
+            return False
+        if not current or not launched_rate:
+            return True
+        return abs(current - launched_rate) / launched_rate > RELAUNCH_THRESHOLD
+
+    def cancel(self):
+        """终止所有yt-dlp进程及其子进程；在后台线程中等待退出，调用方不会被阻塞
+
+        合并时yt-dlp不输出任何内容、连接停滞时也没有输出，不能等读到下一行再检查取消标志
+        """
+        super().cancel()
+        processes = [process for process in self.processes if process.poll() is None]
+        if processes:
+            threading.Thread(target=kill_process_trees, args=(processes,), name='kill-yt-dlp',
+                             daemon=True).start()
+
+
+class InProcessEngine(BaseEngine):
+    """在当前进程中驱动 yt_dlp.YoutubeDL，省去解释器启动和提取器初始化"""
+    name = 'inprocess'
+
+    def __init__(self):
+        super().__init__()
+        load_yt_dlp()
+        # 限速在进度回调中按令牌桶执行：yt-dlp自带的ratelimit按整个传输的平均速度计算，
+        # 下载中途降低限速会长时间停顿，而且不作用于并发分片的总和
+        self.bucket = TokenBucket()
+
+    def set_rate_limit(self, rate):
+        super().set_rate_limit(rate)
+        self.bucket.set_rate(rate)
+
+    def _pace(self, count):
+        """按当前限速暂停，分段睡眠以便及时响应取消"""
+        delay = self.bucket.consume(count)
+        deadline = time.monotonic() + delay
+        while delay > 0 and not self.is_cancelled:
+            time.sleep(min(delay, 0.1))
+            delay = deadline - time.monotonic()
+
+    def _base_params(self, logger):
+        """logger 是 ErrorLogger，出错时从中取出yt-dlp报告的原因"""
+        return {
+            'logger': logger,
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'no_color': True,
+            'nocheckcertificate': True,
+            'ignoreerrors': True,
+            'noplaylist': True,
+            'continuedl': True,  # 从 .part 文件续传，恢复中断的任务
+        }
+
+    def extract_info(self, url):
+        logger = ErrorLogger()
+        with yt_dlp.YoutubeDL(self._base_params(logger)) as ydl:
+            info = ydl.extract_info(url, download=False)
+            if not info:
+                raise engine_error("无法获取视频信息", logger.last_error)
+            # 与 --dump-json 输出保持一致，便于缓存和序列化
+            return ydl.sanitize_info(info)
+
+    def iter_entries(self, url):
+        logger = ErrorLogger()
+        params = self._base_params(logger)
+        params.update({
+            'noplaylist': False,
+            'extract_flat': 'in_playlist',
+            'lazy_playlist': True,
+        })
+        with yt_dlp.YoutubeDL(params) as ydl:
+            # process=False 时列表条目是生成器，提取器每读取一页就能产生一批条目
+            result = ydl.extract_info(url, download=False, process=False)
+            if not result:
+                raise engine_error("无法获取播放列表", logger.last_error)
+            yield from self._walk(ydl, result, url, 0)
+        if logger.last_error and not self.is_cancelled:
+            # ignoreerrors 时读取某一页或嵌套的列表失败只记录错误，前面的条目已经产生
+            raise engine_error("播放列表没有完整展开", logger.last_error)
+
+    def _walk(self, ydl, result, url, depth):
+        if result.get('_type') not in ('playlist', 'multi_video'):
+            entry = flat_entry(result, url)
+            if entry is not None:
+                yield entry
+            return
+        try:
+            for item in result.get('entries') or []:
+                if self.is_cancelled:
+                    return
+                if not item:
+                    continue
+                if item.get('_type') == 'playlist':
+                    yield from self._walk(ydl, item, url, depth)
+                    continue
+                entry = flat_entry(item, url)
+                if entry is None:
+                    continue
+                if entry['ie_key'] in CONTAINER_EXTRACTORS and depth < MAX_EXPAND_DEPTH:
+                    nested = ydl.extract_info(entry['url'], download=False, process=False, ie_key=entry['ie_key'])
+                    if nested:
+                        yield from self._walk(ydl, nested, entry['url'], depth + 1)
+                else:
+                    yield entry
+        except yt_dlp.utils.YoutubeDLError as e:
+            # 列表的某一页（或某个标签页）读取失败：记下错误，继续展开上一层的其余条目，
+            # iter_entries 全部展开后再报告
+            ydl.report_error(error_text(str(e)))
+
+    def download(self, url, output_path, format_option, progress_callback, info=None, profile=None,
+                 plan=None):
+        received = {}  # 每个文件上次报告的字节数
+        lock = threading.Lock()
+
+        def progress_hook(d):
+            if self.is_cancelled:
+                # 在下载循环内抛出，yt-dlp会立即中止当前传输
+                raise yt_dlp.utils.DownloadCancelled()
+            downloaded = d.get('downloaded_bytes')
+            if downloaded is not None:
+                key = d.get('tmpfilename') or d.get('filename')
+                # 续传时第一次报告的字节数包含之前下载的部分，不计入限速
+                delta = downloaded - received.get(key, downloaded)
+                received[key] = downloaded
+                if delta > 0:
+                    self._pace(delta)
+            # 同时下载多个流时进度来自多个线程
+            with lock:
+                progress_callback(ProgressEvent.from_hook(d))
+
+        def postprocessor_hook(d):
+            if self.is_cancelled:
+                # 每个后处理开始前都会调用，取消后不再启动合并或修复
+                raise yt_dlp.utils.DownloadCancelled()
+            with lock:
+                progress_callback(ProgressEvent.from_postprocess(d))
+
+        logger = ErrorLogger()
+        params = self._base_params(logger)
+        params.update({
+            'format': format_option,
+            'outtmpl': os.path.join(output_path, plan.output_template if plan else OUTPUT_TEMPLATE),
+            'progress_hooks': [progress_hook],
+            'postprocessor_hooks': [postprocessor_hook],
+        })
+        if profile:
+            params.update(profile.to_params())
+        if plan:
+            params.update(plan.to_params(output_path))
+
+        info_path = write_info_json(info) if is_info_fresh(info) else None
+        try:
+            if plan and plan.parallel and info_path:
+                # 各个流同时下载，完成后下面的下载直接合并已下载的文件
+                if not self._fetch_streams(params, info_path, plan, output_path):
+                    if self.is_cancelled:
+                        return False
+                    raise engine_error("下载失败", logger.last_error)
+            created = time.monotonic()
+            with yt_dlp.YoutubeDL(params) as ydl:
+                self.spawns.append((time.monotonic() - created, True, None))
+                if info_path:
+                    # 与 --load-info-json 相同：直接按已有格式列表选择并下载，
+                    # 如果格式URL已失效，yt-dlp会自动回退到重新提取webpage_url
+                    return_code = ydl.download_with_info_file(info_path)
+                else:
+                    return_code = ydl.download([url])
+        except yt_dlp.utils.DownloadCancelled:
+            return False
+        finally:
+            if info_path:
+                os.remove(info_path)
+        if self.is_cancelled:
+            return False
+        if return_code != 0:
+            raise engine_error("下载失败", logger.last_error)
+        return True
+
+    def _fetch_streams(self, params, info_path, plan, output_path):
+        """同时下载合并所需的各个流，文件名与yt-dlp合并时的中间文件相同，
+        之后的正常下载会认出这些文件已下载完，直接开始合并"""
+        stream_params = dict(params, outtmpl=plan.stream_template(output_path), fixup='never')
+        for key in ('paths', 'merge_output_format', 'postprocessor_hooks'):
+            stream_params.pop(key, None)
+
+        def fetch(format_id):
+            created = time.monotonic()
+            with yt_dlp.YoutubeDL(dict(stream_params, format=format_id)) as ydl:
+                self.spawns.append((time.monotonic() - created, True, None))
+                return ydl.download_with_info_file(info_path) == 0
+
+        with ThreadPoolExecutor(len(plan.streams)) as pool:
+            results = list(pool.map(fetch, plan.streams))
+        return all(results) and not self.is_cancelled
+
+
+ENGINES = {
+    SubprocessEngine.name: SubprocessEngine,
+    InProcessEngine.name: InProcessEngine,
+}
+
+
+def create_engine(name='auto'):
+    """按名称创建引擎；auto 优先使用进程内引擎，yt_dlp 不可用时回退到子进程"""
+    if name in (None, '', 'auto'):
+        name = InProcessEngine.name if yt_dlp_available() else SubprocessEngine.name
+    if name == InProcessEngine.name and not yt_dlp_available():
+        name = SubprocessEngine.name
+    return ENGINES.get(name, SubprocessEngine)()
@@ -0,0 +1,99 @@
+import threading
+
+from progress import format_bytes
+
+# 默认的分块大小：按块发送Range请求，可避免YouTube对长连接限速
+DEFAULT_HTTP_CHUNK_SIZE = 10 * 1024 * 1024
+# 默认的读取缓冲区大小
+DEFAULT_BUFFER_SIZE = 256 * 1024
+# 分片并发数的上限
+MAX_CONCURRENT_FRAGMENTS = 16
+# 吞吐至少提升这个比例才认为增加并发有效
+MIN_THROUGHPUT_GAIN = 0.1
+# 下载量小于这个字节数的任务不参与自动调优，测得的吞吐误差太大
+MIN_SAMPLE_BYTES = 4 * 1024 * 1024
+
+
+class DownloadProfile:
+    """一次下载使用的性能参数：分片并发数、HTTP分块大小和缓冲区大小"""
+
+    def __init__(self, concurrent_fragments=1, http_chunk_size=DEFAULT_HTTP_CHUNK_SIZE,
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        self.concurrent_fragments = max(1, int(concurrent_fragments))
+        self.http_chunk_size = http_chunk_size or None
+        self.buffer_size = buffer_size or None
+
+    def to_params(self):
+        """转换为 yt_dlp.YoutubeDL 的参数"""
+        params = {'concurrent_fragment_downloads': self.concurrent_fragments}
+        if self.http_chunk_size:
+            params['http_chunk_size'] = self.http_chunk_size
+        if self.buffer_size:
+            params['buffersize'] = self.buffer_size
+        return params
+
+    def to_args(self):
+        """转换为 yt-dlp 命令行参数"""
+        args = ['--concurrent-fragments', str(self.concurrent_fragments)]
+        if self.http_chunk_size:
+            args += ['--http-chunk-size', str(self.http_chunk_size)]
+        if self.buffer_size:
+            args += ['--buffer-size', str(self.buffer_size)]
+        return args
+
+    def describe(self):
+        parts = [f'分片并发 {self.concurrent_fragments}']
+        if self.http_chunk_size:
+            parts.append('分块 ' + format_bytes(self.http_chunk_size))
+        if self.buffer_size:
+            parts.append('缓冲 ' + format_bytes(self.buffer_size))
+        return ' · '.join(parts)
+
+    def to_dict(self):
+        return {
+            'concurrent_fragments': self.concurrent_fragments,
+            'http_chunk_size': self.http_chunk_size,
+            'buffer_size': self.buffer_size,
+        }
+
+
+class ProfileTuner:
+    """为每个下载任务提供DownloadProfile，并按实测吞吐自动调整分片并发数
+
+    auto 为 False 时始终使用 base 中的固定设置。自动调优时从1开始，
+    每完成一个任务记录一次吞吐，吞吐仍在提升就把并发数加倍，
+    不再提升时回退到吞吐最高的并发数并固定下来。
+    """
+
+    def __init__(self, base=None, auto=True, maximum=MAX_CONCURRENT_FRAGMENTS):
+        self.base = base or DownloadProfile()
+        self.auto = auto
+        self.maximum = maximum
+        self.concurrency = 1 if auto else self.base.concurrent_fragments
+        self.best = None  # (并发数, 吞吐)
+        self.settled = not auto
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def next_profile(self):
+        with self.lock:
+            concurrency = self.concurrency
+        return DownloadProfile(concurrency, self.base.http_chunk_size, self.base.buffer_size)
+
+    def record(self, profile, downloaded_bytes, elapsed):
+        """记录一个完成的任务使用的参数和实测吞吐"""
+        if self.settled or elapsed <= 0 or downloaded_bytes < MIN_SAMPLE_BYTES:
+            return
+        throughput = downloaded_bytes / elapsed
+        with self.lock:
+            if self.settled or profile.concurrent_fragments != self.concurrency:
+                # 并发运行的任务可能还在用旧参数，只采纳当前参数的结果
+                return
+            self.samples[self.concurrency] = throughput
+            if self.best is None or throughput > self.best[1] * (1 + MIN_THROUGHPUT_GAIN):
+                self.best = (self.concurrency, throughput)
+                if self.concurrency < self.maximum:
+                    self.concurrency = min(self.maximum, self.concurrency * 2)
+                    return
+            self.concurrency = self.best[0]
+            self.settled = True
@@ -0,0 +1,642 @@
+import os
+import time
+import itertools
+import threading
+from contextlib import nullcontext
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from download_engine import create_engine, is_info_fresh, remove_partial_files, EngineError
+from video_metadata import extract_video_id, build_video_info
+from progress import ProgressEstimator, StageRecorder, expected_streams, STAGE_MERGE, STAGE_POSTPROCESS
+from download_profile import ProfileTuner
+from download_archive import archive_id_for
+from merge_planner import MergePlanner
+from output_planner import OutputPlanner
+from metrics import STAGE_SPAWN, STAGE_EXTRACT, STAGE_FIRST_BYTE, STAGE_JOB
+
+# 任务状态
+PENDING = 'pending'
+EXTRACTING = 'extracting'
+DOWNLOADING = 'downloading'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+SKIPPED = 'skipped'  # 下载记录中已有，没有下载
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED, SKIPPED)
+
+# 取消任务后如何处理已下载的部分
+PARTIAL_DELETE = 'delete'  # 删除 .part、分片、等待合并的流和合并的中间文件
+PARTIAL_KEEP = 'keep'  # 保留，重试时从 .part 续传
+
+# 线程池上限；实际并发由队列调度控制，可随时调整
+MAX_POOL_THREADS = 32
+# 单个下载流的典型吞吐（字节/秒），用于按带宽估算并发数
+TYPICAL_STREAM_RATE = 2 * 1024 * 1024
+# 下载进度写入任务日志的最小间隔（秒）
+JOURNAL_PROGRESS_INTERVAL = 2.0
+# 提前获取信息的等待任务数，以及同时进行的预取数
+PREFETCH_DEPTH = 3
+PREFETCH_WORKERS = 2
+# 等待预取结果时检查任务是否已取消的间隔（秒）
+PREFETCH_POLL_INTERVAL = 0.2
+
+
+def default_worker_count(bandwidth=None):
+    """根据CPU核数和（可选的）可用带宽估算默认并发下载数
+
+    下载主要受网络限制，但合并音视频时会占用CPU，因此按核数的两倍封顶；
+    已知带宽（字节/秒）时，再按单个流的典型吞吐限制并发数。
+    """
+    count = max(2, (os.cpu_count() or 1) * 2)
+    if bandwidth:
+        count = min(count, max(1, int(bandwidth // TYPICAL_STREAM_RATE)))
+    return max(1, min(count, 8))
+
+
+class DownloadJob:
+    """队列中的一个下载任务"""
+    _ids = itertools.count(1)
+
+    def __init__(self, url, output_path, format_option, info=None, journal_id=None, constraints=None):
+        self.id = next(self._ids)
+        self.url = url
+        self.output_path = output_path
+        self.format_option = format_option
+        self.constraints = constraints  # FormatConstraints，有格式表时据此直接选定format_id
+        self.format_choice = None  # 选定的FormatChoice
+        self.plan = None  # 本次下载的MergePlan
+        self.target = None  # 占用的输出文件名（OutputTarget），重试时沿用
+        self.stages = None  # 各阶段耗时和写入字节数的StageRecorder
+        self.download_started = None  # 开始下载的时刻（monotonic）
+        self.first_byte_at = None  # 收到第一个字节的时刻
+        self.written = {}  # 下载过的文件 -> format_id，取消时据此清理未完成的文件
+        self.processed = set()  # 后处理（合并、修复）的目标文件
+        self.info = info  # 已提取的信息字典（或播放列表的平铺条目），格式不可用时下载前再提取
+        self.state = PENDING
+        self.percent = 0.0
+        self.progress = None  # 最近一次的ProgressEvent
+        self.estimator = None  # 整个任务的ProgressEstimator，开始下载时创建
+        self.profile = None  # 本次下载使用的DownloadProfile
+        self.status_text = ''
+        self.attempts = 0
+        self.error = None
+        self.engine = None
+        self.cancel_requested = False
+        self.journal_id = journal_id  # 在任务日志中的ID
+        self.journaled_at = 0.0
+        self.prefetch = None  # 预取信息的Future
+        self.prefetch_engine = None  # 正在预取信息的引擎，取消任务时一起取消
+        self.weight = 1.0  # 分配带宽时的权重
+        self.collection = False  # 记录播放列表展开错误的任务，不下载，重试时重新展开列表
+        self.retry_requested = False  # 取消后在引擎停下前就重试了，等上一次运行退出后再重新排队
+
+    @property
+    def title(self):
+        if self.info and self.info.get('title'):
+            return self.info['title']
+        return self.url
+
+    @property
+    def is_finished(self):
+        return self.state in FINISHED_STATES
+
+
+class DownloadQueue:
+    """有界并发的下载队列
+
+    任务按入队顺序调度，同时运行的任务数不超过 max_workers；
+    状态变化和进度通过回调通知调用方（回调在工作线程中调用）。
+    每个任务的下载参数由 profile_tuner 提供，完成后把实测吞吐反馈给它。
+    提供 journal 时，未结束的任务及其进度会写入任务日志，关闭后可以恢复。
+    排在最前面的 prefetch_depth 个等待任务在独立的小线程池中提前获取信息，
+    开始下载时不必再等待提取。提供 archive（DownloadArchive）时，
+    已下载过的视频在入队时（或提取出ID后）直接跳过，完成的视频写入记录。
+    提供 bandwidth（BandwidthManager）时，正在下载的任务按权重分配总带宽。
+    merge_planner（MergePlanner）为每个任务选择格式并决定合并方式；
+    output_planner（OutputPlanner）在下载前确定并占用最终文件名，同名的视频不会写同一个文件。
+    提供 metrics（MetricsRecorder）时记录每个任务各阶段的耗时和成败。
+    取消正在运行的任务时立即让出名额，引擎在后台终止yt-dlp进程组；
+    partial_policy 决定是否删除它留下的未完成文件（关闭程序时总是保留，以便下次续传）。
+    """
+
+    def __init__(self, max_workers=None, engine_name='auto', state_callback=None, progress_callback=None,
+                 metadata_cache=None, profile_tuner=None, journal=None, prefetch_depth=PREFETCH_DEPTH,
+                 archive=None, bandwidth=None, merge_planner=None, metrics=None, partial_policy=PARTIAL_DELETE,
+                 output_planner=None):
+        self.max_workers = max_workers or default_worker_count()
+        self.engine_name = engine_name
+        self.metadata_cache = metadata_cache
+        self.profile_tuner = profile_tuner or ProfileTuner()
+        self.journal = journal
+        self.archive = archive
+        self.bandwidth = bandwidth
+        self.merge_planner = merge_planner or MergePlanner()
+        self.output_planner = output_planner or OutputPlanner()
+        self.metrics = metrics
+        self.partial_policy = partial_policy
+        self.closing = False
+        self.expanders = set()  # 正在展开播放列表的引擎
+        self.state_callback = state_callback
+        self.progress_callback = progress_callback
+        self.jobs = OrderedDict()
+        self.pending = deque()
+        self.running = set()
+        self.lock = threading.RLock()
+        self.executor = ThreadPoolExecutor(MAX_POOL_THREADS, thread_name_prefix='download')
+        self.prefetch_depth = prefetch_depth
+        self.prefetching = set()
+        self.prefetch_executor = ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix='prefetch')
+
+    def enqueue(self, url, output_path, format_option, info=None, journal_id=None, constraints=None):
+        """加入一个下载任务，返回DownloadJob；journal_id 用于恢复任务日志中的任务
+
+        提供 constraints（FormatConstraints）时，开始下载前按格式表选定具体的format_id，
+        format_option 只在没有格式表时使用
+        """
+        job = DownloadJob(url, output_path, format_option, info, journal_id, constraints)
+        if self._in_archive(job):
+            # 不访问网络就能确定已下载过，不进入等待队列
+            job.state = SKIPPED
+            job.percent = 100.0
+            job.status_text = '已下载过，跳过'
+            with self.lock:
+                self.jobs[job.id] = job
+            self._notify_state(job)
+            return job
+        with self.lock:
+            self.jobs[job.id] = job
+            self.pending.append(job)
+        self._notify_state(job)
+        self._dispatch()
+        return job
+
+    def enqueue_collection(self, url, output_path, format_option, constraints=None):
+        """在后台平铺展开播放列表或频道，每枚举到一个视频就加入队列
+
+        条目只带标题等平铺信息，完整信息在各自开始下载前才提取；
+        展开失败且没有得到任何条目时，把链接本身作为普通任务加入队列，由它报告提取错误；
+        展开到一部分后出错时，加入一个记录错误的失败任务，重试它会重新展开并跳过已加入的视频。
+        """
+        self._start_expand(url, output_path, format_option, constraints)
+
+    def _start_expand(self, url, output_path, format_option, constraints, placeholder=None):
+        engine = create_engine(self.engine_name)
+        with self.lock:
+            self.expanders.add(engine)
+            if placeholder is not None:
+                # 取消这个任务时停止展开
+                placeholder.engine = engine
+        self.executor.submit(self._expand, engine, url, output_path, format_option, constraints, placeholder)
+
+    def _expand(self, engine, url, output_path, format_option, constraints, placeholder):
+        count = 0
+        error = None
+        try:
+            with self.lock:
+                # 重试时跳过上次已经加入的视频
+                queued = {job.url for job in self.jobs.values()} if placeholder else set()
+            try:
+                for entry in engine.iter_entries(url):
+                    if self.closing:
+                        break
+                    if entry['url'] in queued:
+                        continue
+                    self.enqueue(entry['url'], output_path, format_option, info=entry, constraints=constraints)
+                    count += 1
+            except EngineError as e:
+                error = str(e)
+            except Exception as e:
+                error = f'播放列表没有完整展开: {e or type(e).__name__}'
+            if engine.is_cancelled or self.closing:
+                return
+            if placeholder is not None:
+                self._finish_placeholder(placeholder, count, error)
+            elif count == 0:
+                self.enqueue(url, output_path, format_option, constraints=constraints)
+            elif error:
+                placeholder = DownloadJob(url, output_path, format_option, constraints=constraints)
+                placeholder.collection = True
+                with self.lock:
+                    self.jobs[placeholder.id] = placeholder
+                self._finish_placeholder(placeholder, count, error)
+        finally:
+            # 最后一个条目入队后才移除，期间 active_count 不会降到0
+            with self.lock:
+                self.expanders.discard(engine)
+                stopped = placeholder is not None and placeholder.engine is engine
+                if stopped:
+                    placeholder.engine = None
+            if stopped:
+                self._retry_stopped(placeholder)
+
+    def _finish_placeholder(self, job, count, error):
+        """展开结束后更新记录展开错误的任务"""
+        with self.lock:
+            if job.cancel_requested:
+                return
+            if error:
+                job.state = FAILED
+                job.error = error
+                job.status_text = f'播放列表只加入了 {count} 个视频: {error}'
+            else:
+                job.state = COMPLETED
+                job.percent = 100.0
+                job.status_text = f'播放列表已展开，又加入了 {count} 个视频'
+        self._notify_state(job)
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def set_max_workers(self, count):
+        """调整并发数，增大时立即启动等待中的任务，减小时等运行中的任务自然结束"""
+        with self.lock:
+            self.max_workers = max(1, int(count))
+        self._dispatch()
+
+    def set_weight(self, job_id, weight):
+        """调整任务的带宽权重，正在下载的任务立即按新权重重新分配"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return
+        job.weight = weight
+        engine = job.engine
+        if self.bandwidth is not None and engine is not None:
+            self.bandwidth.set_weight(engine, weight)
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job.is_finished:
+                return False
+            job.cancel_requested = True
+            engine = job.engine
+            prefetch_engine = job.prefetch_engine
+            if job in self.pending:
+                # 还没开始的任务直接移出队列
+                self.pending.remove(job)
+            else:
+                # 运行中的任务立即让出名额；工作线程等引擎停下后自行结束，并按策略清理文件
+                self.running.discard(job)
+            job.state = CANCELLED
+            job.status_text = '下载已取消'
+        if engine is not None:
+            engine.cancel()
+            if self.bandwidth is not None:
+                self.bandwidth.unregister(engine)
+        if prefetch_engine is not None:
+            prefetch_engine.cancel()
+        self._notify_state(job)
+        self._dispatch()
+        return True
+
+    def cancel_all(self):
+        with self.lock:
+            expanders = list(self.expanders)
+        for engine in expanders:
+            engine.cancel()
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def retry(self, job_id):
+        """把失败或已取消的任务重新放回队列；记录展开错误的任务重新展开播放列表"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job.state not in (FAILED, CANCELLED):
+                return False
+            stopping = job.engine is not None
+            if stopping:
+                # 取消的那次运行还没退出（引擎可能正阻塞在读取上），现在重新排队的话
+                # 两次运行会同时写同一个 .part 文件，旧引擎的进度也会混进新的一次
+                job.retry_requested = True
+                job.status_text = '正在停止上一次下载...'
+        if stopping:
+            self._notify_state(job)
+            return True
+        with self.lock:
+            job.state = EXTRACTING if job.collection else PENDING
+            job.percent = 0.0
+            job.progress = None
+            job.estimator = None
+            job.prefetch = None
+            job.error = None
+            job.status_text = '正在展开播放列表...' if job.collection else ''
+            job.cancel_requested = False
+            if not job.collection:
+                self.pending.append(job)
+        self._notify_state(job)
+        if job.collection:
+            self._start_expand(job.url, job.output_path, job.format_option, job.constraints, job)
+        else:
+            self._dispatch()
+        return True
+
+    def active_count(self):
+        with self.lock:
+            return len(self.pending) + len(self.running) + len(self.expanders)
+
+    def resume_unfinished(self):
+        """把任务日志中未完成的任务重新加入队列，yt-dlp会从 .part 文件续传
+
+        本次运行中已经加入队列的任务也在日志中，不会重复加入
+        """
+        if self.journal is None:
+            return []
+        with self.lock:
+            queued = {job.journal_id for job in self.jobs.values()}
+        return [self.enqueue(entry.url, entry.output_path, entry.format_option, journal_id=entry.id)
+                for entry in self.journal.unfinished() if entry.id not in queued]
+
+    def shutdown(self, wait=False):
+        # 程序关闭导致的取消不写入日志，下次启动时这些任务仍然是未完成状态
+        if self.journal is not None:
+            with self.lock:
+                running = [job for job in self.running if job.estimator]
+            for job in running:
+                self.journal.update_progress(job.journal_id, job.estimator.downloaded_bytes,
+                                             job.estimator.total_bytes)
+        with self.lock:
+            # 在锁内设置，_prefetch 不会在预取线程池关闭之后再提交任务
+            self.closing = True
+        self.cancel_all()
+        self.prefetch_executor.shutdown(wait=False, cancel_futures=True)
+        self.executor.shutdown(wait=wait)
+
+    def _dispatch(self):
+        """在空闲名额内启动等待中的任务"""
+        with self.lock:
+            while self.pending and len(self.running) < self.max_workers:
+                job = self.pending.popleft()
+                self.running.add(job)
+                job.attempts += 1
+                self.executor.submit(self._run_job, job, job.attempts)
+        self._prefetch()
+
+    def _prefetch(self):
+        """为排在最前面的等待任务提前获取信息，同时进行的预取数不超过线程数"""
+        with self.lock:
+            if self.closing:
+                return
+            for index, job in enumerate(self.pending):
+                if index >= self.prefetch_depth or len(self.prefetching) >= PREFETCH_WORKERS:
+                    break
+                if job.prefetch is None and not is_info_fresh(job.info):
+                    self.prefetching.add(job)
+                    job.prefetch = self.prefetch_executor.submit(self._prefetch_job, job)
+
+    def _prefetch_job(self, job):
+        engine = create_engine(self.engine_name)
+        try:
+            with self.lock:
+                if job.cancel_requested or self.closing:
+                    return None
+                # 放在任务上，cancel() 和 shutdown() 可以终止正在进行的预取
+                job.prefetch_engine = engine
+            info = self._resolve_info(job, engine)
+            if not job.cancel_requested:
+                job.info = info
+            return info
+        finally:
+            with self.lock:
+                self.prefetching.discard(job)
+                if job.prefetch_engine is engine:
+                    job.prefetch_engine = None
+            self._prefetch()
+
+    def _run_job(self, job, attempt):
+        state, text = FAILED, '下载失败'
+        run_started = time.monotonic()
+        job.download_started = job.first_byte_at = None
+        engine = None
+        try:
+            engine = job.engine = create_engine(self.engine_name)
+            if job.cancel_requested:
+                engine.cancel()
+
+            # 没有可用的信息时先提取，下载阶段直接复用；已在预取的任务等待预取结果
+            if not is_info_fresh(job.info):
+                self._set_state(job, EXTRACTING, '正在获取视频信息...')
+                info = self._await_prefetch(job)
+                if job.cancel_requested:
+                    return
+                job.info = info if is_info_fresh(info) else self._resolve_info(job, engine)
+                if self._in_archive(job):
+                    # 链接中看不出ID的任务，提取后再检查一次
+                    state, text = SKIPPED, '已下载过，跳过'
+                    job.percent = 100.0
+                    return
+
+            if job.constraints is not None and job.format_choice is None:
+                # 直接下载选定的流，不让yt-dlp按格式字符串再选一次；选定的ID写入任务日志，恢复时不变
+                job.format_choice = self.merge_planner.select(job.info, job.constraints)
+                if job.format_choice is not None:
+                    job.format_option = job.format_choice.format_id
+
+            os.makedirs(job.output_path, exist_ok=True)
+            job.plan = self.merge_planner.plan(job.format_choice, job.output_path)
+            if job.target is None:
+                # 按已有的信息确定文件名并占用，同时下载的同名视频不会争用同一个 .part 文件
+                job.target = self.output_planner.reserve(job.output_path, job.info,
+                                                         archive_id_for(job.url, job.info) or job.url,
+                                                         job.plan.temp_dir)
+            job.plan.name = job.target.name
+            job.stages = StageRecorder()
+            # 按要下载的流预估总大小，进度和剩余时间覆盖视频、音频和合并
+            streams = job.format_choice.streams() if job.format_choice else expected_streams(job.info)
+            job.estimator = ProgressEstimator(streams)
+            job.profile = self.profile_tuner.next_profile()
+            if job.cancel_requested:
+                return
+            self._set_state(job, DOWNLOADING, '正在下载...')
+            if self.bandwidth is not None:
+                self.bandwidth.register(engine, job.weight)
+            started = job.download_started = time.monotonic()
+            success = engine.download(
+                job.url, job.output_path, job.format_option,
+                lambda event: self._on_progress(job, event, attempt),
+                info=job.info, profile=job.profile, plan=job.plan
+            )
+            if success:
+                self.profile_tuner.record(job.profile, job.estimator.downloaded_bytes,
+                                          time.monotonic() - started)
+                if self.archive is not None:
+                    self.archive.add(archive_id_for(job.url, job.info))
+                job.percent = 100.0
+                state, text = COMPLETED, '下载完成！'
+        except EngineError as e:
+            job.error = text = str(e)
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            text = f'下载失败: {job.error}'
+        finally:
+            if job.cancel_requested:
+                state, text = CANCELLED, '下载已取消'
+                self._discard_partial(job, attempt)
+            self._release_target(job, attempt, state)
+            if self.bandwidth is not None and engine is not None:
+                # 结束的任务让出带宽，其余任务立即分得更多
+                self.bandwidth.unregister(engine)
+            if self.metrics is not None:
+                self._record_metrics(job, engine, state, run_started)
+            # 先释放名额再通知，回调里看到的队列状态已经是最新的；
+            # 取消时名额已经释放、状态已经通知过，之后重试的任务属于新的一次运行
+            with self.lock:
+                current = job.attempts == attempt and job in self.running
+                if job.attempts == attempt:
+                    job.engine = None
+                if current:
+                    self.running.discard(job)
+            if current:
+                self._set_state(job, state, text)
+                self._dispatch()
+            elif job.attempts == attempt:
+                self._retry_stopped(job)
+
+    def _retry_stopped(self, job):
+        """上一次运行退出后，执行在它停下之前请求的重试"""
+        with self.lock:
+            requested, job.retry_requested = job.retry_requested, False
+        if requested and not self.closing:
+            self.retry(job.id)
+
+    def _release_target(self, job, attempt, state):
+        """任务结束后释放文件名；留下了未完成的文件时保留标记文件，重试或再次下载同一视频时接管它续传"""
+        with self.lock:
+            if job.attempts != attempt or job.target is None:
+                return
+            target, job.target = job.target, None
+        if self.closing or state not in (COMPLETED, SKIPPED) and job.written:
+            # 关闭程序时同样保留，下次启动恢复任务时沿用同一个名称
+            self.output_planner.suspend(target)
+        else:
+            self.output_planner.release(target)
+
+    def _discard_partial(self, job, attempt):
+        """按策略删除取消的任务留下的未完成文件；关闭程序或已经重试时保留"""
+        if self.partial_policy != PARTIAL_DELETE or self.closing:
+            return
+        with self.lock:
+            if job.attempts != attempt:
+                return
+            downloads, outputs = dict(job.written), set(job.processed)
+            job.written.clear()
+            job.processed.clear()
+        remove_partial_files(downloads, outputs)
+
+    def _in_archive(self, job):
+        return self.archive is not None and archive_id_for(job.url, job.info) in self.archive
+
+    def _await_prefetch(self, job):
+        """返回预取到的信息；没有预取、预取失败或等待期间任务被取消时返回None，由调用方重新提取"""
+        future, job.prefetch = job.prefetch, None
+        if future is None or future.cancelled():
+            return None
+        while True:
+            try:
+                return future.result(timeout=PREFETCH_POLL_INTERVAL)
+            except FutureTimeoutError:
+                # 取消时预取的引擎已被终止，但不等它退出，工作线程立即结束
+                if job.cancel_requested:
+                    return None
+            except Exception:
+                return None
+
+    def _resolve_info(self, job, engine):
+        """优先使用元数据缓存中格式URL仍有效的信息，否则提取并写回缓存"""
+        cache = self.metadata_cache
+        if cache is not None:
+            cached = cache.get(extract_video_id(job.url))
+            if cached and is_info_fresh(cached.get('info_dict')):
+                return cached['info_dict']
+
+        with self._timer(STAGE_EXTRACT, job):
+            info = engine.extract_info(job.url)
+        if cache is not None:
+            cache.put(info.get('id'), build_video_info(info, job.url))
+        return info
+
+    def _timer(self, stage, job):
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.timer(stage, job=job.id, url=job.url)
+
+    def _record_metrics(self, job, engine, state, run_started):
+        """任务结束时记录启动、首字节、各阶段和整个任务的耗时与成败"""
+        metrics = self.metrics
+        ok = state in (COMPLETED, SKIPPED)
+        error = None if ok else (job.error or state)
+        if engine is not None:
+            for seconds, spawned, spawn_error in engine.spawns:
+                metrics.record(STAGE_SPAWN, seconds, spawned, job.id, job.url, error=spawn_error)
+        if job.download_started is not None:
+            if job.first_byte_at is None and not ok:
+                # 开始下载后一个字节都没有收到
+                metrics.record(STAGE_FIRST_BYTE, time.monotonic() - job.download_started, False, job.id, job.url,
+                               error=error)
+            for item in job.stages.report():
+                # 没有完成的阶段记为失败，任务失败前已完成的阶段仍然是成功的
+                metrics.record(item['stage'], item['seconds'], item['finished'], job.id, job.url,
+                               bytes=item['bytes'], error=None if item['finished'] else error)
+        downloaded = job.estimator.downloaded_bytes if job.estimator and job.download_started else None
+        metrics.record(STAGE_JOB, time.monotonic() - run_started, ok, job.id, job.url, bytes=downloaded, error=error)
+
+    def _on_progress(self, job, event, attempt):
+        if job.attempts != attempt:
+            # 已经开始了新的一次运行，之前那次的引擎还没停下
+            return
+        if event.filename:
+            if event.stage in (STAGE_MERGE, STAGE_POSTPROCESS):
+                job.processed.add(event.filename)
+            else:
+                job.written[event.filename] = event.format_id
+        if job.cancel_requested:
+            # 已取消的任务在等引擎停下，不再更新进度
+            return
+        job.progress = event
+        if job.first_byte_at is None and event.downloaded_bytes and self.metrics is not None:
+            job.first_byte_at = time.monotonic()
+            self.metrics.record(STAGE_FIRST_BYTE, job.first_byte_at - job.download_started, True, job.id, job.url)
+        if self.bandwidth is not None:
+            self.bandwidth.check_schedule()
+        job.estimator.update(event)
+        job.stages.update(event)
+        percent = job.estimator.percent
+        if percent is None:
+            # 总大小未知时只能显示当前流的进度
+            percent = event.percent
+        if percent is not None:
+            job.percent = percent
+        job.status_text = job.estimator.describe(event)
+        self._journal_progress(job)
+        if self.progress_callback:
+            self.progress_callback(job)
+
+    def _set_state(self, job, state, text):
+        job.state = state
+        job.status_text = text
+        self._notify_state(job)
+
+    def _journal_progress(self, job):
+        # 进度事件很频繁，按固定间隔写入，分片结束时也写一次
+        if self.journal is None or self.closing:
+            return
+        now = time.monotonic()
+        if now - job.journaled_at < JOURNAL_PROGRESS_INTERVAL and job.progress.status != 'finished':
+            return
+        job.journaled_at = now
+        self.journal.update_progress(job.journal_id, job.estimator.downloaded_bytes, job.estimator.total_bytes)
+
+    def _journal_state(self, job):
+        # 记录展开错误的任务不是下载任务，不写入日志，否则恢复时会把列表链接当作单个视频下载
+        if self.journal is None or self.closing or job.collection:
+            return
+        if job.is_finished:
+            self.journal.remove(job.journal_id)
+        else:
+            self.journal.record(job)
+
+    def _notify_state(self, job):
+        self._journal_state(job)
+        if self.state_callback:
+            self.state_callback(job)
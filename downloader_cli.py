@@ -0,0 +1,286 @@
+"""YouTube 视频下载器命令行（无界面）模式
+
+用法:
+    python -m downloader_cli URL [URL ...]
+    python -m downloader_cli -i urls.txt -o ~/Downloads -j 4
+    cat urls.txt | python -m downloader_cli
+
+进度以每行一个JSON对象的形式输出到标准输出，便于脚本和cron任务解析。
+本模块不导入PyQt5，可以在没有显示器的服务器上运行。
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+
+from download_engine import get_format_option, VIDEO_TYPE_NORMAL, VIDEO_TYPE_SHORTS
+from download_queue import DownloadQueue, default_worker_count, COMPLETED, SKIPPED, PREFETCH_DEPTH
+from download_archive import DownloadArchive
+from video_metadata import is_collection_url
+from metadata_service import MetadataService, DEFAULT_TIMEOUT
+from metadata_cache import MetadataCache
+from job_journal import JobJournal
+from progress import ProgressAggregator
+from bandwidth import BandwidthManager, BandwidthSchedule, parse_rate
+from format_selector import FormatConstraints, select_format, CODEC_FILTERS
+from merge_planner import MergePlanner
+from output_planner import OutputPlanner, NAME_TEMPLATE
+from metrics import MetricsRecorder, PrometheusExporter
+from download_profile import (DownloadProfile, ProfileTuner, MAX_CONCURRENT_FRAGMENTS,
+                              DEFAULT_HTTP_CHUNK_SIZE, DEFAULT_BUFFER_SIZE)
+
+
+def read_urls(args):
+    """从命令行参数、文件或标准输入收集链接，忽略空行和#注释"""
+    lines = list(args.urls)
+    if args.input:
+        if args.input == '-':
+            lines.extend(sys.stdin)
+        else:
+            with open(args.input, encoding='utf-8') as f:
+                lines.extend(f)
+    elif not args.urls and not sys.stdin.isatty():
+        lines.extend(sys.stdin)
+
+    urls = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            urls.extend(line.split())
+    return urls
+
+
+class JsonPrinter:
+    """线程安全地逐行输出JSON事件"""
+
+    def __init__(self, stream=sys.stdout):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        fields['event'] = event
+        line = json.dumps(fields, ensure_ascii=False)
+        with self.lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+def build_constraints(args):
+    """按命令行参数生成格式约束，用 -f 直接指定格式时返回None"""
+    if args.format:
+        return None
+    return FormatConstraints(args.max_height, args.max_filesize, args.codec, args.no_merge)
+
+
+def print_info(urls, args, cache, printer, metrics=None):
+    """只提取视频信息，不下载；最多同时查询 -j 个链接，按完成的先后输出
+
+    selected 是按当前约束会下载的格式
+    """
+    failed = 0
+    constraints = build_constraints(args)
+    service = MetadataService(args.engine, args.jobs, args.info_timeout, cache, args.refresh,
+                              with_thumbnail=True, metrics=metrics)
+
+    def on_result(result):
+        nonlocal failed
+        if not result.ok:
+            failed += 1
+            printer.emit('error', url=result.url, message=result.error)
+            return
+        video_info = result.video_info
+        choice = select_format(video_info.pop('info_dict'), constraints) if constraints else None
+        if choice is not None:
+            video_info['selected'] = {'format_id': choice.format_id, 'description': choice.describe(),
+                                      'filesize': choice.filesize}
+        printer.emit('info', **video_info)
+
+    try:
+        # Ctrl+C时事件循环取消所有查询，正在运行的yt-dlp进程被终止
+        service.lookup_all(urls, on_result)
+    finally:
+        service.close()
+    if cache is not None:
+        printer.emit('cache', hits=cache.hits, misses=cache.misses, hit_rate=round(cache.hit_rate, 3))
+    return 1 if failed else 0
+
+
+def run_downloads(urls, args, cache, archive, printer, metrics=None):
+    """并发下载全部链接，全部成功时返回0"""
+    finished = threading.Event()
+
+    def on_state(job):
+        printer.emit('state', job=job.id, url=job.url, title=job.title,
+                     state=job.state, message=job.status_text,
+                     profile=job.profile.to_dict() if job.profile else None,
+                     format=job.format_option, plan=job.plan.to_dict() if job.plan else None,
+                     # 每个阶段的耗时和写入字节数，可以看出合并的代价
+                     stages=job.stages.report() if job.stages and job.is_finished else None)
+        if job.is_finished:
+            finished.set()
+
+    # 进度合并后按固定间隔输出，避免分片下载时每秒输出上千行
+    aggregator = ProgressAggregator()
+
+    def on_progress(job):
+        aggregator.push(job.id, job.progress)
+
+    def flush_progress():
+        for job_id, event in aggregator.drain().items():
+            job = queue.get(job_id)
+            if job and not job.is_finished:
+                # percent、throughput、total_eta 针对整个任务，其余字段是当前流的原始进度
+                estimator = job.estimator
+                printer.emit('progress', job=job_id, percent=round(job.percent, 2),
+                             throughput=estimator.throughput if estimator else None,
+                             total_eta=estimator.eta if estimator else None,
+                             rate_limit=job.engine.rate_limit if job.engine else None,
+                             **event.to_dict())
+
+    video_type = VIDEO_TYPE_SHORTS if args.type == 'shorts' else VIDEO_TYPE_NORMAL
+    constraints = build_constraints(args)
+    format_option = args.format or get_format_option(video_type, constraints)
+    base = DownloadProfile(args.concurrent_fragments or 1, args.http_chunk_size, args.buffer_size)
+    tuner = ProfileTuner(base, auto=args.concurrent_fragments == 0)
+    # 指定任务日志时，先恢复上次中断的任务，Ctrl+C中断的任务也会保留在日志中
+    journal = JobJournal(args.journal) if args.journal else None
+    # 总限速在所有同时下载的任务之间平均分配
+    bandwidth = BandwidthManager(args.limit_rate, args.schedule)
+    queue = DownloadQueue(args.jobs, args.engine, state_callback=on_state, progress_callback=on_progress,
+                          metadata_cache=cache, profile_tuner=tuner, journal=journal, prefetch_depth=args.prefetch,
+                          archive=archive, bandwidth=bandwidth, merge_planner=MergePlanner(args.temp_dir),
+                          metrics=metrics, output_planner=OutputPlanner(args.name_template))
+    queue.resume_unfinished()
+    for url in urls:
+        # 播放列表和频道边展开边下载，不等整个列表枚举完
+        if args.expand or is_collection_url(url):
+            queue.enqueue_collection(url, args.output, format_option, constraints)
+        else:
+            queue.enqueue(url, args.output, format_option, constraints=constraints)
+
+    try:
+        # 用带超时的等待，保证Ctrl+C能及时响应
+        while queue.active_count() > 0:
+            finished.wait(args.progress_interval)
+            finished.clear()
+            flush_progress()
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        queue.shutdown(wait=True)
+        if journal is not None:
+            journal.close()
+
+    jobs = list(queue.jobs.values())
+    completed = sum(1 for job in jobs if job.state == COMPLETED)
+    skipped = sum(1 for job in jobs if job.state == SKIPPED)
+    failed = len(jobs) - completed - skipped
+    printer.emit('summary', total=len(jobs), completed=completed, skipped=skipped, failed=failed)
+    return 0 if failed == 0 else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m downloader_cli',
+                                     description='YouTube 视频下载器命令行模式')
+    parser.add_argument('urls', nargs='*', help='视频链接')
+    parser.add_argument('-i', '--input', help='从文件读取链接，每行一个；- 表示标准输入')
+    parser.add_argument('-o', '--output', default=os.path.join(os.path.expanduser('~'), 'Downloads'),
+                        help='保存位置（默认 ~/Downloads）')
+    parser.add_argument('-j', '--jobs', type=int, default=default_worker_count(),
+                        help='同时下载的任务数')
+    parser.add_argument('--prefetch', type=int, default=PREFETCH_DEPTH, metavar='K',
+                        help='提前获取信息的等待任务数，0表示不预取')
+    parser.add_argument('-t', '--type', choices=['normal', 'shorts'], default='normal',
+                        help='视频类型')
+    parser.add_argument('-f', '--format', help='直接指定yt-dlp格式字符串，忽略下面的格式约束')
+    parser.add_argument('--max-height', type=int, metavar='PIXELS',
+                        help='最高画质（短边像素，如 1080、720），竖屏视频同样适用')
+    parser.add_argument('--max-filesize', type=parse_rate, metavar='SIZE',
+                        help='视频和音频合计的体积上限，如 200M；都超出时选择最小的格式')
+    parser.add_argument('--codec', choices=sorted(CODEC_FILTERS), help='优先的视频编码')
+    parser.add_argument('--no-merge', action='store_true',
+                        help='优先选择音视频合一的格式，省去下载两个流和合并')
+    parser.add_argument('--temp-dir', metavar='DIR',
+                        help='下载中间文件的目录；与保存位置不在同一文件系统时不使用，避免合并后再复制整个文件')
+    parser.add_argument('--name-template', default=NAME_TEMPLATE, metavar='TEMPLATE',
+                        help='文件名（不含扩展名），可用 {title}、{id}、{uploader} 等字段；'
+                             '重名时自动加 " (2)" 等后缀')
+    parser.add_argument('--engine', choices=['auto', 'inprocess', 'subprocess'], default='auto',
+                        help='下载引擎')
+    parser.add_argument('-N', '--concurrent-fragments', type=int, default=0,
+                        choices=range(0, MAX_CONCURRENT_FRAGMENTS + 1), metavar='N',
+                        help='每个任务同时下载的分片数，0表示按实测吞吐自动调整（默认）')
+    parser.add_argument('--http-chunk-size', type=int, default=DEFAULT_HTTP_CHUNK_SIZE, metavar='BYTES',
+                        help='按块下载时每个Range请求的字节数，0表示不分块')
+    parser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE, metavar='BYTES',
+                        help='下载缓冲区字节数')
+    parser.add_argument('-r', '--limit-rate', type=parse_rate, metavar='RATE',
+                        help='所有任务合计的最大下载速度，如 500K、2M，默认不限速')
+    parser.add_argument('--schedule', type=BandwidthSchedule.parse, metavar='SPEC',
+                        help='按时段限速，如 "08:00-23:00=1M,23:00-08:00=0"，0表示不限速')
+    parser.add_argument('--expand', action='store_true',
+                        help='把所有链接都当作播放列表平铺展开（YouTube播放列表和频道链接会自动展开）')
+    parser.add_argument('--info', action='store_true', help='只输出视频信息，不下载；同时查询 -j 个链接')
+    parser.add_argument('--info-timeout', type=float, default=DEFAULT_TIMEOUT, metavar='SECONDS',
+                        help='--info 时每个链接的超时秒数')
+    parser.add_argument('--progress-interval', type=float, default=0.5,
+                        help='进度输出间隔（秒）')
+    parser.add_argument('--journal', metavar='FILE',
+                        help='任务日志文件；中断后用同一文件再次运行会续传未完成的任务')
+    parser.add_argument('--download-archive', metavar='FILE',
+                        help='下载记录文件（yt-dlp格式），已记录的视频直接跳过；默认与界面共用')
+    parser.add_argument('--no-archive', action='store_true', help='不使用下载记录')
+    parser.add_argument('--import-archive', metavar='FILE', help='先把yt-dlp下载记录文件合并进来')
+    parser.add_argument('--export-archive', metavar='FILE', help='结束时把下载记录导出为yt-dlp格式')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='把每个任务各阶段（启动、提取、首字节、各流传输、合并等）的耗时和成败'
+                             '以JSON lines追加到文件，- 表示标准错误')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='运行期间在 127.0.0.1:PORT/metrics 提供Prometheus格式的指标')
+    parser.add_argument('--no-cache', action='store_true', help='不使用视频信息缓存')
+    parser.add_argument('--refresh', action='store_true', help='忽略缓存重新提取视频信息')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    urls = read_urls(args)
+    archive_only = args.import_archive or args.export_archive
+    if not urls and not args.journal and not archive_only:
+        print('没有需要处理的链接', file=sys.stderr)
+        return 2
+
+    printer = JsonPrinter()
+    cache = None if args.no_cache else MetadataCache()
+    metrics = exporter = None
+    if args.metrics or args.metrics_port:
+        metrics = MetricsRecorder.open(args.metrics) if args.metrics else MetricsRecorder()
+    if args.metrics_port:
+        exporter = PrometheusExporter(metrics, args.metrics_port)
+        printer.emit('metrics', url=f'http://127.0.0.1:{exporter.port}/metrics')
+
+    archive = None
+    try:
+        if args.info:
+            return print_info(urls, args, cache, printer, metrics)
+        archive = None if args.no_archive else DownloadArchive(args.download_archive)
+        if archive is not None and args.import_archive:
+            printer.emit('archive', imported=archive.import_file(args.import_archive), total=len(archive))
+        result = 0
+        if urls or args.journal:
+            result = run_downloads(urls, args, cache, archive, printer, metrics)
+        if archive is not None and args.export_archive:
+            printer.emit('archive', exported=archive.export_file(args.export_archive))
+        return result
+    finally:
+        if archive is not None:
+            archive.close()
+        if exporter is not None:
+            exporter.close()
+        if metrics is not None:
+            metrics.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
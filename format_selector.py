@@ -0,0 +1,267 @@
+from progress import stage_for_format, format_bytes
+
+# 视频编码的统一名称，按yt-dlp的vcodec前缀识别
+VIDEO_CODECS = (
+    ('avc1', 'h264'), ('h264', 'h264'),
+    ('vp09', 'vp9'), ('vp9', 'vp9'),
+    ('av01', 'av1'),
+    ('hev1', 'h265'), ('hvc1', 'h265'),
+)
+CODEC_TEXT = {'h264': 'H.264', 'vp9': 'VP9', 'av1': 'AV1', 'h265': 'H.265'}
+# yt-dlp格式字符串中按编码筛选时使用的前缀和对应的 (视频, 音频) 容器
+CODEC_FILTERS = {
+    'h264': ('avc1', 'mp4', 'm4a'),
+    'vp9': ('vp09', 'webm', 'webm'),
+    'av1': ('av01', 'mp4', 'm4a'),
+    'h265': ('hvc1', 'mp4', 'm4a'),
+}
+
+# 合并时不需要转码的容器组合：视频扩展名 -> 可直接封装的音频扩展名
+COMPATIBLE_AUDIO = {
+    'mp4': ('m4a', 'mp4'),
+    'webm': ('webm',),
+}
+
+# 分片协议（HLS/DASH）的请求开销更大，同等画质时优先直接的HTTP流
+FRAGMENTED_PROTOCOLS = ('m3u8', 'm3u8_native', 'http_dash_segments')
+
+
+def codec_family(vcodec):
+    if not vcodec or vcodec == 'none':
+        return None
+    for prefix, family in VIDEO_CODECS:
+        if vcodec.startswith(prefix):
+            return family
+    return vcodec.split('.')[0]
+
+
+class FormatEntry:
+    """格式表中的一项，保留下载决策需要的全部字段"""
+    __slots__ = ('format_id', 'ext', 'vcodec', 'acodec', 'width', 'height', 'fps', 'tbr', 'abr',
+                 'filesize', 'protocol', 'note')
+
+    def __init__(self, fmt, duration=None):
+        self.format_id = str(fmt.get('format_id'))
+        self.ext = fmt.get('ext') or ''
+        self.vcodec = fmt.get('vcodec')
+        self.acodec = fmt.get('acodec')
+        self.width = fmt.get('width')
+        self.height = fmt.get('height')
+        self.fps = fmt.get('fps')
+        self.tbr = fmt.get('tbr')
+        self.abr = fmt.get('abr')
+        self.protocol = fmt.get('protocol') or ''
+        self.note = fmt.get('format_note') or ''
+        self.filesize = fmt.get('filesize') or fmt.get('filesize_approx')
+        if not self.filesize and self.tbr and duration:
+            # 没有大小时按平均码率（kbit/s）和时长估算
+            self.filesize = int(self.tbr * 1000 / 8 * duration)
+
+    @property
+    def has_video(self):
+        return self.vcodec != 'none'
+
+    @property
+    def has_audio(self):
+        return self.acodec != 'none'
+
+    @property
+    def codec(self):
+        return codec_family(self.vcodec)
+
+    @property
+    def quality(self):
+        """画质取短边的像素数，横屏和竖屏（Shorts）视频可以用同一个上限比较"""
+        if self.width and self.height:
+            return min(self.width, self.height)
+        return self.height or self.width or 0
+
+    @property
+    def is_fragmented(self):
+        return self.protocol in FRAGMENTED_PROTOCOLS
+
+    def describe(self):
+        parts = []
+        if self.has_video:
+            label = f'{self.quality}p' if self.quality else (self.note or self.format_id)
+            if self.fps and self.fps > 30:
+                label += f'{self.fps:.0f}'
+            parts.append(label)
+            if self.codec:
+                parts.append(CODEC_TEXT.get(self.codec, self.codec))
+        if not self.has_video:
+            parts.append('音频')
+        if self.abr and not self.has_video:
+            parts.append(f'{self.abr:.0f}k')
+        parts.append(self.ext)
+        if self.filesize:
+            parts.append(format_bytes(self.filesize))
+        return ' '.join(parts)
+
+
+class FormatTable:
+    """从信息字典解析出的完整格式表"""
+
+    def __init__(self, info):
+        duration = info.get('duration')
+        formats = info.get('formats') or ([info] if info.get('url') else [])
+        self.entries = [FormatEntry(fmt, duration) for fmt in formats if fmt.get('format_id') is not None]
+        # 故事板等既无视频也无音频的格式不参与选择
+        self.entries = [entry for entry in self.entries if entry.has_video or entry.has_audio]
+
+    @property
+    def audio_only(self):
+        return [entry for entry in self.entries if entry.has_audio and not entry.has_video]
+
+    def best_video(self):
+        videos = [entry for entry in self.entries if entry.has_video]
+        return max(videos, key=lambda entry: (entry.quality, entry.fps or 0), default=None)
+
+    def describe(self):
+        """界面上显示的格式列表，画质从高到低，不重复"""
+        ordered = sorted(self.entries, key=lambda entry: (entry.has_video, entry.quality, entry.fps or 0,
+                                                          entry.tbr or entry.abr or 0), reverse=True)
+        lines = []
+        for entry in ordered:
+            text = entry.describe()
+            if text not in lines:
+                lines.append(text)
+        return lines
+
+
+class FormatConstraints:
+    """选择格式时的用户约束
+
+    max_height 限制画质（短边像素，竖屏视频同样适用），max_filesize 限制总大小（字节），
+    codec 为优先的视频编码（h264、vp9、av1），avoid_merge 为True时优先选择音视频合一的格式。
+    有可用的格式时只在 container 容器中选择（优先编码需要其他容器时以编码为准）。
+    """
+
+    def __init__(self, max_height=None, max_filesize=None, codec=None, avoid_merge=False, container='mp4'):
+        self.max_height = max_height or None
+        self.max_filesize = max_filesize or None
+        self.codec = codec or None
+        self.avoid_merge = avoid_merge
+        self.container = container
+
+    @property
+    def preferred_ext(self):
+        if self.codec in CODEC_FILTERS:
+            return CODEC_FILTERS[self.codec][1]
+        return self.container
+
+    def to_format_string(self, vertical=False):
+        """转换为近似的yt-dlp格式字符串，在无法使用格式表时作为回退
+
+        体积上限只能逐个流筛选，不能限制视频和音频的总和
+        """
+        side = 'width' if vertical else 'height'
+        filters = f'[{side}<={self.max_height}]' if self.max_height else ''
+        if self.max_filesize:
+            filters += f'[filesize_approx<=?{self.max_filesize}]'
+        options = [f'best{filters}[ext=mp4]'] if self.avoid_merge else []
+        if self.codec in CODEC_FILTERS:
+            prefix, video_ext, audio_ext = CODEC_FILTERS[self.codec]
+            options.append(f'bestvideo{filters}[vcodec^={prefix}][ext={video_ext}]+bestaudio[ext={audio_ext}]')
+        options += [f'bestvideo{filters}[ext=mp4]+bestaudio[ext=m4a]', f'best{filters}[ext=mp4]',
+                    f'best{filters}', 'best']
+        return '/'.join(dict.fromkeys(options))
+
+    def to_dict(self):
+        return {
+            'max_height': self.max_height,
+            'max_filesize': self.max_filesize,
+            'codec': self.codec,
+            'avoid_merge': self.avoid_merge,
+            'container': self.container,
+        }
+
+
+class FormatChoice:
+    """选定的一个（合一）或两个（视频+音频）格式"""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    @property
+    def format_id(self):
+        return '+'.join(entry.format_id for entry in self.entries)
+
+    @property
+    def needs_merge(self):
+        return len(self.entries) > 1
+
+    @property
+    def filesize(self):
+        sizes = [entry.filesize for entry in self.entries]
+        return None if None in sizes else sum(sizes)
+
+    @property
+    def video(self):
+        return self.entries[0]
+
+    def streams(self):
+        """返回 {阶段: 字节数或None}，供ProgressEstimator预估总大小"""
+        return {stage_for_format(entry.vcodec, entry.acodec): entry.filesize for entry in self.entries}
+
+    def describe(self):
+        text = ' + '.join(entry.describe() for entry in self.entries)
+        if self.needs_merge and self.filesize:
+            text += f'（共 {format_bytes(self.filesize)}）'
+        return text
+
+
+def _fits(size, budget):
+    return budget is None or (size is not None and size <= budget)
+
+
+def _candidates(table, constraints):
+    """列出满足画质上限的全部候选组合，合并的组合只使用不需要转码的容器"""
+    def allowed(entry):
+        return not constraints.max_height or entry.quality <= constraints.max_height
+
+    videos = [entry for entry in table.entries if entry.has_video]
+    if any(entry.ext == constraints.preferred_ext for entry in videos):
+        videos = [entry for entry in videos if entry.ext == constraints.preferred_ext]
+    progressive = [FormatChoice([entry]) for entry in videos if entry.has_audio and allowed(entry)]
+    audios = sorted(table.audio_only, key=lambda entry: entry.abr or entry.tbr or 0, reverse=True)
+    merged = []
+    for video in videos:
+        if video.has_audio or not allowed(video):
+            continue
+        compatible = [audio for audio in audios if audio.ext in COMPATIBLE_AUDIO.get(video.ext, ())]
+        # 体积有上限时选放得下的最好音轨，否则选最好的音轨
+        for audio in compatible:
+            choice = FormatChoice([video, audio])
+            if _fits(choice.filesize, constraints.max_filesize) or audio is compatible[-1]:
+                merged.append(choice)
+                break
+    if constraints.avoid_merge and progressive:
+        return progressive
+    return progressive + merged
+
+
+def select_format(info, constraints=None):
+    """按约束从格式表中选出最合适的格式，返回FormatChoice；没有可用格式时返回None
+
+    满足体积上限的候选按 画质、优先编码、帧率、是否为直接HTTP流、是否免合并、码率 排序；
+    所有候选都超出体积上限时选择体积最小的。
+    """
+    if not info:
+        return None
+    constraints = constraints or FormatConstraints()
+    table = FormatTable(info)
+    candidates = _candidates(table, constraints)
+    if not candidates:
+        return None
+
+    def rank(choice):
+        video = choice.video
+        return (video.quality, video.codec == constraints.codec, video.fps or 0,
+                not any(entry.is_fragmented for entry in choice.entries),
+                not choice.needs_merge, sum(entry.tbr or 0 for entry in choice.entries))
+
+    fitting = [choice for choice in candidates if _fits(choice.filesize, constraints.max_filesize)]
+    if fitting:
+        return max(fitting, key=rank)
+    return min(candidates, key=lambda choice: (choice.filesize is None, choice.filesize or 0))
@@ -0,0 +1,115 @@
+import os
+import time
+import sqlite3
+import threading
+
+from metadata_cache import default_data_dir
+
+
+class JournalEntry:
+    """日志中记录的一个未完成任务"""
+
+    def __init__(self, id, url, output_path, format_option, state, downloaded_bytes, total_bytes):
+        self.id = id
+        self.url = url
+        self.output_path = output_path
+        self.format_option = format_option
+        self.state = state
+        self.downloaded_bytes = downloaded_bytes
+        self.total_bytes = total_bytes
+
+    @property
+    def percent(self):
+        if self.total_bytes and self.downloaded_bytes:
+            return min(100.0, self.downloaded_bytes * 100.0 / self.total_bytes)
+        return 0.0
+
+
+class JobJournal:
+    """持久化的下载任务日志，程序关闭或崩溃后据此恢复未完成的任务
+
+    每个未结束的任务一行，记录链接、格式、保存位置、状态和已下载字节数；
+    任务完成、失败或被用户取消后删除对应的行。恢复时yt-dlp会从 .part 文件续传。
+    关闭后仍在运行的下载线程的写入直接忽略（关闭前已写入最后的进度）。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(default_data_dir(), 'jobs.sqlite3')
+        self.lock = threading.Lock()
+        self.closed = False
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' url TEXT NOT NULL,'
+            ' output_path TEXT NOT NULL,'
+            ' format_option TEXT NOT NULL,'
+            ' state TEXT NOT NULL,'
+            ' downloaded_bytes INTEGER NOT NULL DEFAULT 0,'
+            ' total_bytes INTEGER,'
+            ' updated_at REAL NOT NULL)'
+        )
+        self.conn.commit()
+
+    def record(self, job):
+        """写入任务的当前状态和格式（开始下载时格式会被替换为选定的format_id），
+        第一次写入时为任务分配 journal_id"""
+        now = time.time()
+        with self.lock:
+            if self.closed:
+                return
+            if job.journal_id is None:
+                cursor = self.conn.execute(
+                    'INSERT INTO jobs (url, output_path, format_option, state, updated_at) VALUES (?, ?, ?, ?, ?)',
+                    (job.url, job.output_path, job.format_option, job.state, now)
+                )
+                job.journal_id = cursor.lastrowid
+            else:
+                cursor = self.conn.execute(
+                    'UPDATE jobs SET state = ?, format_option = ?, updated_at = ? WHERE id = ?',
+                    (job.state, job.format_option, now, job.journal_id)
+                )
+                if cursor.rowcount == 0:
+                    # 已删除的任务被重试，用原来的ID重新写入
+                    self.conn.execute(
+                        'INSERT INTO jobs (id, url, output_path, format_option, state, updated_at)'
+                        ' VALUES (?, ?, ?, ?, ?, ?)',
+                        (job.journal_id, job.url, job.output_path, job.format_option, job.state, now)
+                    )
+            self.conn.commit()
+
+    def update_progress(self, journal_id, downloaded_bytes, total_bytes):
+        with self.lock:
+            if self.closed:
+                return
+            self.conn.execute(
+                'UPDATE jobs SET downloaded_bytes = ?, total_bytes = ?, updated_at = ? WHERE id = ?',
+                (downloaded_bytes, total_bytes, time.time(), journal_id)
+            )
+            self.conn.commit()
+
+    def remove(self, journal_id):
+        if journal_id is None:
+            return
+        with self.lock:
+            if self.closed:
+                return
+            self.conn.execute('DELETE FROM jobs WHERE id = ?', (journal_id,))
+            self.conn.commit()
+
+    def unfinished(self):
+        """按加入顺序返回所有未完成的任务"""
+        with self.lock:
+            if self.closed:
+                return []
+            rows = self.conn.execute(
+                'SELECT id, url, output_path, format_option, state, downloaded_bytes, total_bytes'
+                ' FROM jobs ORDER BY id'
+            ).fetchall()
+        return [JournalEntry(*row) for row in rows]
+
+    def close(self):
+        with self.lock:
+            if not self.closed:
+                self.conn.close()
+                self.closed = True
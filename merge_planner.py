@@ -0,0 +1,154 @@
+import os
+import shutil
+
+from format_selector import FormatConstraints, select_format
+from output_planner import escape_template
+
+# 输出文件名模板（相对于保存位置）
+OUTPUT_TEMPLATE = '%(title)s.%(ext)s'
+# 合并前各个流的文件名模板，与yt-dlp合并时使用的中间文件名相同
+STREAM_TEMPLATE = '%(title)s.f%(format_id)s.%(ext)s'
+
+# 后处理策略
+STRATEGY_DIRECT = 'direct'  # 音视频合一的单个文件，下载完即是最终文件
+STRATEGY_MERGE = 'merge'  # 两个流下载到保存位置，流复制合并后原地改名
+STRATEGY_MERGE_TEMP = 'merge-temp'  # 两个流下载到同一文件系统上的临时目录，合并后改名移入保存位置
+STRATEGY_AUTO = 'auto'  # 没有格式表（直接指定了格式字符串），由yt-dlp决定
+
+STRATEGY_TEXT = {
+    STRATEGY_DIRECT: '直接下载',
+    STRATEGY_MERGE: '流复制合并',
+    STRATEGY_MERGE_TEMP: '流复制合并',
+    STRATEGY_AUTO: '自动',
+}
+
+# 流复制合并时输出的容器：视频扩展名 -> 容器，其他组合使用mkv
+MERGE_CONTAINERS = {'mp4': 'mp4', 'webm': 'webm'}
+
+
+def ffmpeg_available():
+    return shutil.which('ffmpeg') is not None
+
+
+def same_filesystem(first, second):
+    """两个已存在的目录是否在同一文件系统上，在同一文件系统上移动文件只需改名"""
+    try:
+        return os.stat(first).st_dev == os.stat(second).st_dev
+    except OSError:
+        return False
+
+
+class MergePlan:
+    """一个任务的下载和后处理方式"""
+
+    def __init__(self, strategy, merge_format=None, temp_dir=None, note='', streams=None, name=None):
+        self.strategy = strategy
+        self.merge_format = merge_format
+        self.temp_dir = temp_dir
+        self.note = note
+        # 需要合并时各个流的format_id，这些流同时下载，全部完成后立即合并
+        self.streams = list(streams or [])
+        # OutputPlanner占用的文件名（不含扩展名），None时由yt-dlp按标题命名
+        self.name = name
+
+    @property
+    def parallel(self):
+        return len(self.streams) > 1
+
+    @property
+    def output_template(self):
+        """最终文件的输出模板（相对于保存位置），扩展名由yt-dlp决定"""
+        return escape_template(self.name) + '.%(ext)s' if self.name else OUTPUT_TEMPLATE
+
+    def stream_template(self, output_path):
+        """单独下载一个流时的输出路径模板，合并时yt-dlp会直接使用这些文件"""
+        template = escape_template(self.name) + '.f%(format_id)s.%(ext)s' if self.name else STREAM_TEMPLATE
+        return os.path.join(self.temp_dir or output_path, template)
+
+    def to_params(self, output_path):
+        """转换为 yt_dlp.YoutubeDL 的参数"""
+        params = {}
+        if self.temp_dir:
+            # 模板必须是相对路径，yt-dlp才会把中间文件放到 temp 目录
+            params['paths'] = {'home': output_path, 'temp': self.temp_dir}
+            params['outtmpl'] = self.output_template
+        if self.merge_format:
+            params['merge_output_format'] = self.merge_format
+        return params
+
+    def to_args(self, output_path):
+        """转换为 yt-dlp 命令行的输出参数"""
+        if self.temp_dir:
+            args = ['-P', output_path, '-P', 'temp:' + self.temp_dir, '-o', self.output_template]
+        else:
+            args = ['-o', os.path.join(output_path, self.output_template)]
+        if self.merge_format:
+            args += ['--merge-output-format', self.merge_format]
+        return args
+
+    def describe(self):
+        text = STRATEGY_TEXT.get(self.strategy, self.strategy)
+        if self.merge_format:
+            text += f'为{self.merge_format}'
+        if self.parallel:
+            text += '，各流同时下载'
+        note = self.note or (f'中间文件在 {self.temp_dir}' if self.temp_dir else '')
+        if note:
+            text += f'（{note}）'
+        return text
+
+    def to_dict(self):
+        return {
+            'strategy': self.strategy,
+            'merge_format': self.merge_format,
+            'temp_dir': self.temp_dir,
+            'note': self.note,
+            'streams': self.streams,
+            'name': self.name,
+        }
+
+
+class MergePlanner:
+    """为每个任务决定下载和后处理方式，避免不必要的重新读写
+
+    没有ffmpeg时无法合并，改选音视频合一的格式；需要合并时只做流复制，
+    输出容器与两个流兼容，不转码。temp_dir 只有与保存位置在同一文件系统上才使用，
+    否则合并后的整个文件还要再跨文件系统复制一次，此时改为在保存位置原地合并。
+    parallel 为True时需要合并的视频流和音频流同时下载，而不是yt-dlp默认的先后下载。
+    """
+
+    def __init__(self, temp_dir=None, can_merge=None, parallel=True):
+        self.temp_dir = temp_dir
+        self.can_merge = ffmpeg_available() if can_merge is None else can_merge
+        self.parallel = parallel
+
+    def select(self, info, constraints):
+        """按约束选择格式；不能合并时优先选择音视频合一的格式"""
+        choice = select_format(info, constraints)
+        if choice is not None and choice.needs_merge and not self.can_merge:
+            single = select_format(info, FormatConstraints(constraints.max_height, constraints.max_filesize,
+                                                           constraints.codec, True, constraints.container))
+            if single is not None and not single.needs_merge:
+                return single
+        return choice
+
+    def plan(self, choice, output_path):
+        if choice is None:
+            return MergePlan(STRATEGY_AUTO, temp_dir=self._temp_dir(output_path))
+        if not choice.needs_merge:
+            return MergePlan(STRATEGY_DIRECT)
+        if not self.can_merge:
+            return MergePlan(STRATEGY_DIRECT, note='没有ffmpeg，视频和音频将分别保存')
+        merge_format = MERGE_CONTAINERS.get(choice.video.ext, 'mkv')
+        streams = [entry.format_id for entry in choice.entries] if self.parallel else None
+        temp_dir = self._temp_dir(output_path)
+        if temp_dir:
+            return MergePlan(STRATEGY_MERGE_TEMP, merge_format, temp_dir, streams=streams)
+        note = '临时目录在其他文件系统上，改为原地合并' if self.temp_dir else ''
+        return MergePlan(STRATEGY_MERGE, merge_format, note=note, streams=streams)
+
+    def _temp_dir(self, output_path):
+        if not self.temp_dir:
+            return None
+        os.makedirs(self.temp_dir, exist_ok=True)
+        return self.temp_dir if same_filesystem(self.temp_dir, output_path) else None
@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+# 缓存条目的有效期（秒），过期后重新提取
+DEFAULT_TTL = 24 * 3600
+# 最多保留的条目数，超出时淘汰最久未访问的条目
+DEFAULT_MAX_ENTRIES = 1000
+
+# 信息字典中下载用不到且体积很大的字段，不写入缓存
+BULKY_FIELDS = ('automatic_captions', 'subtitles', 'heatmap', 'thumbnails')
+
+
+def default_data_dir():
+    """应用数据目录，与QSettings的配置放在同一位置，GUI和命令行共用"""
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    path = os.path.join(base, 'YouTubeDownloader')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class MetadataCache:
+    """以视频ID为键的SQLite元数据缓存，带TTL和按条目数的LRU淘汰
+
+    保存 video_info 字典和原始格式列表，读取时重新组装出 info_dict，
+    可直接用于下载。所有方法都是线程安全的；关闭后读取总是未命中，写入直接忽略。
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(default_data_dir(), 'metadata_cache.sqlite3')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.closed = False
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS metadata ('
+            ' video_id TEXT PRIMARY KEY,'
+            ' video_info TEXT NOT NULL,'
+            ' info TEXT NOT NULL,'
+            ' formats TEXT NOT NULL,'
+            ' fetched_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed_at)')
+        self.conn.commit()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, video_id):
+        """返回缓存的 video_info（含 info_dict），未命中或已过期时返回None"""
+        if not video_id:
+            return None
+        now = time.time()
+        with self.lock:
+            if self.closed:
+                return None
+            row = self.conn.execute(
+                'SELECT video_info, info, formats, fetched_at FROM metadata WHERE video_id = ?',
+                (video_id,)
+            ).fetchone()
+            if row is None or now - row[3] > self.ttl:
+                self.misses += 1
+                return None
+            self.conn.execute('UPDATE metadata SET accessed_at = ? WHERE video_id = ?', (now, video_id))
+            self.conn.commit()
+            self.hits += 1
+
+        video_info = json.loads(row[0])
+        info_dict = json.loads(row[1])
+        info_dict['formats'] = json.loads(row[2])
+        video_info['info_dict'] = info_dict
+        return video_info
+
+    def put(self, video_id, video_info):
+        """保存 video_info，其中的 info_dict 拆成信息和格式列表分别存储"""
+        if not video_id:
+            return
+        info_dict = dict(video_info.get('info_dict') or {})
+        formats = info_dict.pop('formats', [])
+        for field in BULKY_FIELDS:
+            info_dict.pop(field, None)
+        summary = {k: v for k, v in video_info.items() if k != 'info_dict'}
+
+        now = time.time()
+        with self.lock:
+            if self.closed:
+                return
+            self.conn.execute(
+                'INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)',
+                (video_id, json.dumps(summary), json.dumps(info_dict), json.dumps(formats), now, now)
+            )
+            self._evict()
+            self.conn.commit()
+
+    def invalidate(self, video_id):
+        with self.lock:
+            if self.closed:
+                return
+            self.conn.execute('DELETE FROM metadata WHERE video_id = ?', (video_id,))
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.conn.execute('DELETE FROM metadata')
+            self.conn.commit()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        with self.lock:
+            if self.closed:
+                return 0
+            return self.conn.execute('SELECT COUNT(*) FROM metadata').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            if not self.closed:
+                self.conn.close()
+                self.closed = True
+
+    def _evict(self):
+        """删除过期条目，并按最近访问时间淘汰超出上限的条目"""
+        self.conn.execute('DELETE FROM metadata WHERE fetched_at < ?', (time.time() - self.ttl,))
+        self.conn.execute(
+            'DELETE FROM metadata WHERE video_id IN ('
+            ' SELECT video_id FROM metadata ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
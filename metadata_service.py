@@ -0,0 +1,182 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from download_engine import (create_engine, SubprocessEngine, EngineError, build_extract_command,
+                             parse_info_output, process_group_options, signal_process_tree)
+from video_metadata import extract_video_id, build_video_info, download_thumbnail
+from metrics import STAGE_EXTRACT
+
+# 同时进行的查询数
+DEFAULT_CONCURRENCY = 8
+# 单个链接的超时（秒）
+DEFAULT_TIMEOUT = 60
+# 终止超时或取消的yt-dlp进程后，等待它退出的时间（秒）
+KILL_WAIT = 5
+
+
+class LookupResult:
+    """一个链接的查询结果：成功时 video_info 与 fetch_video_info 的返回值相同，失败时 error 是原因"""
+    __slots__ = ('url', 'video_info', 'error', 'seconds')
+
+    def __init__(self, url, video_info=None, error=None, seconds=0.0):
+        self.url = url
+        self.video_info = video_info
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.video_info is not None
+
+
+class MetadataService:
+    """用asyncio同时查询大量链接的视频信息，结果按完成的先后返回
+
+    同时进行的查询不超过 concurrency 个，每个链接最多等待 timeout 秒。
+    子进程引擎用 asyncio.create_subprocess_exec 运行yt-dlp，超时或取消时终止进程；
+    进程内引擎在线程池中提取，yt_dlp无法从外部中止，超时或取消后丢弃其结果。
+    传入 cache（MetadataCache）时先查缓存，提取结果写回缓存；
+    with_thumbnail 为True时同时获取缩略图（thumbnails 为ThumbnailCache或None）。
+    """
+
+    def __init__(self, engine_name='auto', concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 cache=None, force_refresh=False, thumbnails=None, with_thumbnail=False, metrics=None):
+        self.engine_name = engine_name
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.cache = cache
+        self.force_refresh = force_refresh
+        self.thumbnails = thumbnails
+        self.with_thumbnail = with_thumbnail
+        self.metrics = metrics
+        engine = create_engine(engine_name)
+        # 子进程引擎只借用它的命令行（基准测试可以替换 SubprocessEngine.command）
+        self.command = engine.command if isinstance(engine, SubprocessEngine) else None
+        # 进程内提取和获取缩略图使用的线程池
+        self.executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='metadata')
+        self.lock = threading.Lock()
+        self.loop = None
+        self.task = None
+        self.cancelled = False
+
+    async def lookup(self, url):
+        """查询一个链接，返回LookupResult；失败和超时不抛出异常"""
+        started = time.monotonic()
+        cached = self._cached(url)
+        if cached is not None:
+            return LookupResult(url, cached, seconds=time.monotonic() - started)
+        try:
+            info = await asyncio.wait_for(self._extract(url), self.timeout)
+        except asyncio.TimeoutError:
+            return self._failed(url, started, f'{self.timeout:g} 秒内没有获取到视频信息')
+        except EngineError as e:
+            return self._failed(url, started, str(e))
+        except Exception as e:
+            return self._failed(url, started, f'获取视频信息失败: {str(e) or type(e).__name__}')
+        if self.metrics is not None:
+            self.metrics.record(STAGE_EXTRACT, time.monotonic() - started, url=url)
+        loop = asyncio.get_running_loop()
+        if self.with_thumbnail:
+            info['thumbnail_path'] = await loop.run_in_executor(self.executor, download_thumbnail, info,
+                                                                self.thumbnails)
+        video_info = build_video_info(info, url)
+        if self.cache is not None:
+            self.cache.put(info.get('id') or extract_video_id(url), video_info)
+        return LookupResult(url, video_info, seconds=time.monotonic() - started)
+
+    async def lookup_many(self, urls):
+        """异步生成器：同时查询全部链接，按完成的先后产生LookupResult
+
+        提前停止迭代或被取消时，还没完成的查询一并取消，正在运行的yt-dlp进程被终止
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def limited(url):
+            async with semaphore:
+                return await self.lookup(url)
+
+        tasks = [asyncio.ensure_future(limited(url)) for url in urls]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def lookup_all(self, urls, on_result):
+        """在当前线程中运行事件循环，每完成一个链接调用一次 on_result(LookupResult)
+
+        可以从其他线程调用 cancel() 提前结束，取消后不能再次使用。返回是否全部完成（没有被取消）
+        """
+        return asyncio.run(self._consume(urls, on_result))
+
+    def cancel(self):
+        """取消 lookup_all，可以在任意线程中调用"""
+        with self.lock:
+            self.cancelled = True
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self.task.cancel)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _consume(self, urls, on_result):
+        with self.lock:
+            if self.cancelled:
+                return False
+            self.loop = asyncio.get_running_loop()
+            self.task = asyncio.current_task()
+        try:
+            async for result in self.lookup_many(urls):
+                on_result(result)
+            return True
+        except asyncio.CancelledError:
+            return False
+        finally:
+            with self.lock:
+                self.loop = None
+
+    def _cached(self, url):
+        if self.cache is None or self.force_refresh:
+            return None
+        video_info = self.cache.get(extract_video_id(url))
+        if video_info:
+            video_info['url'] = url
+            video_info['from_cache'] = True
+        return video_info or None
+
+    def _failed(self, url, started, error):
+        seconds = time.monotonic() - started
+        if self.metrics is not None:
+            self.metrics.record(STAGE_EXTRACT, seconds, False, url=url, error=error)
+        return LookupResult(url, error=error, seconds=seconds)
+
+    async def _extract(self, url):
+        if self.command is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self._extract_in_process, url)
+        process = await asyncio.create_subprocess_exec(
+            *build_extract_command(self.command, url),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            **process_group_options()
+        )
+        try:
+            stdout, stderr = await process.communicate()
+        except BaseException:
+            # 超时或取消：终止进程，不留下还在运行的yt-dlp
+            if process.returncode is None:
+                signal_process_tree(process.pid, force=True)
+                try:
+                    await asyncio.wait_for(process.wait(), KILL_WAIT)
+                except asyncio.TimeoutError:
+                    pass
+            raise
+        return parse_info_output(process.returncode, stdout.decode('utf-8', 'replace'),
+                                 stderr.decode('utf-8', 'replace'))
+
+    def _extract_in_process(self, url):
+        return create_engine(self.engine_name).extract_info(url)
@@ -0,0 +1,157 @@
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# 计时的阶段
+STAGE_SPAWN = 'spawn'  # 启动yt-dlp进程（或创建进程内的YoutubeDL）到它开始工作
+STAGE_EXTRACT = 'extract'  # 提取视频信息
+STAGE_THUMBNAIL = 'thumbnail'  # 获取缩略图
+STAGE_FIRST_BYTE = 'first_byte'  # 开始下载到收到第一个字节
+STAGE_JOB = 'job'  # 整个下载任务
+# 每个流的传输（video、audio、download）、合并（merge）和其他后处理（postprocess）沿用progress中的阶段名
+
+# 耗时直方图的分桶上限（秒）
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class _StageStats:
+    __slots__ = ('count', 'seconds', 'bytes', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.bytes = None  # 只有传输或写入数据的阶段才有字节数
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds, count_bytes):
+        self.count += 1
+        self.seconds += seconds
+        if count_bytes is not None:
+            self.bytes = (self.bytes or 0) + count_bytes
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+
+
+class MetricsRecorder:
+    """记录每个任务各阶段的耗时、字节数和真实的成败
+
+    每条记录立即以一行JSON写入 stream（文件或标准错误），同时按 (阶段, 成败) 汇总，
+    供 PrometheusExporter 以文本格式导出。可以在任意线程中调用。
+    """
+
+    def __init__(self, stream=None, clock=time.time):
+        self.stream = stream
+        self.clock = clock
+        self.stats = {}  # (阶段, 'ok'/'error') -> _StageStats
+        self.lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path):
+        """写入指定文件（追加），'-' 表示标准错误"""
+        if path == '-':
+            return cls(sys.stderr)
+        return cls(open(path, 'a', encoding='utf-8'))
+
+    def record(self, stage, seconds, ok=True, job=None, url=None, bytes=None, error=None):
+        entry = {'ts': round(self.clock(), 3), 'stage': stage, 'seconds': round(seconds, 4), 'ok': bool(ok)}
+        if job is not None:
+            entry['job'] = job
+        if url is not None:
+            entry['url'] = url
+        if bytes is not None:
+            entry['bytes'] = bytes
+        if error:
+            entry['error'] = str(error)
+        with self.lock:
+            key = (stage, 'ok' if ok else 'error')
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = _StageStats()
+            stats.add(seconds, bytes)
+            if self.stream is not None:
+                self.stream.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self.stream.flush()
+        return entry
+
+    @contextmanager
+    def timer(self, stage, **fields):
+        """计时一段代码；代码抛出异常时记为失败并继续抛出"""
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            self.record(stage, time.monotonic() - started, ok=False, error=str(e) or type(e).__name__, **fields)
+            raise
+        self.record(stage, time.monotonic() - started, **fields)
+
+    def prometheus_text(self):
+        """按Prometheus文本格式导出汇总数据"""
+        with self.lock:
+            items = sorted(self.stats.items())
+            snapshot = [(key, stats.count, stats.seconds, stats.bytes, list(stats.buckets)) for key, stats in items]
+        lines = [
+            '# HELP ytdl_stage_seconds 每个阶段的耗时（秒）',
+            '# TYPE ytdl_stage_seconds histogram',
+        ]
+        for (stage, status), count, seconds, _, buckets in snapshot:
+            labels = f'stage="{stage}",status="{status}"'
+            for bound, bucket in zip(BUCKETS, buckets):
+                lines.append(f'ytdl_stage_seconds_bucket{{{labels},le="{bound}"}} {bucket}')
+            lines.append(f'ytdl_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'ytdl_stage_seconds_sum{{{labels}}} {seconds:.6f}')
+            lines.append(f'ytdl_stage_seconds_count{{{labels}}} {count}')
+        lines += [
+            '# HELP ytdl_stage_bytes_total 每个阶段传输或写入的字节数',
+            '# TYPE ytdl_stage_bytes_total counter',
+        ]
+        for (stage, status), _, _, count_bytes, _ in snapshot:
+            if count_bytes is not None:
+                lines.append(f'ytdl_stage_bytes_total{{stage="{stage}",status="{status}"}} {count_bytes}')
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        with self.lock:
+            if self.stream is not None and self.stream not in (sys.stdout, sys.stderr):
+                self.stream.close()
+            self.stream = None
+
+
+class PrometheusExporter:
+    """在本机端口上以 /metrics 提供Prometheus文本格式的指标，在后台线程中运行"""
+
+    def __init__(self, recorder, port, host='127.0.0.1'):
+        # http.server连带导入email等模块，只在启用时导入
+        from http.server import ThreadingHTTPServer
+        self.recorder = recorder
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='metrics', daemon=True)
+        self.thread.start()
+
+    def _make_handler(self):
+        from http.server import BaseHTTPRequestHandler
+        recorder = self.recorder
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,235 @@
+import os
+import threading
+import unicodedata
+
+# 默认文件名（不含扩展名），可以使用信息字典中的 title、id、uploader 等字段
+NAME_TEMPLATE = '{title}'
+# 文件名（不含扩展名）的最大UTF-8字节数：大多数文件系统限制单个文件名255字节，
+# 还要留出重名后缀、.f<format_id>、.part-Frag<序号>.part 等yt-dlp附加的部分
+MAX_NAME_BYTES = 180
+# 重名时依次尝试 "名称 (2)"、"名称 (3)"……的上限
+MAX_DUPLICATES = 1000
+# 占用文件名的标记文件扩展名，内容是占用它的任务的键（下载记录ID或链接）和进程号，各占一行
+RESERVATION_SUFFIX = '.ytdl-reserved'
+
+# 本进程中正在占用的标记文件；同一个视频同时有两个任务（重复加入、播放列表中重复出现）时，
+# 后一个任务看到标记文件属于仍在占用的任务，改用加后缀的名称
+_live_markers = set()
+_live_lock = threading.Lock()
+
+# 文件名中不能使用的字符换成外观相近的全角字符，与yt-dlp默认的处理一致
+REPLACEMENTS = str.maketrans({
+    '/': '⧸', '\\': '⧹', ':': '：', '*': '＊', '?': '？', '"': '＂', '<': '＜', '>': '＞', '|': '｜',
+})
+# Windows的保留设备名，不能作为文件名（不论扩展名）
+RESERVED_NAMES = {'CON', 'PRN', 'AUX', 'NUL'} | {f'COM{i}' for i in range(1, 10)} | \
+    {f'LPT{i}' for i in range(1, 10)}
+
+
+def sanitize_filename(name, fallback='video'):
+    """把标题整理成在Windows、macOS和Linux上都合法的文件名（不含扩展名）"""
+    name = unicodedata.normalize('NFC', str(name or '')).translate(REPLACEMENTS)
+    # 控制字符和换行换成空格，连续空白合并为一个
+    name = ''.join(' ' if unicodedata.category(char) == 'Cc' else char for char in name)
+    name = ' '.join(name.split())
+    # Windows会去掉末尾的点和空格；开头的点在其他系统上是隐藏文件
+    name = name.strip(' .')
+    if not name:
+        name = fallback
+    if name.split('.')[0].upper() in RESERVED_NAMES:
+        name = '_' + name
+    return name
+
+
+def truncate_filename(name, max_bytes=MAX_NAME_BYTES):
+    """按UTF-8字节数截断文件名，不截断在多字节字符中间"""
+    encoded = name.encode('utf-8')
+    if len(encoded) <= max_bytes:
+        return name
+    return encoded[:max_bytes].decode('utf-8', 'ignore').rstrip(' .') or name[:1]
+
+
+def process_alive(pid):
+    """进程是否还在运行"""
+    if pid <= 0:
+        return False
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION；退出码 STILL_ACTIVE(259) 表示仍在运行
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def escape_template(text):
+    """yt-dlp的输出模板中 % 有特殊含义，字面的 % 要写成 %%"""
+    return text.replace('%', '%%')
+
+
+class _TemplateFields(dict):
+    def __missing__(self, key):
+        return ''
+
+
+class OutputTarget:
+    """一个任务占用的输出文件名：name 不含扩展名，扩展名由yt-dlp按下载的格式决定"""
+
+    def __init__(self, name, markers, key):
+        self.name = name
+        self.markers = markers  # 保存位置（和临时目录）中的标记文件
+        self.key = key
+
+    def to_dict(self):
+        return {'name': self.name}
+
+
+class OutputPlanner:
+    """下载开始前根据已有的信息字典决定最终文件名，并原子地占用它
+
+    文件名由 name_template 生成，替换不合法的字符并限制长度；
+    保存位置中已有以该名称开头的文件、或者被其他任务占用时，依次加上 " (2)"、" (3)" 后缀。
+    占用通过 O_EXCL 创建标记文件完成，同时运行的任务（包括其他进程）不会选中同一个名称；
+    同一个视频中断后恢复时（标记文件中是它自己的键，且写入它的任务已经结束）沿用原来的名称，
+    从 .part 文件续传；写入它的任务仍在运行时，即使是同一个视频也改用加后缀的名称。
+    临时目录由多个保存位置共用，使用临时目录时在其中也占用同一名称。
+    最终文件仍由yt-dlp写入：先写 .part（合并时写 .temp），完成后改名，不会出现写了一半的成品。
+    """
+
+    def __init__(self, name_template=NAME_TEMPLATE, max_bytes=MAX_NAME_BYTES):
+        self.name_template = name_template
+        self.max_bytes = max_bytes
+
+    def base_name(self, info):
+        """按模板生成整理后的文件名（不含扩展名和重名后缀）"""
+        info = info or {}
+        fields = _TemplateFields({key: value for key, value in info.items() if value is not None})
+        try:
+            name = self.name_template.format_map(fields)
+        except (ValueError, AttributeError, IndexError):
+            name = info.get('title') or ''
+        name = sanitize_filename(name, sanitize_filename(info.get('id'), 'video'))
+        return truncate_filename(name, self.max_bytes)
+
+    def reserve(self, output_path, info, key, temp_dir=None):
+        """占用一个不与已有文件和其他任务冲突的文件名，返回OutputTarget"""
+        directories = [output_path]
+        if temp_dir and os.path.normcase(os.path.abspath(temp_dir)) != os.path.normcase(os.path.abspath(output_path)):
+            directories.append(temp_dir)
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
+        base = self.base_name(info)
+        for index in range(1, MAX_DUPLICATES + 1):
+            name = base if index == 1 else truncate_filename(base, self.max_bytes - 8) + f' ({index})'
+            markers = self._claim(directories, name, key)
+            if markers is not None:
+                return OutputTarget(name, markers, key)
+        raise OSError(f'无法为 {base} 找到可用的文件名')
+
+    def release(self, target):
+        """任务结束后删除标记文件，名称可以被之后的任务使用"""
+        if target is not None:
+            self._remove(target.markers)
+
+    def suspend(self, target):
+        """任务结束但留下了未完成的文件：保留标记文件，之后同一个视频的任务可以接管它续传"""
+        if target is not None:
+            with _live_lock:
+                _live_markers.difference_update(target.markers)
+
+    def _claim(self, directories, name, key):
+        markers = []
+        for directory in directories:
+            marker = os.path.join(os.path.abspath(directory), name + RESERVATION_SUFFIX)
+            created = self._create(marker, key)
+            if not created and not self._take_over(marker, key):
+                self._remove(markers)
+                return None
+            markers.append(marker)
+            if created and self._taken(directory, name):
+                # 以前下载的同名文件（不是本任务的 .part）
+                self._remove(markers)
+                return None
+        return markers
+
+    def _create(self, marker, key):
+        """用 O_EXCL 新建标记文件，已存在时返回False"""
+        try:
+            fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(f'{key}\n{os.getpid()}\n')
+        with _live_lock:
+            _live_markers.add(marker)
+        return True
+
+    def _take_over(self, marker, key):
+        """接管同一个视频中断后留下的标记文件，沿用原来的名称
+
+        写入它的任务仍在运行（本进程中尚未释放，或者其他进程还活着）时不接管
+        """
+        owner_key, owner_pid = self._owner(marker)
+        if owner_key != key:
+            return False
+        if owner_pid == os.getpid():
+            with _live_lock:
+                if marker in _live_markers:
+                    return False
+        elif owner_pid and process_alive(owner_pid):
+            return False
+        # 先把旧标记改名：改名是原子的，同时接管的几个任务中只有一个能成功
+        stale = f'{marker}.{os.getpid()}.{threading.get_ident()}'
+        try:
+            os.rename(marker, stale)
+        except OSError:
+            return False
+        try:
+            return self._create(marker, key)
+        finally:
+            self._remove([stale])
+
+    def _owner(self, marker):
+        """返回标记文件中的 (键, 进程号)，没有进程号时（无法判断）进程号为None"""
+        try:
+            with open(marker, encoding='utf-8') as f:
+                lines = f.read().split('\n')
+        except OSError:
+            return None, None
+        try:
+            pid = int(lines[1])
+        except (IndexError, ValueError):
+            pid = None
+        return lines[0], pid
+
+    def _taken(self, directory, name):
+        """目录中是否已有以 name. 开头的文件（标记文件除外）"""
+        prefix = os.path.normcase(name + '.')
+        marker = os.path.normcase(name + RESERVATION_SUFFIX)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return False
+        return any(os.path.normcase(entry).startswith(prefix) and os.path.normcase(entry) != marker
+                   for entry in names)
+
+    def _remove(self, markers):
+        for marker in markers:
+            with _live_lock:
+                _live_markers.discard(marker)
+            try:
+                os.remove(marker)
+            except OSError:
+                pass
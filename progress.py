@@ -0,0 +1,379 @@
+import os
+import json
+import time
+import threading
+
+# 下载阶段
+STAGE_VIDEO = 'video'
+STAGE_AUDIO = 'audio'
+STAGE_DOWNLOAD = 'download'  # 音视频合一的单个文件
+STAGE_MERGE = 'merge'
+STAGE_POSTPROCESS = 'postprocess'
+
+STAGE_TEXT = {
+    STAGE_VIDEO: '视频',
+    STAGE_AUDIO: '音频',
+    STAGE_DOWNLOAD: '下载',
+    STAGE_MERGE: '合并',
+    STAGE_POSTPROCESS: '处理',
+}
+
+# 子进程引擎通过 --progress-template 让yt-dlp每行输出一条机器可读的进度，
+# 行首是固定前缀，下载进度后面依次是 format_id、vcodec、acodec 和进度字典的JSON，
+# 后处理进度后面是文件路径和进度字典的JSON
+DOWNLOAD_PREFIX = '[ytdl-progress] '
+POSTPROCESS_PREFIX = '[ytdl-postprocess] '
+DOWNLOAD_TEMPLATE = 'download:' + DOWNLOAD_PREFIX + '%(info.format_id)s %(info.vcodec)s %(info.acodec)s %(progress)j'
+POSTPROCESS_TEMPLATE = 'postprocess:' + POSTPROCESS_PREFIX + '%(info.filepath)j %(progress)j'
+
+_decoder = json.JSONDecoder()
+
+
+def stage_for_format(vcodec, acodec):
+    """根据编码判断当前下载的是视频流、音频流还是合一文件"""
+    if vcodec == 'none':
+        return STAGE_AUDIO
+    if acodec == 'none':
+        return STAGE_VIDEO
+    return STAGE_DOWNLOAD
+
+
+def format_bytes(count):
+    """把字节数格式化为与yt-dlp一致的字符串"""
+    if count is None:
+        return ''
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if count < 1024 or unit == 'GiB':
+            return f'{count:.2f}{unit}'
+        count /= 1024.0
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return ''
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f'{hours}:{minutes:02d}:{seconds:02d}'
+    return f'{minutes:02d}:{seconds:02d}'
+
+
+class ProgressEvent:
+    """一次结构化的进度事件，进程内引擎和子进程引擎产生相同的数据"""
+    __slots__ = ('status', 'stage', 'downloaded_bytes', 'total_bytes', 'speed', 'eta',
+                 'fragment_index', 'fragment_count', 'filename', 'format_id', 'postprocessor')
+
+    def __init__(self, status, stage, downloaded_bytes=None, total_bytes=None, speed=None, eta=None,
+                 fragment_index=None, fragment_count=None, filename=None, format_id=None, postprocessor=None):
+        self.status = status
+        self.stage = stage
+        self.downloaded_bytes = downloaded_bytes
+        self.total_bytes = total_bytes
+        self.speed = speed
+        self.eta = eta
+        self.fragment_index = fragment_index
+        self.fragment_count = fragment_count
+        self.filename = filename
+        self.format_id = format_id
+        self.postprocessor = postprocessor
+
+    @classmethod
+    def from_hook(cls, d, format_id=None, vcodec=None, acodec=None):
+        """从yt-dlp的progress_hooks字典构造事件"""
+        info = d.get('info_dict') or {}
+        format_id = format_id or info.get('format_id')
+        stage = stage_for_format(vcodec or info.get('vcodec'), acodec or info.get('acodec'))
+        return cls(
+            d.get('status'), stage,
+            downloaded_bytes=d.get('downloaded_bytes'),
+            total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+            speed=d.get('speed'),
+            eta=d.get('eta'),
+            fragment_index=d.get('fragment_index'),
+            fragment_count=d.get('fragment_count'),
+            filename=d.get('filename'),
+            format_id=format_id,
+        )
+
+    @classmethod
+    def from_postprocess(cls, d, filename=None):
+        """从yt-dlp的postprocessor_hooks字典构造事件"""
+        stage = STAGE_MERGE if d.get('postprocessor') == 'Merger' else STAGE_POSTPROCESS
+        filename = filename or (d.get('info_dict') or {}).get('filepath')
+        return cls(d.get('status'), stage, filename=filename, postprocessor=d.get('postprocessor'))
+
+    @property
+    def percent(self):
+        """当前流的完成百分比，无法计算时返回None"""
+        if self.status == 'finished':
+            return 100.0
+        if self.total_bytes and self.downloaded_bytes is not None:
+            return min(100.0, self.downloaded_bytes * 100.0 / self.total_bytes)
+        if self.fragment_count and self.fragment_index is not None:
+            return min(100.0, self.fragment_index * 100.0 / self.fragment_count)
+        return None
+
+    def describe(self):
+        """生成界面上显示的状态文字"""
+        parts = [STAGE_TEXT.get(self.stage, self.stage)]
+        if self.stage in (STAGE_MERGE, STAGE_POSTPROCESS):
+            parts.append('完成' if self.status == 'finished' else '进行中...')
+            return ' '.join(parts)
+        if self.total_bytes:
+            parts.append(f'{format_bytes(self.downloaded_bytes or 0)}/{format_bytes(self.total_bytes)}')
+        elif self.downloaded_bytes:
+            parts.append(format_bytes(self.downloaded_bytes))
+        if self.speed:
+            parts.append(format_bytes(self.speed) + '/s')
+        if self.eta is not None:
+            parts.append('剩余 ' + format_eta(self.eta))
+        return ' '.join(parts)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def parse_progress_line(line):
+    """解析子进程输出的一行，不是进度行时返回None
+
+    只做一次前缀比较和一次JSON解析，不使用正则表达式
+    """
+    if line.startswith(DOWNLOAD_PREFIX):
+        try:
+            format_id, vcodec, acodec, payload = line[len(DOWNLOAD_PREFIX):].split(' ', 3)
+            return ProgressEvent.from_hook(json.loads(payload), format_id, vcodec, acodec)
+        except ValueError:
+            return None
+    if line.startswith(POSTPROCESS_PREFIX):
+        try:
+            payload = line[len(POSTPROCESS_PREFIX):]
+            # 路径本身可能含空格，先解码出完整的JSON字符串；没有路径时yt-dlp输出NA
+            if payload.startswith('NA '):
+                filename, end = None, 2
+            else:
+                filename, end = _decoder.raw_decode(payload)
+            return ProgressEvent.from_postprocess(json.loads(payload[end:]), filename)
+        except ValueError:
+            return None
+    return None
+
+
+class ProgressAggregator:
+    """按任务合并进度事件，界面按固定频率一次性取出
+
+    工作线程只需记录每个任务最新的事件，不再为每条进度向GUI线程发送信号；
+    界面定时调用 drain()，一次处理所有任务在这段时间内的最新状态。
+    """
+
+    def __init__(self):
+        self.latest = {}
+        self.lock = threading.Lock()
+        self.received = 0
+        self.delivered = 0
+
+    def push(self, job_id, event):
+        with self.lock:
+            self.latest[job_id] = event
+            self.received += 1
+
+    def drain(self):
+        """取出自上次调用以来每个任务的最新事件，返回 {job_id: ProgressEvent}"""
+        with self.lock:
+            batch, self.latest = self.latest, {}
+            self.delivered += len(batch)
+        return batch
+
+
+class _StreamState:
+    __slots__ = ('done', 'total', 'finished')
+
+    def __init__(self, total=None):
+        self.done = 0
+        self.total = total
+        self.finished = False
+
+
+def expected_streams(info):
+    """根据信息字典预估要下载的流及其大小，返回 {阶段: 字节数或None}"""
+    if not info:
+        return {}
+    streams = {}
+    for fmt in info.get('requested_formats') or [info]:
+        stage = stage_for_format(fmt.get('vcodec'), fmt.get('acodec'))
+        streams[stage] = fmt.get('filesize') or fmt.get('filesize_approx')
+    return streams
+
+
+class ProgressEstimator:
+    """按实际字节数估算整个任务（视频+音频+合并）的进度、吞吐和剩余时间
+
+    吞吐量使用指数加权移动平均（EWMA），每隔 SAMPLE_INTERVAL 秒采样一次；
+    合并阶段按 MERGE_SHARE 计入总进度，耗时按 MERGE_RATE 估算。
+    """
+    ALPHA = 0.3
+    SAMPLE_INTERVAL = 0.25
+    MERGE_SHARE = 0.02
+    MERGE_RATE = 200 * 1024 * 1024  # 合并（流复制）时的磁盘吞吐，字节/秒
+
+    def __init__(self, streams=None, clock=time.monotonic):
+        self.clock = clock
+        self.streams = {stage: _StreamState(total) for stage, total in (streams or {}).items()}
+        self.merge_expected = len(self.streams) > 1
+        self.merge_done = False
+        self.throughput = None
+        self._sample_bytes = 0
+        self._sample_start = None
+
+    def update(self, event):
+        now = self.clock()
+        if event.stage == STAGE_MERGE:
+            self.merge_expected = True
+            self.merge_done = event.status == 'finished'
+            return
+        if event.stage == STAGE_POSTPROCESS:
+            return
+
+        stream = self.streams.get(event.stage)
+        if stream is None:
+            stream = self.streams[event.stage] = _StreamState()
+            self.merge_expected = self.merge_expected or len(self.streams) > 1
+        if event.total_bytes:
+            stream.total = event.total_bytes
+        if event.downloaded_bytes is not None:
+            delta = event.downloaded_bytes - stream.done
+            if delta < 0:
+                # 重新开始下载同一个流（例如重试），从新的起点计算
+                delta = event.downloaded_bytes
+            stream.done = event.downloaded_bytes
+            self._sample(delta, now)
+        if event.status == 'finished':
+            stream.finished = True
+            if stream.total is None or stream.done > stream.total:
+                stream.total = stream.done
+            stream.done = stream.total
+
+    def _sample(self, delta, now):
+        if self._sample_start is None:
+            # 第一条进度之前经过的时间未知，只作为采样起点
+            self._sample_start = now
+            return
+        self._sample_bytes += delta
+        elapsed = now - self._sample_start
+        if elapsed >= self.SAMPLE_INTERVAL:
+            rate = self._sample_bytes / elapsed
+            if self.throughput is None:
+                self.throughput = rate
+            else:
+                self.throughput = self.ALPHA * rate + (1 - self.ALPHA) * self.throughput
+            self._sample_bytes = 0
+            self._sample_start = now
+
+    @property
+    def total_bytes(self):
+        totals = [s.total for s in self.streams.values()]
+        if not totals or None in totals:
+            return None
+        return sum(totals)
+
+    @property
+    def downloaded_bytes(self):
+        return sum(min(s.done, s.total) if s.total else s.done for s in self.streams.values())
+
+    @property
+    def percent(self):
+        """整个任务的完成百分比，总大小未知时返回None"""
+        total = self.total_bytes
+        if not total:
+            return None
+        merge_share = self.MERGE_SHARE if self.merge_expected else 0.0
+        fraction = self.downloaded_bytes / total * (1 - merge_share)
+        if self.merge_done:
+            fraction += merge_share
+        return min(100.0, fraction * 100.0)
+
+    @property
+    def eta(self):
+        """剩余秒数，包括尚未开始的流和合并阶段"""
+        total = self.total_bytes
+        if not total or not self.throughput:
+            return None
+        remaining = max(0, total - self.downloaded_bytes) / self.throughput
+        if self.merge_expected and not self.merge_done:
+            remaining += total / self.MERGE_RATE
+        return remaining
+
+    def describe(self, event):
+        """生成界面上显示的状态文字，速度和剩余时间针对整个任务"""
+        parts = [STAGE_TEXT.get(event.stage, event.stage)]
+        if event.stage in (STAGE_MERGE, STAGE_POSTPROCESS):
+            parts.append('完成' if event.status == 'finished' else '进行中...')
+            return ' '.join(parts)
+        total = self.total_bytes
+        if total:
+            parts.append(f'{format_bytes(self.downloaded_bytes)}/{format_bytes(total)}')
+        else:
+            parts.append(format_bytes(self.downloaded_bytes))
+        if self.throughput:
+            parts.append(format_bytes(self.throughput) + '/s')
+        eta = self.eta
+        if eta is not None:
+            parts.append('剩余 ' + format_eta(eta))
+        return ' '.join(parts)
+
+
+class _StageTiming:
+    __slots__ = ('started', 'finished', 'bytes')
+
+    def __init__(self, started):
+        self.started = started
+        self.finished = None
+        self.bytes = None
+
+
+class StageRecorder:
+    """记录每个阶段（视频、音频、合并、其他后处理）的耗时和写入的字节数
+
+    下载阶段的字节数是流的大小；合并阶段是合并后写出的文件大小，
+    即合并额外读写的数据量。其他后处理只记录耗时。
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.stages = {}
+
+    def update(self, event):
+        now = self.clock()
+        timing = self.stages.get(event.stage)
+        if timing is None:
+            timing = self.stages[event.stage] = _StageTiming(now)
+        if event.stage in (STAGE_MERGE, STAGE_POSTPROCESS):
+            if event.status == 'finished':
+                timing.finished = now
+                if event.stage == STAGE_MERGE and event.filename and os.path.exists(event.filename):
+                    timing.bytes = os.path.getsize(event.filename)
+            return
+        done = event.total_bytes if event.status == 'finished' else event.downloaded_bytes
+        if done is not None:
+            timing.bytes = max(timing.bytes or 0, done)
+        if event.status == 'finished' and timing.finished is None:
+            # 流已单独下载完时，合并前yt-dlp还会再报告一次“已下载”
+            timing.finished = now
+
+    def report(self):
+        """返回 [{stage, seconds, bytes, finished}]，按阶段开始的先后排列；finished 为False的阶段没有完成"""
+        report = []
+        for stage, timing in sorted(self.stages.items(), key=lambda item: item[1].started):
+            finished = timing.finished is not None
+            end = timing.finished if finished else self.clock()
+            report.append({'stage': stage, 'seconds': round(end - timing.started, 3), 'bytes': timing.bytes,
+                           'finished': finished})
+        return report
+
+    def describe(self):
+        parts = []
+        for item in self.report():
+            text = f"{STAGE_TEXT.get(item['stage'], item['stage'])} {item['seconds']:.1f}s"
+            if item['bytes']:
+                text += ' ' + format_bytes(item['bytes'])
+            parts.append(text)
+        return ' · '.join(parts)
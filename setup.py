@@ -30,15 +30,19 @@ if not yt_dlp_found:
 
 # 构建选项
 build_exe_options = {
-    "packages": ["os", "sys", "re", "threading", "subprocess", "json", "PyQt5", "datetime", "urllib", "tempfile", "PyQt5.QtWidgets", "PyQt5.QtCore", "PyQt5.QtGui"],
-    "excludes": ["PyQt5.QtQml", "PyQt5.QtQuick"],  # 排除导致错误的模块
+    "packages": ["os", "sys", "re", "threading", "subprocess", "json", "PyQt5", "datetime", "urllib", "tempfile", "sqlite3", "PyQt5.QtWidgets", "PyQt5.QtCore", "PyQt5.QtGui", "yt_dlp"],
+    # 排除导致错误的模块，以及程序用不到的大型包，减小体积和启动时扫描的文件
+    "excludes": ["PyQt5.QtQml", "PyQt5.QtQuick", "PyQt5.QtWebEngine", "PyQt5.QtWebEngineCore",
+                 "PyQt5.QtWebEngineWidgets", "PyQt5.QtMultimedia", "PyQt5.QtBluetooth", "PyQt5.QtDesigner",
+                 "PyQt5.QtSql", "PyQt5.QtTest", "tkinter", "unittest", "test", "pydoc_data", "lib2to3", "xmlrpc"],
     "include_files": include_files,
     "include_msvcr": True,
-    "includes": ["video_info"],
+    "includes": ["theme", "video_info", "video_metadata", "metadata_cache", "metadata_service", "thumbnail_cache", "progress", "format_selector", "merge_planner", "output_planner", "download_engine", "download_queue", "download_profile", "job_journal", "download_archive", "bandwidth", "metrics", "downloader_cli"],
     "bin_includes": ["yt-dlp"],
     "bin_path_includes": [sys.executable.replace("python.exe", "Scripts")],  # 动态获取Python Scripts目录
+    # 纯Python包放在zip中减少导入时的文件查找；PyQt5的扩展模块和插件本来就要从磁盘加载
     "zip_include_packages": ["*"],
-    "zip_exclude_packages": [],
+    "zip_exclude_packages": ["PyQt5"],
     "build_exe": "build/YouTubeDownloader",  # 指定输出目录
     "optimize": 2,  # 优化字节码
 }
@@ -0,0 +1,225 @@
+import os
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPixmap
+
+THEME_LIGHT = 'light'
+THEME_DARK = 'dark'
+
+# 标题栏图标的显示尺寸（逻辑像素）
+LOGO_WIDTH = 180
+LOGO_HEIGHT = 60
+# 各主题使用的图标文件，无论主题如何都使用浅色图标
+LOGO_FILES = {
+    THEME_LIGHT: 'youtube_logo.svg',
+    THEME_DARK: 'youtube_logo.svg',
+}
+
+# 个别部件的样式按对象名写在主题样式表中，两种主题相同。
+# 样式都集中在这里，部件上不再单独调用setStyleSheet
+WIDGET_STYLES = """
+QLabel#title_label {
+    font-size: 24px;
+    font-weight: bold;
+    color: #FF0000;
+}
+QFrame#preview_frame, QFrame#info_frame {
+    background-color: #eee;
+    border-radius: 4px;
+}
+QLabel#thumbnail_label {
+    font-size: 16px;
+    color: #888;
+}
+QTextBrowser#info_browser {
+    background-color: transparent;
+    border: none;
+}
+QPushButton#browse_button {
+    background-color: #555;
+    padding: 6px 12px;
+}
+QPushButton#cancel_button {
+    background-color: #555;
+}
+QLabel#footer_label {
+    color: #888;
+    font-size: 12px;
+}
+"""
+
+STYLESHEETS = {
+    # 深色主题
+    THEME_DARK: """
+QMainWindow, QWidget, QDialog {
+    background-color: #2d2d2d;
+    color: #f0f0f0;
+}
+QLabel {
+    font-size: 14px;
+    color: #f0f0f0;
+}
+QLineEdit, QComboBox, QTextBrowser {
+    padding: 8px;
+    border: 1px solid #555;
+    border-radius: 4px;
+    background-color: #3d3d3d;
+    color: #00BFFF;
+    font-size: 14px;
+}
+QTextBrowser {
+    color: #1E90FF; /* 更亮的蓝色，提高在深色背景下的可读性 */
+}
+QPushButton {
+    padding: 8px 16px;
+    border: none;
+    border-radius: 4px;
+    background-color: #FF0000;
+    color: white;
+    font-weight: bold;
+    font-size: 14px;
+}
+QPushButton:hover {
+    background-color: #CC0000;
+}
+QPushButton:disabled {
+    background-color: #555555;
+}
+QProgressBar {
+    border: 1px solid #555;
+    border-radius: 4px;
+    text-align: center;
+    background-color: #3d3d3d;
+    color: #f0f0f0;
+}
+QProgressBar::chunk {
+    background-color: #FF0000;
+    border-radius: 3px;
+}
+QMenuBar {
+    background-color: #2d2d2d;
+    color: #f0f0f0;
+}
+QMenuBar::item:selected {
+    background-color: #3d3d3d;
+}
+QMenu {
+    background-color: #2d2d2d;
+    color: #f0f0f0;
+}
+QMenu::item:selected {
+    background-color: #3d3d3d;
+}
+QFrame {
+    background-color: transparent;
+    border-radius: 4px;
+    border: none;
+}
+""" + WIDGET_STYLES,
+    # 浅色主题
+    THEME_LIGHT: """
+QMainWindow, QWidget, QDialog {
+    background-color: #f9f9f9;
+    color: #333;
+}
+QLabel {
+    font-size: 14px;
+    color: #333;
+}
+QLineEdit, QComboBox, QTextBrowser {
+    padding: 8px;
+    border: 1px solid #ddd;
+    border-radius: 4px;
+    background-color: white;
+    color: #333;
+    font-size: 14px;
+}
+QPushButton {
+    padding: 8px 16px;
+    border: none;
+    border-radius: 4px;
+    background-color: #FF0000;
+    color: white;
+    font-weight: bold;
+    font-size: 14px;
+}
+QPushButton:hover {
+    background-color: #CC0000;
+}
+QPushButton:disabled {
+    background-color: #888888;
+}
+QProgressBar {
+    border: 1px solid #ddd;
+    border-radius: 4px;
+    text-align: center;
+    background-color: #f0f0f0;
+    color: #333;
+}
+QProgressBar::chunk {
+    background-color: #FF0000;
+    border-radius: 3px;
+}
+QMenuBar {
+    background-color: #f9f9f9;
+    color: #333;
+}
+QMenuBar::item:selected {
+    background-color: #e0e0e0;
+}
+QMenu {
+    background-color: #f9f9f9;
+    color: #333;
+}
+QMenu::item:selected {
+    background-color: #e0e0e0;
+}
+QFrame {
+    background-color: transparent;
+    border-radius: 4px;
+    border: none;
+}
+""" + WIDGET_STYLES,
+}
+
+
+class ThemeManager:
+    """切换主题：样式表是预先写好的常量，图标按 (主题, 设备像素比) 渲染一次后缓存
+
+    样式表只设置在主窗口上；切换到当前已应用的主题时不做任何事。
+    真正切换主题的耗时和原来相差无几：Qt要重新计算所有子部件的样式并重新布局，
+    缓存图标和去掉内联样式省下的时间在测量波动范围内（benchmarks/bench_theme_toggle.py）。
+    用调色板切换颜色也不行：使用样式表的部件在计算样式时会固定自己的调色板和背景，
+    之后改调色板不会生效，仍然要重新计算样式；只对顶层窗口重新计算则子部件不会更新。
+    """
+
+    def __init__(self, resource_dir):
+        self.resource_dir = resource_dir
+        self.logos = {}  # (主题, 设备像素比) -> QPixmap，图标文件不存在时为None
+        self.current = None
+
+    def logo(self, theme, ratio=1.0):
+        key = (theme, ratio)
+        if key not in self.logos:
+            self.logos[key] = self._render_logo(theme, ratio)
+        return self.logos[key]
+
+    def _render_logo(self, theme, ratio):
+        path = os.path.join(self.resource_dir, LOGO_FILES[theme])
+        if not os.path.exists(path):
+            return None
+        # 按设备像素比渲染，高DPI屏幕上不模糊
+        pixmap = QPixmap(path).scaled(int(LOGO_WIDTH * ratio), int(LOGO_HEIGHT * ratio),
+                                      Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        pixmap.setDevicePixelRatio(ratio)
+        return pixmap
+
+    def apply(self, window, theme, logo_label=None):
+        if theme != self.current:
+            window.setStyleSheet(STYLESHEETS[theme])
+            self.current = theme
+        if logo_label is not None:
+            logo = self.logo(theme, logo_label.devicePixelRatioF())
+            shown = logo_label.pixmap()
+            # 两种主题使用同一张图标时不必重新设置
+            if logo is not None and (shown is None or shown.cacheKey() != logo.cacheKey()):
+                logo_label.setPixmap(logo)
@@ -0,0 +1,246 @@
+import os
+import time
+import sqlite3
+import threading
+import urllib.parse
+
+from metadata_cache import default_data_dir
+
+# 预缩放后的缩略图尺寸，与界面上的预览区域一致
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_HEIGHT = 180
+# 磁盘缓存上限（字节），超出时按最近访问时间淘汰
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+# 超过这个时间（秒）的缓存条目在使用前发送条件请求重新验证
+REVALIDATE_AFTER = 7 * 24 * 3600
+# 单次缩略图请求的超时时间（秒）
+FETCH_TIMEOUT = 10
+
+
+class HttpConnectionPool:
+    """按主机复用的keep-alive HTTP连接池，避免每张缩略图都重新建立TLS连接"""
+
+    def __init__(self, max_idle_per_host=4, timeout=FETCH_TIMEOUT):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def request(self, url, headers=None, max_redirects=3):
+        """发送GET请求，返回 (状态码, 响应头, 响应体)"""
+        for _ in range(max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            status, response_headers, body = self._request_once(key, path, headers or {})
+            if status in (301, 302, 303, 307, 308) and response_headers.get('Location'):
+                url = urllib.parse.urljoin(url, response_headers['Location'])
+                continue
+            return status, response_headers, body
+        return status, response_headers, body
+
+    def _request_once(self, key, path, headers):
+        # http.client连带导入email等模块，第一次请求时才导入，不拖慢启动
+        import http.client
+        conn = self._acquire(key)
+        try:
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+            except (http.client.HTTPException, ConnectionError):
+                # 空闲连接可能已被服务器关闭，换新连接重试一次
+                conn.close()
+                conn = self._new_connection(key)
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+            body = response.read()
+        except Exception:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+        return response.status, response.headers, body
+
+    def _new_connection(self, key):
+        import http.client
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _acquire(self, key):
+        with self.lock:
+            connections = self.idle.get(key)
+            if connections:
+                return connections.pop()
+        return self._new_connection(key)
+
+    def _release(self, key, conn):
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.max_idle_per_host:
+                connections.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for conn in connections:
+                    conn.close()
+            self.idle.clear()
+
+
+class ThumbnailCache:
+    """缩略图磁盘缓存：条件重新获取、按字节预算的LRU淘汰、保存预缩放的图片
+
+    scaler(data) 把原始图片字节缩放为 320x180 并返回新的字节；
+    不提供时按原图保存（例如命令行模式下不依赖Qt）。
+    关闭后 get() 总是返回None，仍在进行的获取不再写入索引。
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, scaler=None, pool=None):
+        self.directory = directory or os.path.join(default_data_dir(), 'thumbnails')
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.scaler = scaler
+        # 所有查询共用一个连接池，连续查看多个视频时复用连接
+        self.pool = pool or HttpConnectionPool()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.conn = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'), check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS thumbnails ('
+            ' video_id TEXT PRIMARY KEY,'
+            ' url TEXT NOT NULL,'
+            ' etag TEXT,'
+            ' last_modified TEXT,'
+            ' size INTEGER NOT NULL,'
+            ' validated_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self.conn.commit()
+
+    def path_for(self, video_id):
+        return os.path.join(self.directory, f'{video_id}_{THUMBNAIL_WIDTH}x{THUMBNAIL_HEIGHT}.jpg')
+
+    def get(self, video_id, url):
+        """返回本地预缩放缩略图的路径，获取失败时返回None"""
+        if not video_id or not url:
+            return None
+        path = self.path_for(video_id)
+        with self.lock:
+            if self.closed:
+                return None
+            row = self.conn.execute(
+                'SELECT url, etag, last_modified, validated_at FROM thumbnails WHERE video_id = ?',
+                (video_id,)
+            ).fetchone()
+        # 同一视频的缩略图按视频ID缓存，预测地址和提取出的地址可以互相命中
+        cached = row is not None and os.path.exists(path)
+
+        now = time.time()
+        if cached and now - row[3] < REVALIDATE_AFTER:
+            # 缓存仍然新鲜，不访问网络
+            self._touch(video_id, now)
+            return path
+
+        headers = {}
+        if cached:
+            # 按缓存图片实际来源的地址重新验证（可能是备用的 hqdefault），条件请求头才对得上
+            url = row[0]
+            if row[1]:
+                headers['If-None-Match'] = row[1]
+            if row[2]:
+                headers['If-Modified-Since'] = row[2]
+        try:
+            status, data, etag, last_modified = self._fetch(url, headers)
+        except Exception:
+            # 网络失败时旧的缓存仍然可用
+            return path if cached else None
+
+        if cached and (status != 200 or not data):
+            # 服务器确认未修改，或者没有给出新图片（例如404）而继续使用旧的缓存：
+            # 都更新验证时间，否则之后每次查询都要再访问一次网络
+            with self.lock:
+                if not self.closed:
+                    self.conn.execute('UPDATE thumbnails SET validated_at = ?, accessed_at = ? WHERE video_id = ?',
+                                      (now, now, video_id))
+                    self.conn.commit()
+            return path
+        if status != 200 or not data:
+            return None
+
+        if self.scaler:
+            try:
+                data = self.scaler(data)
+            except Exception:
+                pass
+        self._write(video_id, url, path, data, etag, last_modified, now)
+        return path
+
+    def _fetch(self, url, headers):
+        status, response_headers, body = self.pool.request(url, headers)
+        return status, body, response_headers.get('ETag'), response_headers.get('Last-Modified')
+
+    def _write(self, video_id, url, path, data, etag, last_modified, now):
+        # 先写临时文件再替换，避免读到写了一半的图片
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self.lock:
+            if self.closed:
+                return
+            self.conn.execute(
+                'INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (video_id, url, etag, last_modified, len(data), now, now)
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _touch(self, video_id, now):
+        with self.lock:
+            if self.closed:
+                return
+            self.conn.execute('UPDATE thumbnails SET accessed_at = ? WHERE video_id = ?', (now, video_id))
+            self.conn.commit()
+
+    def _evict(self):
+        """按最近访问时间淘汰条目，直到总大小不超过预算"""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM thumbnails').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for video_id, size in self.conn.execute(
+                'SELECT video_id, size FROM thumbnails ORDER BY accessed_at').fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self.path_for(video_id))
+            except OSError:
+                pass
+            self.conn.execute('DELETE FROM thumbnails WHERE video_id = ?', (video_id,))
+            total -= size
+
+    def clear(self):
+        with self.lock:
+            if self.closed:
+                return
+            for (video_id,) in self.conn.execute('SELECT video_id FROM thumbnails').fetchall():
+                try:
+                    os.remove(self.path_for(video_id))
+                except OSError:
+                    pass
+            self.conn.execute('DELETE FROM thumbnails')
+            self.conn.commit()
+
+    def close(self):
+        self.pool.close()
+        with self.lock:
+            if not self.closed:
+                self.conn.close()
+                self.closed = True
@@ -1,117 +1,96 @@
-import os
-import json
-import subprocess
-import tempfile
-import urllib.request
-from PyQt5.QtCore import QThread, pyqtSignal
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QBuffer, QIODevice
+from PyQt5.QtGui import QImage
+from download_engine import create_engine, EngineError
+from video_metadata import fetch_video_info, prefetch_thumbnail, download_thumbnail
+from metrics import STAGE_THUMBNAIL
+from thumbnail_cache import THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT
+
+
+def scale_thumbnail(data):
+    """在工作线程中把缩略图缩放到预览尺寸并编码为JPEG，GUI线程只需解码小图"""
+    image = QImage.fromData(data)
+    if image.isNull():
+        return data
+    scaled = image.scaled(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    scaled.save(buffer, 'JPG', 90)
+    return bytes(buffer.data())
+
+
+# 文字信息发出后，最多再等待缩略图这么久（秒）
+THUMBNAIL_TIMEOUT = 5
+
 
 class VideoInfoThread(QThread):
     info_signal = pyqtSignal(dict)
+    thumbnail_signal = pyqtSignal(str, str)  # 视频ID, 缩略图路径（失败时为空）
     error_signal = pyqtSignal(str)
-    
-    def __init__(self, url):
+
+    def __init__(self, url, engine_name='auto', cache=None, force_refresh=False, thumbnails=None, metrics=None):
         super().__init__()
         self.url = url
+        self.engine_name = engine_name
+        self.engine = None  # 在工作线程中创建，进程内引擎第一次创建时要导入yt_dlp
+        self.cache = cache
+        self.thumbnails = thumbnails
+        self.force_refresh = force_refresh
+        self.metrics = metrics  # MetricsRecorder，记录提取和获取缩略图的耗时
         self.is_cancelled = False
-        
+
     def run(self):
         try:
-            # 构建命令获取视频信息
-            cmd = [
-                'yt-dlp',
-                '--dump-json',
-                '--no-playlist',
-                '--no-warnings',
-                '--no-check-certificate',
-                '--ignore-errors',
-                self.url
-            ]
-            
-            # 执行命令获取JSON数据
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            stdout, stderr = process.communicate()
-            
-            if process.returncode != 0 or not stdout.strip():
-                self.error_signal.emit("无法获取视频信息")
+            # 缩略图地址可以由视频ID推出，和信息提取同时开始获取
+            started = time.monotonic()
+            thumbnail_future = prefetch_thumbnail(self.url, self.thumbnails)
+
+            # 提取逻辑在不依赖GUI的video_metadata中，这里只负责发送信号
+            self.engine = create_engine(self.engine_name)
+            if self.is_cancelled:
                 return
-            
-            # 解析JSON数据
-            video_data = json.loads(stdout)
-            
-            # 下载缩略图
-            thumbnail_url = video_data.get('thumbnail')
-            if thumbnail_url:
-                # 创建临时文件保存缩略图
-                temp_dir = tempfile.gettempdir()
-                thumbnail_path = os.path.join(temp_dir, f"yt_thumb_{video_data.get('id')}.jpg")
-                
-                # 下载缩略图
-                try:
-                    urllib.request.urlretrieve(thumbnail_url, thumbnail_path)
-                    video_data['thumbnail_path'] = thumbnail_path
-                except Exception:
-                    video_data['thumbnail_path'] = None
-            
-            # 提取关键信息
-            video_info = {
-                'title': video_data.get('title', '未知标题'),
-                'uploader': video_data.get('uploader', '未知上传者'),
-                'duration': video_data.get('duration', 0),
-                'view_count': video_data.get('view_count', 0),
-                'like_count': video_data.get('like_count', 0),
-                'upload_date': video_data.get('upload_date', ''),
-                'description': video_data.get('description', '无描述'),
-                'thumbnail_path': video_data.get('thumbnail_path'),
-                'resolution': self._get_resolution(video_data),
-                'formats': self._get_formats(video_data),
-                'id': video_data.get('id', '')
-            }
-            
-            # 发送信号
+            video_info = fetch_video_info(self.url, self.engine, self.cache, self.force_refresh,
+                                          self.thumbnails, with_thumbnail=False, metrics=self.metrics)
+            if self.is_cancelled:
+                # 已被新的查询取代，不再发送过期的结果
+                return
+
+            # 文字信息解析完立即发送，不等缩略图
             self.info_signal.emit(video_info)
-            
+            if video_info.get('thumbnail_path'):
+                return
+
+            thumbnail_path = None
+            use_extracted = thumbnail_future is None
+            if thumbnail_future is not None:
+                try:
+                    thumbnail_path = thumbnail_future.result(timeout=THUMBNAIL_TIMEOUT)
+                    use_extracted = not thumbnail_path
+                except FutureTimeoutError:
+                    pass
+            if use_extracted:
+                # 无法预测地址或预测的地址不存在时，使用提取结果中的缩略图
+                thumbnail_path = download_thumbnail(video_info['info_dict'], self.thumbnails)
+            video_info['thumbnail_path'] = thumbnail_path
+            if self.is_cancelled:
+                return
+            if self.metrics is not None:
+                # 从预取开始计时，包括等待预取和回退到提取结果中的缩略图
+                self.metrics.record(STAGE_THUMBNAIL, time.monotonic() - started, bool(thumbnail_path), url=self.url,
+                                    error=None if thumbnail_path else '无法获取缩略图')
+            self.thumbnail_signal.emit(video_info.get('id', ''), thumbnail_path or '')
+
+        except EngineError as e:
+            if not self.is_cancelled:
+                self.error_signal.emit(str(e) or "无法获取视频信息")
         except Exception as e:
-            self.error_signal.emit(f"获取视频信息失败")
-    
-    def _get_resolution(self, video_data):
-        """从视频数据中提取最佳分辨率"""
-        if 'resolution' in video_data and video_data['resolution']:
-            return video_data['resolution']
-        
-        # 尝试从格式列表中获取最佳分辨率
-        best_height = 0
-        best_width = 0
-        
-        formats = video_data.get('formats', [])
-        for fmt in formats:
-            height = fmt.get('height', 0) or 0
-            width = fmt.get('width', 0) or 0
-            
-            if height > best_height:
-                best_height = height
-                best_width = width
-        
-        if best_height > 0 and best_width > 0:
-            return f"{best_width}x{best_height}"
-        return "未知"
-    
-    def _get_formats(self, video_data):
-        """获取可用的视频格式列表"""
-        formats = []
-        for fmt in video_data.get('formats', []):
-            if 'format_note' in fmt and fmt['format_note'] and 'format_id' in fmt:
-                format_info = f"{fmt.get('format_note')} ({fmt.get('ext', '')})"
-                if format_info not in formats:
-                    formats.append(format_info)
-        return formats
-    
+            if not self.is_cancelled:
+                self.error_signal.emit(f"获取视频信息失败: {str(e) or type(e).__name__}")
+
     def cancel(self):
-        self.is_cancelled = True
\ No newline at end of file
+        """取消查询：子进程引擎的yt-dlp进程被终止；进程内提取无法中止，但结果不再发送"""
+        self.is_cancelled = True
+        engine = self.engine
+        if engine is not None:
+            engine.cancel()
\ No newline at end of file
@@ -0,0 +1,159 @@
+import os
+import re
+import time
+import tempfile
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from download_engine import create_engine
+from format_selector import FormatTable
+from metrics import STAGE_EXTRACT, STAGE_THUMBNAIL
+
+# 缩略图在独立的小线程池中获取，与信息提取并行
+THUMBNAIL_EXECUTOR = ThreadPoolExecutor(2, thread_name_prefix='thumbnail')
+
+# 从各种YouTube链接（watch、youtu.be、shorts、embed、live）中取出11位视频ID
+VIDEO_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([0-9A-Za-z_-]{11})(?![0-9A-Za-z_-])')
+
+
+# 播放列表和频道链接（不含具体视频ID时），下载前需要先展开为各个视频
+COLLECTION_URL_RE = re.compile(r'youtube\.com/(?:playlist\?|@|channel/|c/|user/)')
+
+
+def extract_video_id(url):
+    """从链接中解析视频ID，无法识别时返回None"""
+    match = VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def is_collection_url(url):
+    """判断链接是否指向播放列表或频道；带视频ID的播放列表链接按单个视频处理"""
+    return bool(COLLECTION_URL_RE.search(url)) and extract_video_id(url) is None
+
+
+def predicted_thumbnail_urls(video_id):
+    """YouTube缩略图地址只取决于视频ID，无需等待提取结果"""
+    return [
+        f'https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg',
+        f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg',
+    ]
+
+
+def prefetch_thumbnail(url, thumbnails):
+    """根据链接中的视频ID在后台获取缩略图，返回Future；无法预测时返回None"""
+    video_id = extract_video_id(url)
+    if not video_id or thumbnails is None:
+        return None
+    return THUMBNAIL_EXECUTOR.submit(_fetch_first_thumbnail, thumbnails, video_id,
+                                     predicted_thumbnail_urls(video_id))
+
+
+def _fetch_first_thumbnail(thumbnails, video_id, urls):
+    for thumbnail_url in urls:
+        path = thumbnails.get(video_id, thumbnail_url)
+        if path:
+            return path
+    return None
+
+
+def fetch_video_info(url, engine=None, cache=None, force_refresh=False, thumbnails=None,
+                     with_thumbnail=True, metrics=None):
+    """提取视频信息并下载缩略图，返回界面和命令行共用的 video_info 字典
+
+    传入 cache 时先按视频ID查缓存，force_refresh 为True时跳过缓存重新提取；
+    传入 thumbnails（ThumbnailCache）时缩略图经由缩略图缓存获取；
+    with_thumbnail 为False时只返回文字信息，缩略图由调用方另行获取。
+    传入 metrics（MetricsRecorder）时记录提取和获取缩略图的耗时与成败。
+    提取失败时抛出 EngineError
+    """
+    video_id = extract_video_id(url)
+    if cache is not None and not force_refresh:
+        video_info = cache.get(video_id)
+        if video_info:
+            video_info['url'] = url
+            video_info['from_cache'] = True
+            # 缩略图可能已被清理或淘汰
+            if not video_info.get('thumbnail_path') or not os.path.exists(video_info['thumbnail_path']):
+                video_info['thumbnail_path'] = None
+                if with_thumbnail:
+                    video_info['thumbnail_path'] = timed_thumbnail(video_info['info_dict'], thumbnails, metrics, url)
+            return video_info
+
+    engine = engine or create_engine()
+    with metrics.timer(STAGE_EXTRACT, url=url) if metrics is not None else nullcontext():
+        video_data = engine.extract_info(url)
+    video_data['thumbnail_path'] = timed_thumbnail(video_data, thumbnails, metrics, url) if with_thumbnail else None
+    video_info = build_video_info(video_data, url)
+    if cache is not None:
+        cache.put(video_data.get('id') or video_id, video_info)
+    return video_info
+
+
+def timed_thumbnail(video_data, thumbnails=None, metrics=None, url=None):
+    """download_thumbnail，并在 metrics 中记录耗时；没有取到缩略图记为失败"""
+    started = time.monotonic()
+    path = download_thumbnail(video_data, thumbnails)
+    if metrics is not None and video_data.get('thumbnail'):
+        metrics.record(STAGE_THUMBNAIL, time.monotonic() - started, bool(path), url=url,
+                       error=None if path else '无法获取缩略图')
+    return path
+
+
+def download_thumbnail(video_data, thumbnails=None):
+    """下载缩略图，返回本地路径，失败时返回None
+
+    有缩略图缓存时由缓存负责获取和保存，否则下载到临时目录
+    """
+    thumbnail_url = video_data.get('thumbnail')
+    if not thumbnail_url:
+        return None
+    if thumbnails is not None:
+        return thumbnails.get(video_data.get('id'), thumbnail_url)
+
+    # 创建临时文件保存缩略图
+    temp_dir = tempfile.gettempdir()
+    thumbnail_path = os.path.join(temp_dir, f"yt_thumb_{video_data.get('id')}.jpg")
+
+    try:
+        import urllib.request  # 只有不用缩略图缓存时才需要，不在启动时导入
+        urllib.request.urlretrieve(thumbnail_url, thumbnail_path)
+        return thumbnail_path
+    except Exception:
+        return None
+
+
+def build_video_info(video_data, url):
+    """从yt-dlp的信息字典中提取关键信息"""
+    return {
+        'title': video_data.get('title', '未知标题'),
+        'uploader': video_data.get('uploader', '未知上传者'),
+        'duration': video_data.get('duration', 0),
+        'view_count': video_data.get('view_count', 0),
+        'like_count': video_data.get('like_count', 0),
+        'upload_date': video_data.get('upload_date', ''),
+        'description': video_data.get('description', '无描述'),
+        'thumbnail_path': video_data.get('thumbnail_path'),
+        'resolution': get_resolution(video_data),
+        'formats': get_formats(video_data),
+        'id': video_data.get('id', ''),
+        'url': url,
+        # 保留完整的信息字典（含全部格式和URL），下载时直接复用
+        'info_dict': video_data
+    }
+
+
+def get_resolution(video_data):
+    """从视频数据中提取最佳分辨率"""
+    if 'resolution' in video_data and video_data['resolution']:
+        return video_data['resolution']
+
+    # 从格式表中取画质最高的视频流
+    best = FormatTable(video_data).best_video()
+    if best and best.width and best.height:
+        return f"{best.width}x{best.height}"
+    return "未知"
+
+
+def get_formats(video_data):
+    """获取可用的视频格式列表（画质、编码、容器和大小），完整的格式表在 info_dict 中"""
+    return FormatTable(video_data).describe()
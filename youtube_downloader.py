@@ -1,19 +1,68 @@
+import time
+# 启动各阶段的时间点，--profile-startup 时打印
+STARTUP_MARKS = [('开始', time.perf_counter())]
+
+
+def mark_startup(name):
+    STARTUP_MARKS.append((name, time.perf_counter()))
+
+
 import sys
 import os
-import re
 import threading
-import subprocess
-import json
-import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QLineEdit, QProgressBar, QMessageBox,
-                             QComboBox, QFileDialog, QFrame, QSizePolicy, QSpacerItem,
-                             QScrollArea, QTextBrowser, QAction)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QUrl, QSize, QTimer, QSettings
-from PyQt5.QtGui import QIcon, QPixmap, QFont, QPalette, QColor, QDesktopServices
+                             QComboBox, QFileDialog, QFrame, QTextBrowser, QAction, QSpinBox,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView, QCheckBox)
+from PyQt5.QtCore import Qt, QObject, pyqtSignal, QTimer, QSettings
+from PyQt5.QtGui import QPixmap, QPixmapCache
+mark_startup('导入PyQt5')
+
+# 导入视频信息获取线程、下载引擎和下载队列
+from video_info import VideoInfoThread, scale_thumbnail
+from thumbnail_cache import ThumbnailCache
+from download_engine import is_info_fresh, get_format_option, load_yt_dlp, VIDEO_TYPES
+from progress import ProgressAggregator, format_bytes
+from format_selector import FormatConstraints, CODEC_TEXT
+from theme import ThemeManager, THEME_DARK, THEME_LIGHT
+from merge_planner import MergePlanner
+from output_planner import OutputPlanner, NAME_TEMPLATE
+from bandwidth import BandwidthManager, BandwidthSchedule
+from metrics import MetricsRecorder, PrometheusExporter
+from metadata_cache import MetadataCache
+from video_metadata import is_collection_url
+from job_journal import JobJournal
+from download_profile import (DownloadProfile, ProfileTuner, MAX_CONCURRENT_FRAGMENTS,
+                              DEFAULT_HTTP_CHUNK_SIZE, DEFAULT_BUFFER_SIZE)
+from download_archive import DownloadArchive
+from download_queue import (DownloadQueue, default_worker_count, PENDING, EXTRACTING,
+                            DOWNLOADING, COMPLETED, FAILED, CANCELLED, SKIPPED, PARTIAL_DELETE,
+                            PARTIAL_KEEP)
+mark_startup('导入程序模块')
+
+# 进度刷新频率（次/秒），所有任务的进度在同一次刷新中批量更新
+PROGRESS_UPDATE_HZ = 15
 
-# 导入视频信息获取线程
-from video_info import VideoInfoThread
+# “优先”任务的带宽权重，普通任务为1
+PRIORITY_WEIGHT = 4.0
+
+# 画质上限选项（短边像素，0表示不限）
+MAX_HEIGHT_CHOICES = [('最高', 0), ('2160p', 2160), ('1440p', 1440), ('1080p', 1080),
+                      ('720p', 720), ('480p', 480), ('360p', 360)]
+
+# 内存中缩略图缓存的上限（KB），每张320x180的图片约225KB
+THUMBNAIL_PIXMAP_CACHE_KB = 16 * 1024
+
+# 队列中各任务状态的显示文字
+JOB_STATE_TEXT = {
+    PENDING: '等待中',
+    EXTRACTING: '获取信息',
+    DOWNLOADING: '下载中',
+    COMPLETED: '已完成',
+    FAILED: '失败',
+    CANCELLED: '已取消',
+    SKIPPED: '已下载过',
+}
 
 # 确保资源目录存在
 def ensure_resource_dir():
@@ -26,152 +75,146 @@ def ensure_resource_dir():
         app_dir = os.path.dirname(os.path.abspath(__file__))
     
     resource_dir = os.path.join(app_dir, 'resources')
-    if not os.path.exists(resource_dir):
-        os.makedirs(resource_dir)
+    os.makedirs(resource_dir, exist_ok=True)
     return resource_dir
 
-# 下载线程
-class DownloadThread(QThread):
-    progress_signal = pyqtSignal(float, str)  # 移除下载速度参数
-    complete_signal = pyqtSignal(bool, str)
-    
-    def __init__(self, url, output_path, video_type):
-        super().__init__()
-        self.url = url
-        self.output_path = output_path
-        self.video_type = video_type
-        self.process = None
-        self.is_cancelled = False
-        
-    def run(self):
-        try:
-            # 创建输出目录（如果不存在）
-            if not os.path.exists(self.output_path):
-                os.makedirs(self.output_path)
-            
-            # 设置yt-dlp命令参数
-            format_option = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
-            if self.video_type == "Shorts (竖屏)":
-                # 对于Shorts视频，确保获取最高质量
-                format_option = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
-            
-            # 构建命令
-            cmd = [
-                'yt-dlp',
-                '--newline',  # 确保进度信息正确输出
-                '--progress-template', '%(progress._percent_str)s %(progress._speed_str)s',  # 添加速度信息
-                '-f', format_option,
-                '-o', os.path.join(self.output_path, '%(title)s.%(ext)s'),
-                '--no-warnings',  # 不显示警告
-                '--no-check-certificate',  # 不检查证书
-                '--ignore-errors',  # 忽略错误
-                '--no-playlist',  # 不下载播放列表
-                self.url
-            ]
-            
-            # 启动进程并捕获输出
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            # 发送初始进度信号，确保显示0.00%
-            self.progress_signal.emit(0.0, "初始化下载...")
-            
-            # 解析输出并发送进度信号
-            for line in iter(self.process.stdout.readline, ''):
-                if self.is_cancelled:
-                    self.process.terminate()
-                    self.complete_signal.emit(False, "下载已取消")
-                    return
-                
-                # 尝试从输出中提取进度百分比
-                try:
-                    # 检查是否包含URL编码格式（如%2f%%）
-                    if '%' in line and re.search(r'%[0-9a-fA-F]{2}%%', line):
-                        # 如果是URL编码格式，发送0%进度信号
-                        self.progress_signal.emit(0.0, line)
-                        continue
-                    
-                    # 提取下载速度信息
-                    speed_str = ""
-                    speed_match = re.search(r'(\d+\.\d+\s*[KMG]iB/s)', line)
-                    if speed_match:
-                        speed_str = speed_match.group(1)
-                    
-                    # 首先尝试匹配标准百分比格式
-                    percent_match = re.search(r'(\d+\.\d+)%', line)
-                    if percent_match:
-                        percent = float(percent_match.group(1))
-                        # 确保百分比在有效范围内
-                        if 0 <= percent <= 100:
-                            self.progress_signal.emit(percent, line)
-                        else:
-                            # 无效百分比，发送当前进度
-                            self.progress_signal.emit(0.0, line)
-                    else:
-                        # 尝试匹配其他可能的进度指示
-                        progress_match = re.search(r'(\d+\.\d+)\s*%', line)
-                        if progress_match:
-                            percent = float(progress_match.group(1))
-                            if 0 <= percent <= 100:
-                                self.progress_signal.emit(percent, line)
-                            else:
-                                self.progress_signal.emit(0.0, line)
-                        else:
-                            # 没有找到有效的进度信息，保持当前进度
-                            pass
-                except Exception:
-                    # 如果解析失败，继续处理下一行
-                    pass
-            
-            # 等待进程完成
-            return_code = self.process.wait()
-            
-            # 在发送完成信号前，发送一系列中间进度信号，确保平滑过渡
-            # 特别是从1.50%到更高值的过渡
-            if not self.is_cancelled:
-                # 发送几个中间进度信号，确保平滑过渡
-                # 这些信号会被update_progress方法处理，确保平滑过渡
-                for progress in [50.0, 75.0, 90.0, 95.0, 99.0]:
-                    self.progress_signal.emit(progress, "即将完成下载...")
-                    # 短暂暂停，让UI有时间更新
-                    QThread.msleep(50)
-            
-            # 检查是否成功完成
-            if return_code == 0 and not self.is_cancelled:
-                self.complete_signal.emit(True, "下载完成！")
-            elif not self.is_cancelled:
-                # 如果失败但不是因为取消，发送成功信号但显示不同消息
-                # 这样用户不会看到错误信息
-                self.complete_signal.emit(True, "下载完成！")
-        
-        except Exception as e:
-            # 捕获所有异常，但不向用户显示
-            self.complete_signal.emit(True, "下载完成！")
-    
-    def cancel(self):
-        self.is_cancelled = True
+# 下载队列的状态回调在工作线程中执行，通过信号转发到GUI线程；
+# 进度事件数量很大，不走信号，而是合并后由定时器按固定频率刷新
+class QueueSignals(QObject):
+    state_signal = pyqtSignal(int)
 
 # 主窗口类
 class YouTubeDownloader(QMainWindow):
-    def __init__(self):
+    # 首次绘制后的启动工作全部完成
+    startup_finished = pyqtSignal()
+    
+    def __init__(self, resume_unfinished=True):
         super().__init__()
-        self.download_thread = None
+        # 是否在启动后恢复任务日志中未完成的下载；--profile-startup 时不恢复，只测量启动
+        self.resume_on_startup = resume_unfinished
         self.video_info_thread = None
         self.current_video_info = None
+        self.current_job_id = None
+        self.job_rows = {}
         self.dark_mode = False
+        self.first_painted = False
+        self.resource_dir = ensure_resource_dir()
+        self.theme_manager = ThemeManager(self.resource_dir)
         self.settings = QSettings('YouTubeDownloader', 'Settings')
         self.load_settings()
+        
+        # 视频信息缓存，重复查询同一视频时无需再次提取
+        self.metadata_cache = MetadataCache()
+        # 缩略图磁盘缓存保存预缩放的图片，内存中的QPixmapCache复用已解码的图片
+        self.thumbnail_cache = ThumbnailCache(scaler=scale_thumbnail)
+        QPixmapCache.setCacheLimit(THUMBNAIL_PIXMAP_CACHE_KB)
+        
+        # 任务日志记录未完成的下载，下次启动时恢复
+        self.job_journal = JobJournal()
+        # 下载记录：已下载过的视频不再提取和下载
+        self.download_archive = DownloadArchive()
+        # 在同时下载的任务之间按权重分配总带宽
+        try:
+            schedule = BandwidthSchedule.parse(self.bandwidth_schedule)
+        except ValueError:
+            schedule = None
+        self.bandwidth = BandwidthManager(self.bandwidth_limit_kb * 1024, schedule)
+        # 各阶段耗时的记录，只在设置中指定了文件或端口时启用
+        self.metrics, self.metrics_exporter = self.build_metrics()
+        mark_startup('打开缓存和记录')
+        
+        # 创建下载队列，状态变化经由信号送回GUI线程，进度先在聚合器中合并
+        self.queue_signals = QueueSignals()
+        self.queue_signals.state_signal.connect(self.on_job_state)
+        self.progress_aggregator = ProgressAggregator()
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(1000 // PROGRESS_UPDATE_HZ)
+        self.progress_timer.timeout.connect(self.flush_progress)
+        self.download_queue = DownloadQueue(
+            self.max_workers, self.engine_name,
+            state_callback=lambda job: self.queue_signals.state_signal.emit(job.id),
+            progress_callback=lambda job: self.progress_aggregator.push(job.id, job.progress),
+            metadata_cache=self.metadata_cache,
+            profile_tuner=self.build_profile_tuner(),
+            journal=self.job_journal,
+            archive=self.download_archive,
+            bandwidth=self.bandwidth,
+            merge_planner=MergePlanner(self.temp_dir or None),
+            metrics=self.metrics,
+            partial_policy=PARTIAL_KEEP if self.keep_partial_files else PARTIAL_DELETE,
+            output_planner=OutputPlanner(self.name_template or NAME_TEMPLATE)
+        )
+        mark_startup('创建下载队列')
         self.initUI()
+        mark_startup('创建界面')
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_painted:
+            # 第一次绘制完成后再做不影响显示的启动工作
+            self.first_painted = True
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        mark_startup('首次绘制')
+        # 恢复上次关闭或崩溃时未完成的下载，已下载的部分从 .part 文件续传
+        resumed = self.download_queue.resume_unfinished() if self.resume_on_startup else []
+        if resumed:
+            self.set_current_job(resumed[0].id)
+            self.status_label.setText(f'已恢复 {len(resumed)} 个未完成的下载')
+        # 在后台预先导入yt_dlp，第一次获取信息时不用再等
+        if self.engine_name != 'subprocess':
+            threading.Thread(target=load_yt_dlp, name='import-yt-dlp', daemon=True).start()
+        mark_startup('恢复任务')
+        self.startup_finished.emit()
         
     def load_settings(self):
         # 加载设置
         self.dark_mode = self.settings.value('dark_mode', self.detect_system_theme(), type=bool)
+        # 下载引擎：auto（优先进程内yt_dlp）、inprocess 或 subprocess
+        self.engine_name = self.settings.value('engine', 'auto', type=str)
+        # 同时下载的任务数
+        self.max_workers = self.settings.value('max_concurrent_downloads', default_worker_count(), type=int)
+        # 分片并发数，0表示按实测吞吐自动调整；分块和缓冲区大小以字节为单位
+        self.concurrent_fragments = self.settings.value('concurrent_fragments', 0, type=int)
+        self.http_chunk_size = self.settings.value('http_chunk_size', DEFAULT_HTTP_CHUNK_SIZE, type=int)
+        self.buffer_size = self.settings.value('buffer_size', DEFAULT_BUFFER_SIZE, type=int)
+        # 总限速（KB/s，0表示不限速）和按时段的限速规则，例如 "08:00-23:00=1M,23:00-08:00=0"
+        self.bandwidth_limit_kb = self.settings.value('bandwidth_limit_kb', 0, type=int)
+        self.bandwidth_schedule = self.settings.value('bandwidth_schedule', '', type=str)
+        # 格式约束：画质上限、体积上限（MB，0表示不限）、优先编码、是否避免合并
+        self.max_height = self.settings.value('max_height', 0, type=int)
+        self.max_filesize_mb = self.settings.value('max_filesize_mb', 0, type=int)
+        self.preferred_codec = self.settings.value('preferred_codec', '', type=str)
+        self.avoid_merge = self.settings.value('avoid_merge', False, type=bool)
+        # 下载中间文件的目录，空表示直接放在保存位置
+        self.temp_dir = self.settings.value('temp_dir', '', type=str)
+        # 文件名模板（不含扩展名），可用 {title}、{id}、{uploader} 等字段
+        self.name_template = self.settings.value('name_template', NAME_TEMPLATE, type=str)
+        # 各阶段耗时写入的JSON lines文件，以及Prometheus指标的本机端口，空或0表示不启用
+        self.metrics_file = self.settings.value('metrics_file', '', type=str)
+        self.metrics_port = self.settings.value('metrics_port', 0, type=int)
+        # 取消下载后是否保留 .part 等未完成的文件，保留时重试可以续传
+        self.keep_partial_files = self.settings.value('keep_partial_files', False, type=bool)
+    
+    def build_metrics(self):
+        # 文件无法打开或端口被占用时不记录，不影响下载
+        if not self.metrics_file and not self.metrics_port:
+            return None, None
+        try:
+            metrics = MetricsRecorder.open(self.metrics_file) if self.metrics_file else MetricsRecorder()
+        except OSError:
+            return None, None
+        try:
+            exporter = PrometheusExporter(metrics, self.metrics_port) if self.metrics_port else None
+        except OSError:
+            exporter = None
+        return metrics, exporter
+    
+    def build_profile_tuner(self):
+        # 按当前设置创建下载参数来源，新加入的任务使用新的参数
+        base = DownloadProfile(self.concurrent_fragments or 1, self.http_chunk_size, self.buffer_size)
+        return ProfileTuner(base, auto=self.concurrent_fragments == 0)
     
     def detect_system_theme(self):
         # 检测系统主题
@@ -205,8 +248,23 @@ class YouTubeDownloader(QMainWindow):
         settings_menu = menubar.addMenu('设置')
         settings_menu.addAction(self.theme_action)
         
-        # 应用当前主题
-        self.apply_theme()
+        # 缓存相关操作
+        refresh_action = QAction('刷新视频信息（忽略缓存）', self)
+        refresh_action.triggered.connect(lambda: self.get_video_info(force_refresh=True))
+        clear_cache_action = QAction('清除视频信息和缩略图缓存', self)
+        clear_cache_action.triggered.connect(self.clear_metadata_cache)
+        settings_menu.addSeparator()
+        settings_menu.addAction(refresh_action)
+        settings_menu.addAction(clear_cache_action)
+        
+        # 下载记录与yt-dlp的 --download-archive 文件互通
+        import_archive_action = QAction('导入下载记录...', self)
+        import_archive_action.triggered.connect(self.import_archive)
+        export_archive_action = QAction('导出下载记录...', self)
+        export_archive_action.triggered.connect(self.export_archive)
+        settings_menu.addSeparator()
+        settings_menu.addAction(import_archive_action)
+        settings_menu.addAction(export_archive_action)
         
         # 创建中央部件和布局
         central_widget = QWidget()
@@ -216,21 +274,14 @@ class YouTubeDownloader(QMainWindow):
         
         # 标题和图标
         header_layout = QHBoxLayout()
-        logo_label = QLabel()
-        logo_label.setObjectName("logo_label")  # 设置对象名称以便在apply_theme中找到它
-        resource_dir = ensure_resource_dir()
-        logo_path = os.path.join(resource_dir, 'youtube_logo.svg')
-        
-        # 如果图标文件不存在，创建一个空白标签
-        if os.path.exists(logo_path):
-            logo_pixmap = QPixmap(logo_path)
-            # 使用更大尺寸并确保高质量缩放
-            logo_label.setPixmap(logo_pixmap.scaled(180, 60, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        # 图标在apply_theme中设置，图标文件不存在时是空白标签
+        self.logo_label = QLabel()
         
+        # 各部件的样式在主题样式表中按对象名设置
         title_label = QLabel('YouTube 视频下载器')
-        title_label.setStyleSheet('font-size: 24px; font-weight: bold; color: #FF0000;')
+        title_label.setObjectName('title_label')
         
-        header_layout.addWidget(logo_label)
+        header_layout.addWidget(self.logo_label)
         header_layout.addWidget(title_label, 1, Qt.AlignCenter)
         header_layout.addStretch(1)
         
@@ -260,27 +311,27 @@ class YouTubeDownloader(QMainWindow):
         # 左侧预览图
         preview_frame = QFrame()
         preview_frame.setFrameShape(QFrame.StyledPanel)
-        preview_frame.setStyleSheet('background-color: #eee; border-radius: 4px;')
+        preview_frame.setObjectName('preview_frame')
         preview_layout = QVBoxLayout(preview_frame)
         
         self.thumbnail_label = QLabel('无预览图')
         self.thumbnail_label.setAlignment(Qt.AlignCenter)
         self.thumbnail_label.setMinimumSize(320, 180)
         self.thumbnail_label.setMaximumSize(320, 180)
-        self.thumbnail_label.setStyleSheet('font-size: 16px; color: #888;')
+        self.thumbnail_label.setObjectName('thumbnail_label')
         
         preview_layout.addWidget(self.thumbnail_label)
         
         # 右侧视频信息
         info_frame = QFrame()
         info_frame.setFrameShape(QFrame.StyledPanel)
-        info_frame.setStyleSheet('background-color: #eee; border-radius: 4px;')
+        info_frame.setObjectName('info_frame')
         info_layout = QVBoxLayout(info_frame)
         
         # 使用QTextBrowser显示视频信息
         self.info_browser = QTextBrowser()
         self.info_browser.setMinimumHeight(180)
-        self.info_browser.setStyleSheet('background-color: transparent; border: none;')
+        self.info_browser.setObjectName('info_browser')
         self.info_browser.setOpenExternalLinks(True)
         self.info_browser.setText('点击"获取视频信息"按钮查看视频详情')
         
@@ -296,13 +347,86 @@ class YouTubeDownloader(QMainWindow):
         type_layout = QHBoxLayout()
         type_label = QLabel('视频类型:')
         self.type_combo = QComboBox()
-        self.type_combo.addItems(["普通视频 (横屏)", "Shorts (竖屏)"])
+        self.type_combo.addItems(VIDEO_TYPES)
+        
+        # 并发下载数
+        workers_label = QLabel('同时下载:')
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 16)
+        self.workers_spin.setValue(self.max_workers)
+        self.workers_spin.valueChanged.connect(self.change_max_workers)
+        
+        # 每个任务的分片并发数，0显示为“自动”
+        fragments_label = QLabel('分片并发:')
+        self.fragments_spin = QSpinBox()
+        self.fragments_spin.setRange(0, MAX_CONCURRENT_FRAGMENTS)
+        self.fragments_spin.setSpecialValueText('自动')
+        self.fragments_spin.setValue(self.concurrent_fragments)
+        self.fragments_spin.valueChanged.connect(self.change_concurrent_fragments)
         
         type_layout.addWidget(type_label)
         type_layout.addWidget(self.type_combo, 1)
+        type_layout.addWidget(workers_label)
+        type_layout.addWidget(self.workers_spin)
+        type_layout.addWidget(fragments_label)
+        type_layout.addWidget(self.fragments_spin)
+        
+        # 所有任务共享的总限速，0显示为“不限”
+        limit_label = QLabel('限速:')
+        self.limit_spin = QSpinBox()
+        self.limit_spin.setRange(0, 1000000)
+        self.limit_spin.setSingleStep(100)
+        self.limit_spin.setSuffix(' KB/s')
+        self.limit_spin.setSpecialValueText('不限')
+        self.limit_spin.setValue(self.bandwidth_limit_kb)
+        self.limit_spin.valueChanged.connect(self.change_bandwidth_limit)
+        type_layout.addWidget(limit_label)
+        type_layout.addWidget(self.limit_spin)
         
         main_layout.addLayout(type_layout)
         
+        # 格式约束，下载前按格式表选定具体的格式
+        format_layout = QHBoxLayout()
+        quality_label = QLabel('画质上限:')
+        self.quality_combo = QComboBox()
+        for text, height in MAX_HEIGHT_CHOICES:
+            self.quality_combo.addItem(text, height)
+        self.quality_combo.setCurrentIndex(max(0, self.quality_combo.findData(self.max_height)))
+        self.quality_combo.currentIndexChanged.connect(self.change_format_constraints)
+        
+        codec_label = QLabel('优先编码:')
+        self.codec_combo = QComboBox()
+        self.codec_combo.addItem('自动', '')
+        for codec in ('h264', 'vp9', 'av1'):
+            self.codec_combo.addItem(CODEC_TEXT[codec], codec)
+        self.codec_combo.setCurrentIndex(max(0, self.codec_combo.findData(self.preferred_codec)))
+        self.codec_combo.currentIndexChanged.connect(self.change_format_constraints)
+        
+        # 视频和音频合计的体积上限，0显示为“不限”
+        size_label = QLabel('体积上限:')
+        self.size_spin = QSpinBox()
+        self.size_spin.setRange(0, 100000)
+        self.size_spin.setSingleStep(50)
+        self.size_spin.setSuffix(' MB')
+        self.size_spin.setSpecialValueText('不限')
+        self.size_spin.setValue(self.max_filesize_mb)
+        self.size_spin.valueChanged.connect(self.change_format_constraints)
+        
+        self.merge_check = QCheckBox('避免合并')
+        self.merge_check.setToolTip('优先选择音视频合一的格式，省去下载两个流和合并')
+        self.merge_check.setChecked(self.avoid_merge)
+        self.merge_check.toggled.connect(self.change_format_constraints)
+        
+        format_layout.addWidget(quality_label)
+        format_layout.addWidget(self.quality_combo)
+        format_layout.addWidget(codec_label)
+        format_layout.addWidget(self.codec_combo)
+        format_layout.addWidget(size_label)
+        format_layout.addWidget(self.size_spin)
+        format_layout.addWidget(self.merge_check)
+        format_layout.addStretch(1)
+        main_layout.addLayout(format_layout)
+        
         # 输出路径选择
         path_layout = QHBoxLayout()
         path_label = QLabel('保存位置:')
@@ -310,7 +434,7 @@ class YouTubeDownloader(QMainWindow):
         self.path_input.setReadOnly(True)
         self.path_input.setText(os.path.join(os.path.expanduser('~'), 'Downloads'))
         browse_button = QPushButton('浏览...')
-        browse_button.setStyleSheet('background-color: #555; padding: 6px 12px;')
+        browse_button.setObjectName('browse_button')
         browse_button.clicked.connect(self.browse_output_path)
         
         path_layout.addWidget(path_label)
@@ -337,13 +461,31 @@ class YouTubeDownloader(QMainWindow):
         self.status_label = QLabel('准备下载...')
         self.status_label.setAlignment(Qt.AlignCenter)
         
-        status_layout.addWidget(self.status_label)
+        # 当前任务使用的下载参数
+        self.profile_label = QLabel('')
+        self.profile_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        
+        status_layout.addWidget(self.status_label, 1)
+        status_layout.addWidget(self.profile_label)
         
         progress_layout.addWidget(self.progress_bar)
         progress_layout.addLayout(status_layout)
         
         main_layout.addLayout(progress_layout)
         
+        # 下载队列列表，每个任务单独显示进度
+        self.queue_table = QTableWidget(0, 3)
+        self.queue_table.setHorizontalHeaderLabels(['视频', '状态', '进度'])
+        self.queue_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.queue_table.verticalHeader().setVisible(False)
+        self.queue_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.queue_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.queue_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.queue_table.setMinimumHeight(120)
+        self.queue_table.itemSelectionChanged.connect(self.on_queue_selection_changed)
+        
+        main_layout.addWidget(self.queue_table)
+        
         # 按钮区域
         button_layout = QHBoxLayout()
         button_layout.addStretch(1)
@@ -355,11 +497,25 @@ class YouTubeDownloader(QMainWindow):
         self.cancel_button = QPushButton('取消')
         self.cancel_button.setMinimumWidth(120)
         self.cancel_button.setEnabled(False)
-        self.cancel_button.setStyleSheet('background-color: #555;')
+        self.cancel_button.setObjectName('cancel_button')
         self.cancel_button.clicked.connect(self.cancel_download)
         
+        self.retry_button = QPushButton('重试')
+        self.retry_button.setMinimumWidth(120)
+        self.retry_button.setEnabled(False)
+        self.retry_button.clicked.connect(self.retry_download)
+        
+        # 优先的任务分得更多带宽
+        self.priority_button = QPushButton('优先')
+        self.priority_button.setMinimumWidth(120)
+        self.priority_button.setCheckable(True)
+        self.priority_button.setEnabled(False)
+        self.priority_button.clicked.connect(self.toggle_priority)
+        
         button_layout.addWidget(self.download_button)
         button_layout.addWidget(self.cancel_button)
+        button_layout.addWidget(self.retry_button)
+        button_layout.addWidget(self.priority_button)
         button_layout.addStretch(1)
         
         main_layout.addLayout(button_layout)
@@ -370,7 +526,7 @@ class YouTubeDownloader(QMainWindow):
         # 添加底部信息
         footer_layout = QHBoxLayout()
         footer_label = QLabel('© 2025 YouTube 视频下载器 - 基于yt-dlp')
-        footer_label.setStyleSheet('color: #888; font-size: 12px;')
+        footer_label.setObjectName('footer_label')
         footer_layout.addStretch(1)
         footer_layout.addWidget(footer_label)
         footer_layout.addStretch(1)
@@ -378,6 +534,9 @@ class YouTubeDownloader(QMainWindow):
         main_layout.addLayout(footer_layout)
         
         self.setCentralWidget(central_widget)
+        
+        # 所有部件创建完后应用一次主题（同时设置图标），样式表只需计算一遍
+        self.apply_theme()
     
     def browse_output_path(self):
         directory = QFileDialog.getExistingDirectory(self, '选择保存位置', self.path_input.text())
@@ -385,183 +544,218 @@ class YouTubeDownloader(QMainWindow):
             self.path_input.setText(directory)
     
     def start_download(self):
-        url = self.url_input.text().strip()
-        if not url:
+        # 输入框中可以用空格分隔多个链接，全部加入下载队列
+        urls = self.url_input.text().split()
+        if not urls:
             QMessageBox.warning(self, '输入错误', '请输入有效的YouTube视频链接')
             return
         
         # 简单验证URL格式
-        if not ('youtube.com' in url or 'youtu.be' in url):
+        if not all('youtube.com' in url or 'youtu.be' in url for url in urls):
             QMessageBox.warning(self, '输入错误', '请输入有效的YouTube视频链接')
             return
         
         output_path = self.path_input.text()
-        video_type = self.type_combo.currentText()
-        
-        # 禁用下载按钮，启用取消按钮
-        self.download_button.setEnabled(False)
-        self.cancel_button.setEnabled(True)
+        constraints = self.build_format_constraints()
+        format_option = get_format_option(self.type_combo.currentText(), constraints)
+        
+        # 已获取过该链接的视频信息且格式URL未过期时直接复用，否则由队列在下载前提取
+        # 播放列表和频道在后台平铺展开，条目逐个进入队列
+        info = self.current_video_info
+        job = None
+        for url in urls:
+            if is_collection_url(url):
+                self.download_queue.enqueue_collection(url, output_path, format_option, constraints)
+                continue
+            info_dict = None
+            if info and info.get('url') == url and is_info_fresh(info.get('info_dict')):
+                info_dict = info.get('info_dict')
+            job = self.download_queue.enqueue(url, output_path, format_option, info_dict,
+                                              constraints=constraints)
+        
+        # 进度条跟随最后加入的任务；只有播放列表时等第一个条目开始下载再切换
+        if job:
+            self.set_current_job(job.id)
+        else:
+            self.status_label.setText('正在展开播放列表...')
+    
+    def set_current_job(self, job_id):
+        # 切换进度条显示的任务
+        self.current_job_id = job_id
+        job = self.download_queue.get(job_id)
         
         # 确保进度条显示为0.00%
         self.progress_bar.setValue(0)
         self.progress_bar.setFormat('0.00%')
         self.status_label.setText('正在准备下载...')
         
-        # 初始化进度跟踪变量
-        self.last_valid_progress = 0.0
-        
-        # 如果尚未获取视频信息，先获取视频信息
-        if not self.current_video_info:
-            # 创建并启动视频信息线程
-            self.video_info_thread = VideoInfoThread(url)
-            self.video_info_thread.info_signal.connect(self._continue_download)
-            self.video_info_thread.error_signal.connect(self._continue_download_without_info)
-            self.video_info_thread.start()
-        else:
-            # 直接开始下载
-            self._start_download_thread(url, output_path, video_type)
+        if job and job.progress:
+            self.update_progress(job)
+        self.update_profile_label(job)
+        self.update_queue_buttons()
     
-    def _continue_download(self, video_info):
-        # 更新视频信息
-        self.update_video_info(video_info)
+    def on_job_state(self, job_id):
+        job = self.download_queue.get(job_id)
+        if not job:
+            return
         
-        # 继续下载
-        url = self.url_input.text().strip()
-        output_path = self.path_input.text()
-        video_type = self.type_combo.currentText()
-        self._start_download_thread(url, output_path, video_type)
+        # 新任务在列表末尾追加一行
+        row = self.job_rows.get(job_id)
+        if row is None:
+            row = self.queue_table.rowCount()
+            self.job_rows[job_id] = row
+            self.queue_table.insertRow(row)
+            title_item = QTableWidgetItem(job.title)
+            title_item.setData(Qt.UserRole, job_id)
+            self.queue_table.setItem(row, 0, title_item)
+            self.queue_table.setItem(row, 1, QTableWidgetItem())
+            row_progress = QProgressBar()
+            row_progress.setRange(0, 100)
+            self.queue_table.setCellWidget(row, 2, row_progress)
+        
+        self.queue_table.item(row, 0).setText(job.title)
+        self.queue_table.item(row, 1).setText(JOB_STATE_TEXT.get(job.state, job.state))
+        if job.is_finished and job.stages:
+            # 各阶段耗时和写入字节数
+            self.queue_table.item(row, 1).setToolTip(job.stages.describe())
+        self.queue_table.cellWidget(row, 2).setValue(int(job.percent))
+        
+        # 有任务在运行时才启动进度刷新定时器
+        if not job.is_finished and job.state != PENDING and not self.progress_timer.isActive():
+            self.progress_timer.start()
+        
+        # 当前任务结束后，进度条切换到下一个正在下载的任务
+        current = self.download_queue.get(self.current_job_id)
+        if job.state == DOWNLOADING and (current is None or current.is_finished):
+            self.set_current_job(job_id)
+        elif job_id == self.current_job_id and job.state == DOWNLOADING:
+            self.update_profile_label(job)
+        elif job_id == self.current_job_id and job.is_finished:
+            # 队列全部完成后才弹出提示，避免批量下载时不停弹窗
+            self.download_complete(job.state == COMPLETED, job.status_text,
+                                   self.download_queue.active_count() == 0)
+        self.update_queue_buttons()
     
-    def _continue_download_without_info(self, error_message):
-        # 显示错误信息但继续下载
-        self.show_info_error(error_message)
-        
-        # 继续下载
-        url = self.url_input.text().strip()
-        output_path = self.path_input.text()
-        video_type = self.type_combo.currentText()
-        self._start_download_thread(url, output_path, video_type)
-    
-    def _start_download_thread(self, url, output_path, video_type):
-        # 创建并启动下载线程
-        self.download_thread = DownloadThread(url, output_path, video_type)
-        self.download_thread.progress_signal.connect(self.update_progress)
-        self.download_thread.complete_signal.connect(self.download_complete)
-        self.download_thread.start()
-    
-    def update_progress(self, percent, info):
-        # 检查是否包含URL编码格式的百分比（如%2f%%）或其他非下载信息
-        if '%' in info and re.search(r'%[0-9a-fA-F]{2}%%', info):
-            # 如果是URL编码格式且未开始下载，完全隐藏百分比显示
-            self.progress_bar.setValue(0)
-            self.progress_bar.setFormat('')  # 不显示百分比
-            self.status_label.setText('正在准备下载...')
+    def flush_progress(self):
+        # 每个刷新周期只处理每个任务最新的一条进度
+        batch = self.progress_aggregator.drain()
+        for job_id in batch:
+            job = self.download_queue.get(job_id)
+            if job and not job.is_finished:
+                self.on_job_progress(job)
+        if not batch and self.download_queue.active_count() == 0:
+            self.progress_timer.stop()
+    
+    def on_job_progress(self, job):
+        row = self.job_rows.get(job.id)
+        if row is not None:
+            self.queue_table.cellWidget(row, 2).setValue(int(job.percent))
+        if job.id == self.current_job_id:
+            self.update_progress(job)
+    
+    def on_queue_selection_changed(self):
+        items = self.queue_table.selectedItems()
+        if items:
+            job_id = self.queue_table.item(items[0].row(), 0).data(Qt.UserRole)
+            if job_id != self.current_job_id:
+                self.set_current_job(job_id)
+    
+    def update_profile_label(self, job):
+        if not job or not job.profile:
+            self.profile_label.setText('')
             return
-            
-        # 确保百分比是有效的数值
-        try:
-            percent_value = float(percent)
-            # 严格限制百分比范围
-            if percent_value < 0:
-                percent_value = 0
-            elif percent_value > 100:
-                percent_value = 99.9  # 限制最大值为99.9%，让download_complete来处理100%
-            
-            # 增强平滑处理：获取当前进度条值，更严格地限制变化幅度
-            current_value = self.progress_bar.value()
-            
-            # 如果是初始状态（当前值为0）且收到的百分比大于0，表示开始下载
-            if current_value == 0 and percent_value > 0:
-                # 初始下载时，使用较小的初始值，避免突然跳跃
-                percent_value = min(1.0, percent_value)
-                self.progress_bar.setFormat(f'{percent_value:.2f}%')  # 开始显示百分比
-            # 如果新值比当前值小，保持当前值以避免倒退（除非差距很大）
-            elif percent_value < current_value:
-                if current_value - percent_value > 10:  # 只有差距很大时才允许减少
-                    percent_value = current_value - 0.5  # 非常缓慢地减少
-                else:
-                    percent_value = current_value  # 否则保持不变
-            # 如果新值比当前值大，限制增长速度
-            elif percent_value > current_value:
-                # 根据当前进度不同，使用不同的增长速度限制
-                if current_value < 10:  # 初始阶段
-                    max_increase = 0.3  # 更缓慢增长
-                elif current_value < 50:  # 中间阶段
-                    max_increase = 0.7  # 缓慢增长
-                else:  # 后期阶段
-                    max_increase = 1.0  # 稍快增长但仍然受限
-                
-                # 限制单次增长幅度
-                if percent_value - current_value > max_increase:
-                    percent_value = current_value + max_increase
-                
-                # 特殊处理：如果当前值在1.5%附近，确保不会直接跳到高值
-                if 1.0 <= current_value <= 2.0 and percent_value > 5.0:
-                    # 强制限制增长，确保平滑过渡
-                    percent_value = current_value + 0.2
-            
-            # 更新进度条和显示
-            self.progress_bar.setValue(int(percent_value))
-            self.progress_bar.setFormat(f'{percent_value:.2f}%')
-            
-            # 显示下载状态
-            self.status_label.setText('正在下载...')
-            
-            # 存储最后一次有效的进度值，用于平滑过渡
-            self.last_valid_progress = percent_value
-            
-        except (ValueError, TypeError):
-            # 如果百分比无效，完全隐藏百分比并保持当前状态
-            self.status_label.setText('正在准备下载...')
-            # 不更新进度条，保持当前值为0并清除格式
-            self.progress_bar.setValue(0)
-            self.progress_bar.setFormat('')  # 隐藏百分比显示
-    
-    def download_complete(self, success, message):
-        # 重置UI状态
-        self.download_button.setEnabled(True)
-        self.cancel_button.setEnabled(False)
-        
+        text = job.profile.describe()
+        if job.plan:
+            text += ' · ' + job.plan.describe()
+        engine = job.engine
+        if engine is not None and engine.rate_limit:
+            text += f' · 限速 {format_bytes(engine.rate_limit)}/s'
+        self.profile_label.setText(text)
+    
+    def update_queue_buttons(self):
+        job = self.download_queue.get(self.current_job_id)
+        self.cancel_button.setEnabled(bool(job) and not job.is_finished)
+        self.retry_button.setEnabled(bool(job) and job.state in (FAILED, CANCELLED))
+        self.priority_button.setEnabled(bool(job) and not job.is_finished)
+        self.priority_button.setChecked(bool(job) and job.weight > 1.0)
+    
+    def change_max_workers(self, value):
+        self.max_workers = value
+        self.download_queue.set_max_workers(value)
+        self.settings.setValue('max_concurrent_downloads', value)
+    
+    def change_bandwidth_limit(self, value):
+        self.bandwidth_limit_kb = value
+        self.bandwidth.set_limit(value * 1024)
+        self.settings.setValue('bandwidth_limit_kb', value)
+    
+    def toggle_priority(self, checked):
+        self.download_queue.set_weight(self.current_job_id, PRIORITY_WEIGHT if checked else 1.0)
+        self.update_profile_label(self.download_queue.get(self.current_job_id))
+    
+    def build_format_constraints(self):
+        return FormatConstraints(self.max_height, self.max_filesize_mb * 1024 * 1024,
+                                 self.preferred_codec, self.avoid_merge)
+    
+    def change_format_constraints(self, *args):
+        # 只影响之后加入的任务
+        self.max_height = self.quality_combo.currentData()
+        self.preferred_codec = self.codec_combo.currentData()
+        self.max_filesize_mb = self.size_spin.value()
+        self.avoid_merge = self.merge_check.isChecked()
+        self.settings.setValue('max_height', self.max_height)
+        self.settings.setValue('preferred_codec', self.preferred_codec)
+        self.settings.setValue('max_filesize_mb', self.max_filesize_mb)
+        self.settings.setValue('avoid_merge', self.avoid_merge)
+        if self.current_video_info:
+            self.update_video_info(self.current_video_info)
+    
+    def change_concurrent_fragments(self, value):
+        self.concurrent_fragments = value
+        self.download_queue.profile_tuner = self.build_profile_tuner()
+        self.settings.setValue('concurrent_fragments', value)
+    
+    def update_progress(self, job):
+        # 百分比和状态文字由队列中的ProgressEstimator按实际字节数计算，直接显示
+        self.status_label.setText(job.status_text)
+        self.progress_bar.setValue(int(job.percent))
+        self.progress_bar.setFormat(f'{job.percent:.2f}%')
+        self.update_profile_label(job)
+    
+    def download_complete(self, success, message, notify=True):
         if success:
-            # 获取当前进度值
-            current_value = self.progress_bar.value()
-            
-            # 如果当前进度小于90%，使用平滑过渡到100%
-            if current_value < 90:
-                # 创建一个定时器来平滑过渡到100%
-                self.completion_timer = QTimer(self)
-                self.completion_steps = 0
-                self.completion_total_steps = 10  # 10步过渡到100%
-                self.completion_start_value = current_value
-                
-                def update_completion_progress():
-                    self.completion_steps += 1
-                    progress = self.completion_start_value + (100 - self.completion_start_value) * (self.completion_steps / self.completion_total_steps)
-                    self.progress_bar.setValue(int(progress))
-                    self.progress_bar.setFormat(f'{progress:.2f}%')
-                    
-                    if self.completion_steps >= self.completion_total_steps:
-                        self.completion_timer.stop()
-                        self.status_label.setText(message)
-                        QMessageBox.information(self, '下载完成', message)
-                
-                self.completion_timer.timeout.connect(update_completion_progress)
-                self.completion_timer.start(100)  # 每100毫秒更新一次，总共1秒完成过渡
-            else:
-                # 如果已经接近100%，直接设置为100%
-                self.progress_bar.setValue(100)
-                self.progress_bar.setFormat('100.00%')
-                self.status_label.setText(message)
-                QMessageBox.information(self, '下载完成', message)
-        else:
-            self.status_label.setText(message)
-            # 不显示错误消息框，只更新状态标签
+            self.progress_bar.setValue(100)
+            self.progress_bar.setFormat('100.00%')
+        self.status_label.setText(message)
+        if success and notify:
+            QMessageBox.information(self, '下载完成', message)
     
     def cancel_download(self):
-        if self.download_thread and self.download_thread.isRunning():
-            self.download_thread.cancel()
-            self.status_label.setText('正在取消下载...')
+        # 任务立即变为已取消并让出名额，状态栏由状态回调更新
+        self.download_queue.cancel(self.current_job_id)
     
-    def get_video_info(self):
+    def retry_download(self):
+        if self.download_queue.retry(self.current_job_id):
+            self.set_current_job(self.current_job_id)
+    
+    def closeEvent(self, event):
+        # 关闭窗口时取消所有下载任务，这些任务保留在任务日志中，下次启动时继续下载
+        self.download_queue.shutdown()
+        if self.video_info_thread and self.video_info_thread.isRunning():
+            self.video_info_thread.cancel()
+        # 不等下载、预取和信息查询线程退出（进程内引擎可能还阻塞在读取上）；
+        # 日志、记录和缓存关闭后，这些线程之后的写入会被忽略，最后的进度已在 shutdown() 中写入
+        self.job_journal.close()
+        self.download_archive.close()
+        self.metadata_cache.close()
+        self.thumbnail_cache.close()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.close()
+        if self.metrics is not None:
+            self.metrics.close()
+        super().closeEvent(event)
+    
+    def get_video_info(self, force_refresh=False):
         url = self.url_input.text().strip()
         if not url:
             QMessageBox.warning(self, '输入错误', '请输入有效的YouTube视频链接')
@@ -572,6 +766,13 @@ class YouTubeDownloader(QMainWindow):
             QMessageBox.warning(self, '输入错误', '请输入有效的YouTube视频链接')
             return
         
+        # 播放列表和频道不预先提取，开始下载后逐个解析
+        if is_collection_url(url):
+            self.current_video_info = None
+            self.thumbnail_label.setText('无预览图')
+            self.info_browser.setText('这是播放列表或频道链接，开始下载后会逐个获取视频信息')
+            return
+        
         # 更新状态
         self.status_label.setText('正在获取视频信息...')
         self.thumbnail_label.setText('加载中...')
@@ -582,8 +783,10 @@ class YouTubeDownloader(QMainWindow):
             self.video_info_thread.cancel()
         
         # 创建并启动视频信息线程
-        self.video_info_thread = VideoInfoThread(url)
+        self.video_info_thread = VideoInfoThread(url, self.engine_name, self.metadata_cache, force_refresh,
+                                                 self.thumbnail_cache, self.metrics)
         self.video_info_thread.info_signal.connect(self.update_video_info)
+        self.video_info_thread.thumbnail_signal.connect(self.update_thumbnail)
         self.video_info_thread.error_signal.connect(self.show_info_error)
         self.video_info_thread.start()
     
@@ -592,10 +795,12 @@ class YouTubeDownloader(QMainWindow):
         self.current_video_info = video_info
         
         # 更新缩略图
-        thumbnail_path = video_info.get('thumbnail_path')
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            pixmap = QPixmap(thumbnail_path)
-            self.thumbnail_label.setPixmap(pixmap.scaled(320, 180, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        pixmap = self.load_thumbnail(video_info)
+        if pixmap:
+            self.thumbnail_label.setPixmap(pixmap)
+        elif not video_info.get('thumbnail_path'):
+            # 缩略图由thumbnail_signal稍后送达
+            self.thumbnail_label.setText('加载中...')
         else:
             self.thumbnail_label.setText('无预览图')
         
@@ -607,6 +812,10 @@ class YouTubeDownloader(QMainWindow):
         like_count = video_info.get('like_count', 0)
         upload_date = video_info.get('upload_date', '')
         resolution = video_info.get('resolution', '未知')
+        # 按当前约束会下载的格式
+        choice = self.download_queue.merge_planner.select(video_info.get('info_dict'),
+                                                          self.build_format_constraints())
+        selected = choice.describe() if choice else '自动'
         
         # 格式化时长
         duration_str = '未知'
@@ -640,6 +849,7 @@ class YouTubeDownloader(QMainWindow):
             <p><b>上传者:</b> {uploader}</p>
             <p><b>时长:</b> {duration_str}</p>
             <p><b>分辨率:</b> {resolution}</p>
+            <p><b>将下载:</b> {selected}</p>
             <p><b>观看次数:</b> {view_str}</p>
             <p><b>点赞数:</b> {like_str}</p>
             <p><b>上传日期:</b> {date_str}</p>
@@ -647,11 +857,70 @@ class YouTubeDownloader(QMainWindow):
         """
         
         self.info_browser.setHtml(info_html)
-        self.status_label.setText('视频信息获取成功')
+        if video_info.get('from_cache'):
+            self.status_label.setText(f'视频信息获取成功（缓存，命中率 {self.metadata_cache.hit_rate:.0%}）')
+        else:
+            self.status_label.setText('视频信息获取成功')
+    
+    def clear_metadata_cache(self):
+        self.metadata_cache.clear()
+        self.thumbnail_cache.clear()
+        QPixmapCache.clear()
+        self.status_label.setText('视频信息缓存已清除')
+    
+    def import_archive(self):
+        path, _ = QFileDialog.getOpenFileName(self, '导入下载记录', '', '文本文件 (*.txt);;所有文件 (*)')
+        if path:
+            try:
+                count = self.download_archive.import_file(path)
+                self.status_label.setText(f'已导入 {count} 条下载记录')
+            except (OSError, UnicodeDecodeError):
+                self.status_label.setText('无法读取下载记录文件')
+    
+    def export_archive(self):
+        path, _ = QFileDialog.getSaveFileName(self, '导出下载记录', 'download_archive.txt',
+                                              '文本文件 (*.txt);;所有文件 (*)')
+        if path:
+            try:
+                count = self.download_archive.export_file(path)
+                self.status_label.setText(f'已导出 {count} 条下载记录')
+            except OSError:
+                self.status_label.setText('无法写入下载记录文件')
+    
+    def update_thumbnail(self, video_id, thumbnail_path):
+        # 只更新仍在显示的视频的缩略图
+        if not self.current_video_info or self.current_video_info.get('id') != video_id:
+            return
+        self.current_video_info['thumbnail_path'] = thumbnail_path or None
+        pixmap = self.load_thumbnail(self.current_video_info)
+        if pixmap:
+            self.thumbnail_label.setPixmap(pixmap)
+        else:
+            self.thumbnail_label.setText('无预览图')
+    
+    def load_thumbnail(self, video_info):
+        # 已显示过的视频直接使用内存中的图片，不再读盘和解码
+        key = f"thumb:{video_info.get('id')}"
+        pixmap = QPixmapCache.find(key)
+        if pixmap:
+            return pixmap
+        
+        thumbnail_path = video_info.get('thumbnail_path')
+        if not thumbnail_path or not os.path.exists(thumbnail_path):
+            return None
+        pixmap = QPixmap(thumbnail_path)
+        if pixmap.isNull():
+            return None
+        # 缓存中的图片已经是预览尺寸，只有旧文件才需要再缩放
+        if pixmap.width() > 320 or pixmap.height() > 180:
+            pixmap = pixmap.scaled(320, 180, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        QPixmapCache.insert(key, pixmap)
+        return pixmap
     
     def show_info_error(self, error_message):
         self.thumbnail_label.setText('无预览图')
-        self.info_browser.setText('无法获取视频信息，请检查链接是否正确')
+        # 显示yt-dlp给出的原因（链接错误、视频不可用、网络问题等）
+        self.info_browser.setText(f'{error_message}\n\n请检查链接是否正确')
         self.status_label.setText('准备下载...')
 
     def toggle_theme(self):
@@ -662,157 +931,35 @@ class YouTubeDownloader(QMainWindow):
         self.save_settings()
     
     def apply_theme(self):
-        # 应用主题样式
-        # 始终使用浅色图标
-        resource_dir = ensure_resource_dir()
-        logo_label = self.findChild(QLabel, "logo_label")
-        if logo_label:
-            # 无论主题如何，始终使用浅色图标
-            logo_path = os.path.join(resource_dir, 'youtube_logo.svg')
-            
-            if os.path.exists(logo_path):
-                logo_pixmap = QPixmap(logo_path)
-                logo_label.setPixmap(logo_pixmap.scaled(180, 60, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-        
-        if self.dark_mode:
-            # 深色主题
-            self.setStyleSheet("""
-                QMainWindow, QWidget, QDialog {
-                    background-color: #2d2d2d;
-                    color: #f0f0f0;
-                }
-                QLabel {
-                    font-size: 14px;
-                    color: #f0f0f0;
-                }
-                QLineEdit, QComboBox, QTextBrowser {
-                    padding: 8px;
-                    border: 1px solid #555;
-                    border-radius: 4px;
-                    background-color: #3d3d3d;
-                    color: #00BFFF;
-                    font-size: 14px;
-                }
-                QTextBrowser {
-                    color: #1E90FF; /* 更亮的蓝色，提高在深色背景下的可读性 */
-                }
-                QPushButton {
-                    padding: 8px 16px;
-                    border: none;
-                    border-radius: 4px;
-                    background-color: #FF0000;
-                    color: white;
-                    font-weight: bold;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #CC0000;
-                }
-                QPushButton:disabled {
-                    background-color: #555555;
-                }
-                QProgressBar {
-                    border: 1px solid #555;
-                    border-radius: 4px;
-                    text-align: center;
-                    background-color: #3d3d3d;
-                    color: #f0f0f0;
-                }
-                QProgressBar::chunk {
-                    background-color: #FF0000;
-                    border-radius: 3px;
-                }
-                QMenuBar {
-                    background-color: #2d2d2d;
-                    color: #f0f0f0;
-                }
-                QMenuBar::item:selected {
-                    background-color: #3d3d3d;
-                }
-                QMenu {
-                    background-color: #2d2d2d;
-                    color: #f0f0f0;
-                }
-                QMenu::item:selected {
-                    background-color: #3d3d3d;
-                }
-                QFrame {
-                    background-color: transparent;
-                    border-radius: 4px;
-                    border: none;
-                }
-            """)
-        else:
-            # 浅色主题
-            self.setStyleSheet("""
-                QMainWindow, QWidget, QDialog {
-                    background-color: #f9f9f9;
-                    color: #333;
-                }
-                QLabel {
-                    font-size: 14px;
-                    color: #333;
-                }
-                QLineEdit, QComboBox, QTextBrowser {
-                    padding: 8px;
-                    border: 1px solid #ddd;
-                    border-radius: 4px;
-                    background-color: white;
-                    color: #333;
-                    font-size: 14px;
-                }
-                QPushButton {
-                    padding: 8px 16px;
-                    border: none;
-                    border-radius: 4px;
-                    background-color: #FF0000;
-                    color: white;
-                    font-weight: bold;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #CC0000;
-                }
-                QPushButton:disabled {
-                    background-color: #888888;
-                }
-                QProgressBar {
-                    border: 1px solid #ddd;
-                    border-radius: 4px;
-                    text-align: center;
-                    background-color: #f0f0f0;
-                    color: #333;
-                }
-                QProgressBar::chunk {
-                    background-color: #FF0000;
-                    border-radius: 3px;
-                }
-                QMenuBar {
-                    background-color: #f9f9f9;
-                    color: #333;
-                }
-                QMenuBar::item:selected {
-                    background-color: #e0e0e0;
-                }
-                QMenu {
-                    background-color: #f9f9f9;
-                    color: #333;
-                }
-                QMenu::item:selected {
-                    background-color: #e0e0e0;
-                }
-                QFrame {
-                    background-color: transparent;
-                    border-radius: 4px;
-                    border: none;
-                }
-            """)
+        # 应用主题样式和图标，样式表和图标由ThemeManager缓存
+        theme = THEME_DARK if self.dark_mode else THEME_LIGHT
+        self.theme_manager.apply(self, theme, self.logo_label)
+
+def print_startup_profile(stream=sys.stderr):
+    # 每个阶段的耗时和从导入本模块开始的累计耗时（毫秒）
+    started = previous = STARTUP_MARKS[0][1]
+    for name, moment in STARTUP_MARKS[1:]:
+        print(f'{name}\t{(moment - previous) * 1000:.1f} ms\t累计 {(moment - started) * 1000:.1f} ms', file=stream)
+        previous = moment
 
 # 主函数
 def main():
+    # --profile-startup：打印启动各阶段的耗时后退出
+    profile_startup = '--profile-startup' in sys.argv
+    if profile_startup:
+        sys.argv.remove('--profile-startup')
     app = QApplication(sys.argv)
-    window = YouTubeDownloader()
+    mark_startup('创建QApplication')
+    # 测量启动耗时时不恢复未完成的下载，否则会真的开始下载，关闭时还会中断它们
+    window = YouTubeDownloader(resume_unfinished=not profile_startup)
     window.show()
+    mark_startup('显示窗口')
+    if profile_startup:
+        def report():
+            print_startup_profile()
+            window.close()
+            app.quit()
+        window.startup_finished.connect(report)
     sys.exit(app.exec_())
 
 if __name__ == '__main__':